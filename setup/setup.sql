@@ -7,16 +7,83 @@ CREATE DATABASE IF NOT EXISTS weather;
 USE weather;
 
 CREATE TABLE IF NOT EXISTS `data` (
-  `entryDate` datetime DEFAULT NULL,
+  `entryDate` datetime NOT NULL,
   `temp` float DEFAULT NULL,
   `pressure` float DEFAULT NULL,
   `hum` tinyint DEFAULT NULL,
   `windspeed` float DEFAULT NULL,
   `winddir` varchar(3) CHARACTER SET utf8mb4 DEFAULT '---',
   `rainrate` float DEFAULT NULL,
-  `uvindex` tinyint DEFAULT NULL
+  `uvindex` tinyint DEFAULT NULL,
+  PRIMARY KEY (`entryDate`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
-ALTER TABLE `data`
-  ADD UNIQUE KEY `entryDate` (`entryDate`);
+CREATE TABLE IF NOT EXISTS `station_data` (
+  `station_id` int NOT NULL,
+  `entryDate` datetime NOT NULL,
+  `temp` float DEFAULT NULL,
+  `pressure` float DEFAULT NULL,
+  `hum` tinyint DEFAULT NULL,
+  `windspeed` float DEFAULT NULL,
+  `winddir` varchar(3) CHARACTER SET utf8mb4 DEFAULT '---',
+  `rainrate` float DEFAULT NULL,
+  `uvindex` tinyint DEFAULT NULL,
+  PRIMARY KEY (`station_id`, `entryDate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+CREATE TABLE IF NOT EXISTS `data_hourly` (
+  `bucket` datetime NOT NULL,
+  `entries` int NOT NULL,
+  `temp_min` float DEFAULT NULL,
+  `temp_max` float DEFAULT NULL,
+  `temp_avg` float DEFAULT NULL,
+  `pressure_min` float DEFAULT NULL,
+  `pressure_max` float DEFAULT NULL,
+  `pressure_avg` float DEFAULT NULL,
+  `hum_min` tinyint DEFAULT NULL,
+  `hum_max` tinyint DEFAULT NULL,
+  `hum_avg` float DEFAULT NULL,
+  `windspeed_max` float DEFAULT NULL,
+  `windspeed_avg` float DEFAULT NULL,
+  `rain_sum` float DEFAULT NULL,
+  `uvindex_max` tinyint DEFAULT NULL,
+  PRIMARY KEY (`bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `data_daily` (
+  `bucket` datetime NOT NULL,
+  `entries` int NOT NULL,
+  `temp_min` float DEFAULT NULL,
+  `temp_max` float DEFAULT NULL,
+  `temp_avg` float DEFAULT NULL,
+  `pressure_min` float DEFAULT NULL,
+  `pressure_max` float DEFAULT NULL,
+  `pressure_avg` float DEFAULT NULL,
+  `hum_min` tinyint DEFAULT NULL,
+  `hum_max` tinyint DEFAULT NULL,
+  `hum_avg` float DEFAULT NULL,
+  `windspeed_max` float DEFAULT NULL,
+  `windspeed_avg` float DEFAULT NULL,
+  `rain_sum` float DEFAULT NULL,
+  `uvindex_max` tinyint DEFAULT NULL,
+  PRIMARY KEY (`bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `data_monthly` (
+  `bucket` datetime NOT NULL,
+  `entries` int NOT NULL,
+  `temp_min` float DEFAULT NULL,
+  `temp_max` float DEFAULT NULL,
+  `temp_avg` float DEFAULT NULL,
+  `pressure_min` float DEFAULT NULL,
+  `pressure_max` float DEFAULT NULL,
+  `pressure_avg` float DEFAULT NULL,
+  `hum_min` tinyint DEFAULT NULL,
+  `hum_max` tinyint DEFAULT NULL,
+  `hum_avg` float DEFAULT NULL,
+  `windspeed_max` float DEFAULT NULL,
+  `windspeed_avg` float DEFAULT NULL,
+  `rain_sum` float DEFAULT NULL,
+  `uvindex_max` tinyint DEFAULT NULL,
+  PRIMARY KEY (`bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 COMMIT;
\ No newline at end of file
@@ -0,0 +1,400 @@
+'''
+This module saves the entries of whole years in columnar files that are read with mmap.
+
+A file add_data/archive/<table>_<year>.col has one array per column with one value for every
+slot of the year, so the entryDate of a value follows from its position in the array
+(start of the year + position * interval) and isn't saved at all.
+The values are encoded like in compactColumns (scaled integers, number of the compass direction),
+a missing value is saved as the NONE value of its column and a missing entry has 0 in exists.
+This makes a year about 16 bytes per slot, the files can't be compressed any further
+because the arrays are read directly from the mapped file.
+
+A file is mapped into memory read-only and a column is a memoryview of the mapped file
+(or a numpy array if numpy is installed), so a column can be scanned without copying it.
+The arrays are saved in the native byte order, the files are not meant to be moved
+to a machine with another one.
+
+Constants
+---------
+MAGIC: bytes
+        first bytes of every file
+HEADER: str
+        struct format of the header (magic, version, year, interval, number of slots)
+FIELDS: tuple
+        (column, typecode, factor, NONE value) of every saved column after exists
+
+Classes
+-------
+YearFile:
+        A mapped file with the entries of one year.
+ColumnArchive:
+        The directory with the files of all archived years.
+'''
+
+from datetime import datetime, timedelta
+from itertools import compress
+from threading import Lock
+import array, mmap, os, re, struct
+try:
+    import numpy as np # only needed for YearFile.array()
+except ImportError:
+    np = None
+
+import compactColumns
+
+MAGIC = b'DBCA'
+VERSION = 1
+HEADER = '<4sHHHI'
+HEADER_SIZE = 64 # the arrays start after the header, it has room for more fields
+
+FIELDS = (
+    ('temp', 'h', 10, -0x8000),
+    ('pressure', 'H', 10, 0xFFFF),
+    ('hum', 'b', None, -0x80),
+    ('windspeed', 'f', None, float('nan')),
+    ('winddir', 'B', None, 0xFF),
+    ('rainrate', 'I', 100, 0xFFFFFFFF),
+    ('uvindex', 'b', None, -0x80))
+
+def _layout(slots: int) -> dict:
+    '''Return {column: (offset, typecode)} of the arrays in a file, every array starts at a multiple of 8.'''
+    layout = {}
+    offset = HEADER_SIZE
+    for name, code in [('exists', 'B')] + [(f[0], f[1]) for f in FIELDS]:
+        offset = -(-offset // 8) * 8
+        layout[name] = (offset, code)
+        offset += slots * struct.calcsize(code)
+    layout['size'] = (offset, None)
+    return layout
+
+def _year_slots(year: int, interval: int) -> int:
+    '''Return the number of slots of a year.'''
+    return (datetime(year+1, 1, 1) - datetime(year, 1, 1)) // timedelta(minutes=interval)
+
+class YearFile:
+    '''
+    A class for a mapped file with the entries of one year.
+
+    Attributes
+    ----------
+    file_name: str
+            path of the file
+    year: int
+            year of the entries
+    interval: int
+            minutes between two slots
+    slots: int
+            number of slots of the year
+    start: datetime
+            time of the first slot
+    mtime: int
+            modification time of the file in ns when it was mapped
+    map: mmap.mmap
+            the mapped file (read-only)
+
+    Methods
+    -------
+    column(name):
+            Returns a column as memoryview of the mapped file.
+    array(name):
+            Returns a column as numpy array without copying it.
+    slot(t):
+            Returns the number of the slot at the time t inside of the year.
+    exists(start, end):
+            Returns a byte per slot from start until end with 1 for every existing entry.
+    count():
+            Returns the number of existing entries.
+    month_stats():
+            Returns the number of entries and the last entry of every month.
+    rows(start, end, columns):
+            Yields the entries from start until end.
+    close():
+            Closes the mapped file.
+    '''
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        with open(file_name, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime_ns
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.year, self.interval, self.slots = struct.unpack_from(HEADER, self.map)
+        self.layout = _layout(self.slots)
+        if magic != MAGIC or version != VERSION or len(self.map) != self.layout['size'][0]:
+            self.map.close()
+            raise ValueError(f'{file_name} is not an archive file of version {VERSION}')
+        self.start = datetime(self.year, 1, 1)
+
+    def column(self, name: str) -> memoryview:
+        '''
+        Return a column as memoryview of the mapped file with one value per slot.
+        The values are encoded, slots without an entry have the NONE value of the column.
+
+                Parameters:
+                        name (str): exists or the name of a column in FIELDS
+        '''
+        offset, code = self.layout[name]
+        return memoryview(self.map)[offset:offset + self.slots * struct.calcsize(code)].cast(code)
+
+    def array(self, name: str):
+        '''
+        Return a column as read-only numpy array that uses the mapped file, so e.g. min()
+        only reads the memory once. Returns the memoryview of column() if numpy is not installed.
+
+                Parameters:
+                        name (str): exists or the name of a column in FIELDS
+        '''
+        if np == None:
+            return self.column(name)
+        offset, code = self.layout[name]
+        return np.frombuffer(self.map, dtype=np.dtype(code), count=self.slots, offset=offset)
+
+    def slot(self, t: datetime) -> int:
+        '''Return the number of the slot at the time t (rounded up), limited to the year.'''
+        i = -(-(t - self.start) // timedelta(minutes=self.interval))
+        return min(max(i, 0), self.slots)
+
+    def exists(self, start: datetime, end: datetime) -> bytes:
+        '''Return one byte per slot from start until end (excluded), 1 for every existing entry, 0 otherwise.'''
+        offset = self.layout['exists'][0]
+        return self.map[offset + self.slot(start):offset + self.slot(end)]
+
+    def count(self) -> int:
+        '''Return the number of existing entries.'''
+        return self.exists(self.start, datetime(self.year+1, 1, 1)).count(1)
+
+    def month_stats(self) -> dict:
+        '''
+        Return the number of existing entries and the last existing entry of every month like CoverageCache.
+
+                Returns:
+                        {(year: int, month: int): (count: int, last: datetime), ...}
+        '''
+        stats = {}
+        interval = timedelta(minutes=self.interval)
+        for month in range(1, 13):
+            start = datetime(self.year, month, 1)
+            end = datetime(self.year+1, 1, 1) if month == 12 else datetime(self.year, month+1, 1)
+            exists = self.exists(start, end)
+            count = exists.count(1)
+            if count > 0:
+                stats[(self.year, month)] = (count, start + exists.rfind(1) * interval)
+        return stats
+
+    def rows(self, start: datetime, end: datetime, columns=compactColumns.COLUMNS):
+        '''
+        Yield the existing entries from start until end (excluded) with the decoded values
+        in the format of the db (e.g. winddir as direction).
+
+                Parameters:
+                        start (datetime): time of the first entry
+                        end (datetime): time after the last entry
+                        columns (list): names of the columns
+
+                Returns:
+                        generator of tuples with the values of the columns
+        '''
+        a, b = self.slot(start), self.slot(end)
+        interval = timedelta(minutes=self.interval)
+        fields = {f[0]: f for f in FIELDS}
+        decoders = []
+        for name in columns:
+            if name == 'entryDate':
+                decoders.append(lambda i: self.start + i * interval)
+                continue
+            name, code, factor, none = fields[name]
+            values = self.column(name)
+            if name == 'winddir':
+                decoders.append(lambda i, v=values: compactColumns.COMPASS[v[i]] if v[i] < len(compactColumns.COMPASS) else '---')
+            elif code == 'f':
+                # the shortest decimal of the float like the db returns it, NaN is NULL
+                decoders.append(lambda i, v=values: float(f'{v[i]:.7g}') if v[i] == v[i] else None)
+            elif factor != None:
+                decoders.append(lambda i, v=values, n=none, f=factor: v[i] / f if v[i] != n else None)
+            else:
+                decoders.append(lambda i, v=values, n=none: v[i] if v[i] != n else None)
+        for i in compress(range(a, b), self.exists(start, end)):
+            yield tuple(d(i) for d in decoders)
+
+    def close(self):
+        '''Close the mapped file, it stays open until all memoryviews of it are released.'''
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+
+class ColumnArchive:
+    '''
+    A class for the directory with the archive files of a table, one file per year.
+    The files are mapped when they are needed and mapped again if they have been changed.
+
+    Attributes
+    ----------
+    path: str
+            path of the directory
+    table: str
+            name of the table the entries came from
+    interval: int
+            minutes between two slots
+    files: dict
+            {year: YearFile} files that are mapped
+    lock: threading.Lock
+            lock for files
+
+    Methods
+    -------
+    file_name(year):
+            Returns the path of the file of a year.
+    years(start=None, end=None):
+            Returns the archived years, only the ones that overlap start to end if given.
+    get(year):
+            Returns the YearFile of a year.
+    ranges():
+            Returns the ranges of time that are archived.
+    slots(first, start, end):
+            Returns the slot numbers of the archived entries from start until end.
+    month_stats(start, end):
+            Returns the number of entries and the last entry of every archived month.
+    iter_range(start, end, columns):
+            Yields the archived entries from start until end.
+    write(year, rows):
+            Writes the entries of a year into its file.
+    remove(year):
+            Deletes the file of a year.
+    '''
+
+    def __init__(self, path: str, table: str, interval=30):
+        self.path = path
+        self.table = table
+        self.interval = interval
+        self.files = {}
+        self.lock = Lock()
+
+    def file_name(self, year: int) -> str:
+        '''Return the path of the file of a year.'''
+        return os.path.join(self.path, f'{self.table}_{year}.col')
+
+    def years(self, start: datetime = None, end: datetime = None) -> list:
+        '''
+        Return the archived years in ascending order.
+
+                Parameters:
+                        start (datetime): only years that end after start
+                        end (datetime): only years that begin before end (excluded)
+        '''
+        if not os.path.isdir(self.path):
+            return []
+        pattern = re.compile(re.escape(self.table) + r'_(\d{4})\.col')
+        years = sorted(int(m.group(1)) for m in map(pattern.fullmatch, os.listdir(self.path)) if m)
+        return [y for y in years if (start == None or datetime(y+1, 1, 1) > start)
+            and (end == None or datetime(y, 1, 1) < end)]
+
+    def get(self, year: int) -> YearFile:
+        '''Return the mapped file of a year, None if the year is not archived.'''
+        file_name = self.file_name(year)
+        with self.lock:
+            try:
+                mtime = os.stat(file_name).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if year in self.files and self.files[year].mtime != mtime:
+                self.files.pop(year).close()
+            if mtime != None and year not in self.files:
+                self.files[year] = YearFile(file_name)
+                if self.files[year].interval != self.interval:
+                    raise ValueError(f'{file_name} has an interval of {self.files[year].interval} minutes')
+            return self.files.get(year)
+
+    def ranges(self) -> list:
+        '''
+        Return the ranges of time that are archived, e.g. to ignore them with SlotBitmap.mark_ranges().
+
+                Returns:
+                        [(start: datetime, end: datetime), ...] both included
+        '''
+        return [(datetime(y, 1, 1), datetime(y+1, 1, 1) - timedelta(minutes=self.interval)) for y in self.years()]
+
+    def slots(self, first: datetime, start: datetime, end: datetime) -> list:
+        '''
+        Return the numbers of the slots (counted from first) of all archived entries
+        from start until end (excluded) like Database.read_slots().
+        '''
+        slots = []
+        for year in self.years(start, end):
+            f = self.get(year)
+            offset = (f.start - first) // timedelta(minutes=self.interval) + f.slot(start)
+            slots.extend(compress(range(offset, offset + f.slots), f.exists(start, end)))
+        return slots
+
+    def month_stats(self, start: datetime, end: datetime) -> dict:
+        '''
+        Return the number of existing entries and the last existing entry of every archived month
+        from start until end like CoverageCache.month_stats().
+
+                Returns:
+                        {(year: int, month: int): (count: int, last: datetime), ...}
+        '''
+        stats = {}
+        for year in self.years(start, end):
+            stats.update(self.get(year).month_stats())
+        return stats
+
+    def iter_range(self, start: datetime, end: datetime, columns=compactColumns.COLUMNS):
+        '''
+        Yield the archived entries from start until end (excluded) in the order of entryDate.
+
+                Returns:
+                        generator of tuples with the values of the columns
+        '''
+        for year in self.years(start, end):
+            yield from self.get(year).rows(start, end, columns)
+
+    def write(self, year: int, rows) -> int:
+        '''
+        Write the entries of a year into its file, an existing file is replaced.
+        The file is written next to it first and replaces it when it is complete.
+
+                Parameters:
+                        year (int): year of the entries
+                        rows (iterable): [entryDate, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+                            with the values of the db, every entryDate has to be at the start of a slot
+
+                Returns:
+                        number of entries in the file
+
+                Exceptions:
+                        ValueError if an entry is outside of the year or not at the start of a slot
+        '''
+        slots = _year_slots(year, self.interval)
+        start = datetime(year, 1, 1)
+        interval = timedelta(minutes=self.interval)
+        exists = bytearray(slots)
+        columns = [array.array(code, [none]) * slots for name, code, factor, none in FIELDS]
+        for row in rows:
+            i, rest = divmod(row[0] - start, interval)
+            if rest or not 0 <= i < slots:
+                raise ValueError(f'{row[0]} is not a slot of {year}')
+            exists[i] = 1
+            for column, value, field in zip(columns, compactColumns.encode_row(list(row))[1:], FIELDS):
+                column[i] = field[3] if value == None else value
+        layout = _layout(slots)
+        file_name = self.file_name(year)
+        os.makedirs(self.path, exist_ok=True)
+        with open(file_name + '.tmp', 'wb') as f:
+            f.write(struct.pack(HEADER, MAGIC, VERSION, year, self.interval, slots).ljust(HEADER_SIZE, b'\0'))
+            for name, data in zip(['exists'] + [f[0] for f in FIELDS], [exists] + columns):
+                f.write(bytes(layout[name][0] - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        with self.lock:
+            if year in self.files:
+                self.files.pop(year).close()
+            os.replace(file_name + '.tmp', file_name)
+        return exists.count(1)
+
+    def remove(self, year: int):
+        '''Delete the file of a year.'''
+        with self.lock:
+            if year in self.files:
+                self.files.pop(year).close()
+            os.remove(self.file_name(year))
@@ -0,0 +1,113 @@
+'''
+This module defines the compact storage format of the table.
+
+In the compact format temp, pressure and rainrate are saved as scaled integers and winddir
+as the number of the compass direction, which makes a row about half as long.
+The table is called <table>_compact and the view <table> decodes the values again,
+so the website reads the same columns as before.
+
+Constants
+---------
+COLUMNS: tuple
+        names of the columns of a row
+COMPASS: tuple
+        the compass directions in the order of their numbers
+ENCODE: tuple
+        SQL expressions that encode the values of a row, {} stands for a value
+DECODE: tuple
+        SQL expressions that decode the columns of the compact table, {} stands for a column
+
+Functions
+---------
+encode_row(row):
+        Encodes the values of a row for the compact table.
+encode_sql(values):
+        Returns the SQL expressions that encode the given values.
+create_table(table, compact=False):
+        Returns the query that creates a table in the plain or in the compact format.
+create_view(view, table):
+        Returns the query that creates a view with the plain columns of a compact table.
+'''
+
+COLUMNS = ('entryDate', 'temp', 'pressure', 'hum', 'windspeed', 'winddir', 'rainrate', 'uvindex')
+
+COMPASS = ('N', 'NNO', 'NO', 'ONO', 'O', 'OSO', 'SO', 'SSO', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
+
+_directions = ', '.join(f"'{d}'" for d in COMPASS)
+
+ENCODE = ('{}', 'ROUND({} * 10)', 'ROUND({} * 10)', '{}', '{}',
+    f'NULLIF(FIELD({{}}, {_directions}), 0) - 1', 'ROUND({} * 100)', '{}')
+
+DECODE = ('{}', '{} / 10e0', '{} / 10e0', '{}', '{}',
+    f"IFNULL(ELT({{}} + 1, {_directions}), '---')", '{} / 100e0', '{}')
+
+def _scale(value, factor):
+    '''Multiply a value (str or number) with factor and round it, None stays None.'''
+    if value == None or value == '':
+        return None
+    return round(float(value) * factor)
+
+def encode_row(row) -> list:
+    '''
+    Encode the values of a row like ENCODE, so it can be written into the compact table.
+
+            Parameters:
+                    row (list): [entryDate, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+
+            Returns:
+                    row with the encoded values
+    '''
+    entry_date, temp, pressure, hum, windspeed, winddir, rainrate, uvindex = row
+    return [entry_date, _scale(temp, 10), _scale(pressure, 10), hum, windspeed,
+        COMPASS.index(winddir) if winddir in COMPASS else None, _scale(rainrate, 100), uvindex]
+
+def encode_sql(values) -> str:
+    '''
+    Return the SQL expressions that encode the values, e.g. for INSERT ... SELECT.
+
+            Parameters:
+                    values (iterable): one SQL expression for every column (e.g. column names)
+    '''
+    return ', '.join(e.format(v) for e, v in zip(ENCODE, values))
+
+def create_table(table: str, compact=False) -> str:
+    '''
+    Return the query that creates a table for the entries in the plain or in the compact format.
+
+            Parameters:
+                    table (str): name of the table
+                    compact (bool): use the compact format
+    '''
+    if compact:
+        columns = '''`temp` smallint DEFAULT NULL COMMENT '°C * 10',
+ `pressure` smallint unsigned DEFAULT NULL COMMENT 'mbar * 10',
+ `hum` tinyint DEFAULT NULL,
+ `windspeed` float DEFAULT NULL,
+ `winddir` tinyint unsigned DEFAULT NULL COMMENT 'number of the direction in COMPASS',
+ `rainrate` mediumint unsigned DEFAULT NULL COMMENT 'mm/h * 100',
+ `uvindex` tinyint DEFAULT NULL,'''
+    else:
+        columns = '''`temp` float DEFAULT NULL,
+ `pressure` float DEFAULT NULL,
+ `hum` tinyint DEFAULT NULL,
+ `windspeed` float DEFAULT NULL,
+ `winddir` varchar(3) CHARACTER SET utf8mb4 DEFAULT '---',
+ `rainrate` float DEFAULT NULL,
+ `uvindex` tinyint DEFAULT NULL,'''
+    return f'''CREATE TABLE IF NOT EXISTS `{table}` (
+ `entryDate` datetime NOT NULL,
+ {columns}
+ PRIMARY KEY (`entryDate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;'''
+
+def create_view(view: str, table: str) -> str:
+    '''
+    Return the query that creates a view with the columns and values of the plain format
+    for a table in the compact format.
+
+            Parameters:
+                    view (str): name of the view
+                    table (str): name of the compact table
+    '''
+    columns = ', '.join(d.format(f'`{c}`') + f' AS `{c}`' for d, c in zip(DECODE, COLUMNS))
+    return f'CREATE OR REPLACE VIEW `{view}` AS SELECT {columns} FROM `{table}`;'
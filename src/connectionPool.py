@@ -0,0 +1,176 @@
+'''
+This module provides a small pool of database connections that can be shared by threads.
+
+Every thread that needs the db borrows its own connection, so a long query of one
+thread never runs on the connection another thread is using at the same time.
+
+Classes
+-------
+ConnectionPool:
+        Lends connections to threads and checks them before they are borrowed.
+'''
+
+from threading import Condition, current_thread
+import time
+
+from customExceptions import DBTimeoutError
+
+class ConnectionPool:
+    '''
+    A class that lends connections to threads.
+
+    Idle connections are kept in a list and checked with a ping before they are
+    borrowed again. Connections that are too old or were idle for too long are closed.
+
+    Attributes
+    ----------
+    factory: function
+            function without parameters that opens a new connection
+    size: int
+            maximum number of open connections
+    max_idle: float
+            seconds after which an idle connection gets closed
+    max_lifetime: float
+            seconds after which a connection gets closed when it is given back
+    check_after: float
+            seconds a connection has to be idle before it is checked with a ping
+    idle: list
+            [(connection, created, returned), ...] connections that can be borrowed
+    borrowed: dict
+            {connection: (thread name, created)} connections that are in use
+    opening: int
+            number of connections that are being opened
+    cond: threading.Condition
+            lock for idle and borrowed, notified when a connection is given back
+
+    Methods
+    -------
+    acquire(timeout=None):
+            Borrows a healthy connection to the calling thread.
+    release(con):
+            Gives a borrowed connection back.
+    discard(con):
+            Forgets a borrowed connection that can not be used any more.
+    prune():
+            Closes idle connections that exceeded max_idle or max_lifetime.
+    close():
+            Closes all idle connections.
+    '''
+
+    check_after = 1
+
+    def __init__(self, factory, size=4, max_idle=300, max_lifetime=3600):
+        self.factory = factory
+        self.size = size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.idle = []
+        self.borrowed = {}
+        self.opening = 0
+        self.cond = Condition()
+
+    def acquire(self, timeout=None):
+        '''
+        Borrow a connection to the calling thread.
+        An idle connection is checked with a ping first, if none is left,
+        a new connection is opened as long as there are less than size connections.
+
+                Parameters:
+                        timeout (float): seconds to wait if all connections are in use
+
+                Returns:
+                        a connection that has to be given back with release() or discard()
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+        '''
+        deadline = None if timeout == None else time.monotonic() + timeout
+        while True:
+            self.prune()
+            with self.cond:
+                while not self.idle and len(self.borrowed) + self.opening >= self.size:
+                    remaining = None if deadline == None else deadline - time.monotonic()
+                    if remaining != None and remaining <= 0:
+                        raise DBTimeoutError()
+                    self.cond.wait(remaining)
+                if not self.idle:
+                    # reserve the place in the pool before the connection is opened
+                    self.opening += 1
+                    con = None
+                else:
+                    con, created, returned = self.idle.pop()
+                    self.borrowed[con] = (current_thread().name, created)
+            if con == None:
+                try:
+                    con = self.factory()
+                finally:
+                    with self.cond:
+                        self.opening -= 1
+                        if con != None:
+                            self.borrowed[con] = (current_thread().name, time.monotonic())
+                        self.cond.notify()
+                return con
+            if time.monotonic() - returned < self.check_after:
+                return con
+            # health check on borrow
+            try:
+                con.ping(reconnect=False)
+                return con
+            except Exception:
+                self.discard(con)
+                self.close_connection(con)
+
+    def release(self, con):
+        '''
+        Give a borrowed connection back, so another thread can use it.
+        Connections that exceeded max_lifetime are closed instead.
+
+                Parameters:
+                        con: connection returned by acquire()
+        '''
+        with self.cond:
+            thread, created = self.borrowed.pop(con)
+            if time.monotonic() - created < self.max_lifetime:
+                self.idle.append((con, created, time.monotonic()))
+                con = None
+            self.cond.notify()
+        if con != None:
+            self.close_connection(con)
+
+    def discard(self, con):
+        '''
+        Forget a borrowed connection without closing it,
+        e.g. because a thread that timed out may still be using it.
+
+                Parameters:
+                        con: connection returned by acquire()
+        '''
+        with self.cond:
+            self.borrowed.pop(con, None)
+            self.cond.notify()
+
+    def prune(self):
+        '''Close the idle connections that exceeded max_idle or max_lifetime.'''
+        now = time.monotonic()
+        with self.cond:
+            old = [c for c in self.idle if now - c[2] > self.max_idle or now - c[1] > self.max_lifetime]
+            self.idle = [c for c in self.idle if c not in old]
+        for con, created, returned in old:
+            self.close_connection(con)
+
+    def close(self):
+        '''Close all idle connections, borrowed connections are closed when they are given back.'''
+        with self.cond:
+            idle, self.idle = self.idle, []
+            self.max_lifetime = 0
+        for con, created, returned in idle:
+            self.close_connection(con)
+
+    @staticmethod
+    def close_connection(con):
+        '''Close con and ignore errors of connections that are already broken.'''
+        try:
+            con.close()
+        except Exception:
+            pass
@@ -0,0 +1,313 @@
+'''
+This module reads the download files (.csv) of Davis Instruments.
+
+Most functions are generators, so a file never has to be loaded into memory completely.
+If numpy is installed, a file can also be read column by column with read_columns(),
+which is much faster but keeps the needed columns of the file in memory.
+
+Functions
+---------
+read_rows(file_name: str):
+        Yields the values for the db of every complete row in the file.
+round_rows(rows, interval=30):
+        Moves the entryDate of every row to the nearest slot.
+read_columns(file_name: str, interval=30):
+        Reads the needed columns of a file into numpy arrays.
+select_missing(minutes, values, entries):
+        Selects the entries of the arrays whose slot is missing in a SlotBitmap.
+columns_to_rows(minutes, values):
+        Yields the rows of the arrays returned by read_columns().
+iter_file(file_name: str, interval=30):
+        Yields all rows of a file with the entryDate at the start of a slot.
+parse_file(file_name: str, interval=30):
+        Returns all rows of a file with the entryDate at the start of a slot.
+chunks(rows, size: int):
+        Yields lists with up to size rows.
+write_tsv(rows, file_name: str):
+        Writes rows into a tab separated file for LOAD DATA LOCAL INFILE.
+read_tsv(file_name: str):
+        Yields the rows of a file written by write_tsv().
+write_export(rows, columns, file_name: str, format_='csv', progress=None):
+        Writes rows of the db into a .csv or .jsonl file.
+write_sample(file_name: str, start: datetime, end: datetime):
+        Writes a download file with generated values for testing.
+'''
+
+from datetime import datetime, timedelta
+from timeSlots import MISSING # state of the slots in a gap
+import csv, math, json, time, warnings
+try:
+    import numpy as np # only needed for read_columns()
+except ImportError:
+    np = None
+
+COLUMNS = (0, 7, 1, 10, 13, 14, 23, 28) # entryDate, temp, pressure, hum, windspeed, winddir, rainrate, uvindex
+
+def read_rows(file_name: str):
+    '''
+    Read the .csv file with the name file_name and yield the values of every row
+    in which none of the needed values is missing ('--').
+
+            Parameters:
+                    file_name (str): Name of file to be read
+
+            Returns:
+                    generator of [entryDate: datetime, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+    '''
+    with open(file_name, encoding='mac_roman') as csv_file: # encoding specific for the .csv files of Davis instruments
+        reader = csv.reader(csv_file)
+        for row in reader:
+            if reader.line_num <= 6: # everything before line 7 is only for humans
+                continue
+            # sort out the lines when nothing is entered ('--')
+            if '--' in [row[c] for c in COLUMNS]:
+                continue
+            # transform datetime
+            date_time = row[0].split(' ')
+            e_date = date_time[0].split('/')
+            e_time = date_time[1].split(':')
+            entry_date = datetime(
+                int('20' + e_date[2]), # year
+                int(e_date[1]), # month
+                int(e_date[0]), # day
+                int(e_time[0]), # hour
+                int(e_time[1])) # minute
+            # replace commas with dots so Python can understand it
+            pressure = row[1].replace(',', '.')
+            rainrate = row[23].replace(',', '.')
+            yield [entry_date, row[7], pressure, row[10], row[13], row[14], rainrate, row[28]]
+
+def round_rows(rows, interval=30):
+    '''
+    Correct the entryDate of every row to be always at the start of a slot (e.g. at the half hour).
+
+            Parameters:
+                    rows (iterable): rows from read_rows()
+                    interval (int): minutes between two slots, has to be a divisor of 60
+    '''
+    for row in rows:
+        difference = row[0].minute%interval
+        if difference >= interval/2:
+            row[0] += timedelta(minutes=interval-difference)
+        elif difference > 0:
+            row[0] -= timedelta(minutes=difference)
+        yield row
+
+def read_columns(file_name: str, interval=30):
+    '''
+    Read the needed columns of the .csv file with the name file_name into numpy arrays.
+    The file is tokenized by np.loadtxt(), rows in which a value is missing ('--') are removed
+    and the entryDates are rounded to the nearest slot, all of it without a loop over the rows in Python.
+
+            Parameters:
+                    file_name (str): Name of file to be read
+                    interval (int): minutes between two slots, has to be a divisor of 60
+
+            Returns:
+                    (minutes: np.ndarray, values: np.ndarray)
+                    minutes are the entryDates in minutes since 1970-01-01 (int64),
+                    values has one row per entry with temp, pressure, hum, windspeed, winddir, rainrate, uvindex (str)
+    '''
+    with warnings.catch_warnings(): # a file without entries is not an error
+        warnings.simplefilter('ignore', UserWarning)
+        table = np.loadtxt(file_name, dtype=str, delimiter=',', quotechar='"', usecols=COLUMNS,
+            skiprows=6, # everything before line 7 is only for humans
+            encoding='mac_roman', ndmin=2).reshape(-1, len(COLUMNS)) # encoding specific for the .csv files of Davis instruments
+    # sort out the lines when nothing is entered ('--')
+    table = table[~(table == '--').any(axis=1)]
+
+    # split "dd/mm/yy HH:MM" into numbers and calculate the minutes
+    date_str = ' '.join(table[:, 0].tolist()).replace('/', ' ').replace(':', ' ')
+    parts = np.fromstring(date_str, dtype=np.int64, sep=' ').reshape(-1, 5)
+    months = (parts[:, 2] + 30) * 12 + parts[:, 1] - 1 # months since 1970 (years are 20yy)
+    days = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + parts[:, 0] - 1
+    minutes = days * 1440 + parts[:, 3] * 60 + parts[:, 4]
+    minutes = (minutes + interval // 2) // interval * interval # correct entry_dates to be always at the start of a slot
+
+    # replace commas with dots so Python can understand it
+    values = table[:, 1:]
+    for c in (1, 5): # pressure and rainrate
+        if len(values):
+            values[:, c] = '\t'.join(values[:, c].tolist()).replace(',', '.').split('\t')
+    return minutes, values
+
+def select_missing(minutes, values, entries):
+    '''
+    Select the entries of the arrays returned by read_columns() whose slot is MISSING
+    in the SlotBitmap entries. The slots are looked up in the bytes of the bitmap directly,
+    so only the selected entries have to be converted to rows in Python.
+
+            Parameters:
+                    minutes (np.ndarray): entryDates in minutes since 1970-01-01
+                    values (np.ndarray): values of the entries
+                    entries (SlotBitmap): states of the slots
+
+            Returns:
+                    (minutes: np.ndarray, values: np.ndarray)
+                    only the first entry of every slot, sorted by entryDate
+    '''
+    start = np.datetime64(entries.start, 'm').astype(np.int64)
+    slots = (minutes - start) // (entries.interval // timedelta(minutes=1))
+    states = np.frombuffer(bytes(entries.data), dtype=np.uint8)
+    inside = np.flatnonzero((slots >= 0) & (slots < len(states)))
+    missing = inside[states[slots[inside]] == MISSING]
+    # only the first entry of a slot gets added, np.unique() also sorts them
+    _, first = np.unique(slots[missing], return_index=True)
+    selected = missing[first]
+    return minutes[selected], values[selected]
+
+def columns_to_rows(minutes, values):
+    '''
+    Yield the rows of the arrays returned by read_columns() in the format of read_rows().
+
+            Parameters:
+                    minutes (np.ndarray): entryDates in minutes since 1970-01-01
+                    values (np.ndarray): values of the entries
+    '''
+    dates = minutes.astype('datetime64[m]').tolist() # list of datetime objects
+    for entry_date, row in zip(dates, values.tolist()):
+        yield [entry_date] + row
+
+def iter_file(file_name: str, interval=30):
+    '''
+    Yield all rows of the .csv file with the name file_name with the entryDate at the start of a slot.
+    Uses read_columns() if numpy is installed, otherwise read_rows().
+
+            Parameters:
+                    file_name (str): Name of file to be read
+                    interval (int): minutes between two slots
+    '''
+    if np != None:
+        return columns_to_rows(*read_columns(file_name, interval))
+    return round_rows(read_rows(file_name), interval)
+
+def parse_file(file_name: str, interval=30) -> list:
+    '''
+    Read the .csv file with the name file_name completely.
+    This can be executed in another process.
+
+            Parameters:
+                    file_name (str): Name of file to be read
+                    interval (int): minutes between two slots
+
+            Returns:
+                    [[entryDate: datetime, temp, pressure, hum, windspeed, winddir, rainrate, uvindex], ...]
+    '''
+    return list(iter_file(file_name, interval))
+
+def chunks(rows, size: int):
+    '''
+    Collect the rows in lists with up to size rows.
+
+            Parameters:
+                    rows (iterable): rows that get collected
+                    size (int): maximum length of a chunk
+    '''
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_tsv(rows, file_name: str) -> int:
+    '''
+    Write rows into a tab separated file that can be read by LOAD DATA LOCAL INFILE.
+
+            Parameters:
+                    rows (iterable): rows from read_rows()
+                    file_name (str): Name of the file that gets written
+
+            Returns:
+                    number of written rows
+    '''
+    count = 0
+    with open(file_name, 'w', encoding='utf-8', newline='') as f:
+        for row in rows:
+            f.write(row[0].isoformat(sep=' ') + '\t' + '\t'.join(row[1:]) + '\n')
+            count += 1
+    return count
+
+def read_tsv(file_name: str):
+    '''
+    Read a file written by write_tsv() and yield its rows like read_rows().
+
+            Parameters:
+                    file_name (str): Name of file to be read
+    '''
+    with open(file_name, encoding='utf-8', newline='') as f:
+        for line in f:
+            row = line.rstrip('\n').split('\t')
+            row[0] = datetime.fromisoformat(row[0])
+            yield row
+
+def write_export(rows, columns, file_name: str, format_='csv', progress=None) -> int:
+    '''
+    Write rows of the db into a .csv file with a header or into a .jsonl file with one object per row.
+    The rows are written one by one, so they can come from a generator of any length.
+
+            Parameters:
+                    rows (iterable): tuples with the values of the columns
+                    columns (list): names of the columns
+                    file_name (str): Name of the file that gets written
+                    format_ (str): 'csv' or 'jsonl'
+                    progress (function): gets called every 10000 rows with
+                        the number of written rows and the seconds since the start
+
+            Returns:
+                    number of written rows
+    '''
+    count = 0
+    start_time = time.perf_counter()
+    with open(file_name, 'w', encoding='utf-8', newline='') as f:
+        if format_ == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            write = writer.writerow
+        else:
+            def write(row):
+                values = [v.isoformat(sep=' ') if isinstance(v, datetime) else v for v in row]
+                f.write(json.dumps(dict(zip(columns, values))) + '\n')
+        for row in rows:
+            write(row)
+            count += 1
+            if progress and count % 10000 == 0:
+                progress(count, time.perf_counter() - start_time)
+    if progress:
+        progress(count, time.perf_counter() - start_time)
+    return count
+
+def write_sample(file_name: str, start: datetime, end: datetime, interval=30):
+    '''
+    Write a download file with generated values in the format of Davis Instruments.
+    Used for benchmarks and testing.
+
+            Parameters:
+                    file_name (str): Name of the file that gets written
+                    start (datetime): time of the first row
+                    end (datetime): time after the last row
+                    interval (int): minutes between two rows
+    '''
+    directions = ['N', 'NNO', 'NO', 'ONO', 'O', 'OSO', 'SO', 'SSO', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+    with open(file_name, 'w', encoding='mac_roman', newline='') as f:
+        writer = csv.writer(f)
+        for i in range(6): # everything before line 7 is only for humans
+            writer.writerow(['sample data'])
+        current = start
+        i = 0
+        while current < end:
+            row = ['--'] * 30
+            day = math.sin(2 * math.pi * (current.hour * 60 + current.minute) / 1440)
+            row[0] = f'{current.day}/{current.month:02d}/{current.year % 100:02d} {current.hour}:{current.minute:02d}'
+            row[7] = f'{12 + 8 * day:.1f}' # temp
+            row[1] = f'{1013 + 5 * math.sin(i / 500):.1f}'.replace('.', ',') # pressure
+            row[10] = str(int(70 - 20 * day)) # hum
+            row[13] = f'{3 + 2 * math.sin(i / 7):.1f}' # windspeed
+            row[14] = directions[i % 16] # winddir
+            row[23] = '0,0' if i % 50 else '1,2' # rainrate
+            row[28] = str(max(int(5 * day), 0)) # uvindex
+            writer.writerow(row)
+            current += timedelta(minutes=interval)
+            i += 1
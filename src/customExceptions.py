@@ -1,6 +1,6 @@
-from threading import Thread
-import time
-from types import NoneType
+from threading import Thread, Lock, Event
+from queue import Queue
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 class DBConnectionError(Exception):
     '''
@@ -36,6 +36,18 @@ class DBTimeoutError(Exception):
     def __init__(self):
         pass
 
+class DBLocalInfileError(Exception):
+    '''
+    Occurs when the db or the connection doesn't allow LOAD DATA LOCAL INFILE
+
+    Attributes
+    ----------
+    args : tuple
+        arguments of the exception that led to this error
+    '''
+    def __init__(self, e):
+        self.args = e.args
+
 class ApiConnectionError(Exception):
     '''
     Occurs when the connection with an api fails
@@ -77,7 +89,84 @@ class ApiTimeoutError(Exception):
     def __init__(self):
         pass
 
-class TimeoutHelper(Thread):
+class WorkerPool:
+    '''
+    A small pool of daemon threads that execute the functions of TimeoutHelper.
+
+    The threads are started when they are needed and are reused for all following calls.
+    They are daemons, so a function that hangs doesn't block the exit of the program.
+    If all threads are busy, the functions wait in a queue until a thread takes them.
+
+    Attributes
+    ----------
+    max_workers : int
+        maximum number of threads
+    queue : Queue
+        futures and functions that wait for a thread
+    threads : list
+        the started threads
+    idle : int
+        number of threads that wait in queue.get()
+    waiting : int
+        number of functions in the queue that no thread has taken yet
+
+    Methods
+    -------
+    submit(func, started=None):
+        Puts func into the queue and returns a Future for its result.
+    work():
+        Gets executed in every thread and executes the functions in the queue.
+    '''
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.queue = Queue()
+        self.threads = []
+        self.idle = 0 # number of threads that wait for a function
+        self.waiting = 0 # number of functions that wait for a thread
+        self.lock = Lock()
+
+    def submit(self, func, started=None) -> Future:
+        '''
+        Put func into the queue and return a Future for its result.
+
+                Parameters:
+                        func (function): function without parameters
+                        started (Event): gets set when a thread takes func
+        '''
+        future = Future()
+        with self.lock:
+            self.waiting += 1
+            self.queue.put((future, func, started))
+            if self.waiting > self.idle and len(self.threads) < self.max_workers:
+                t = Thread(name=f'TimeoutHelper-Thread-{len(self.threads)}', target=self.work, daemon=True)
+                self.threads.append(t)
+                t.start()
+        return future
+
+    def work(self):
+        '''Execute the functions in the queue one by one.'''
+        while True:
+            with self.lock:
+                self.idle += 1
+            future, func, started = self.queue.get()
+            # idle and waiting change together, so submit() always sees how many functions have no thread
+            with self.lock:
+                self.idle -= 1
+                self.waiting -= 1
+            if not future.set_running_or_notify_cancel(): # the caller stopped waiting before the start
+                continue
+            if started:
+                started.set()
+            try:
+                result, error = func(), None
+            except BaseException as e:
+                result, error = None, e
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+class TimeoutHelper:
     '''
     A helper class for the measurement of timeouts
 
@@ -98,15 +187,23 @@ class TimeoutHelper(Thread):
             timeout.timer(self.config['timeoutMs'], DBTimeoutError)
     
     The timer() method will return the first value returned from the defined function
-    if it is not None of False and raise the second value like an exception. 
+    and raise the second value like an exception. 
     It will also raise the given error when the defined time is over.
+    The function gets executed by one of the threads of a WorkerPool ("pool" if no other
+    is given), while timer() waits for its Future without polling.
+    The timeout starts when a thread takes the function. If no thread becomes free within
+    the timeout, the function is not executed at all, which can be seen in "started".
 
     Attributes
     ----------
-    daemon : bool
-        is true and makes the thread a daemon
+    pool : WorkerPool
+        threads shared by all instances
+    control_pool : WorkerPool
+        threads for functions that have to run even if all threads of pool hang (e.g. KILL QUERY)
     func : function
         the function given to the constructor
+    started : bool
+        if a thread has taken func in the last call of timer()
     r : any
         the value that gets returned by timer()
     e : Exception
@@ -114,26 +211,24 @@ class TimeoutHelper(Thread):
 
     Methods
     -------
-    run():
-        Overwritten method that gets executed in the thread.
     timer():
-        Handles the extra thread and measures the timeout.
+        Executes func in the pool and waits for the result until the timeout.
     '''
-    def __init__(self, func):
-        Thread.__init__(self)
-        self.name= 'TimeoutHelper-Thread'
-        self.daemon=True
+    pool = WorkerPool(max_workers=8)
+    control_pool = WorkerPool(max_workers=2)
+
+    def __init__(self, func, pool=None):
         self.func = func
+        if pool != None:
+            self.pool = pool
+        self.started = False
         self.r = None # values that are returned from func
         self.e = None # errors from func
 
-    def run(self):
-        '''Call the given func.'''
-        self.r, self.e = self.func()
-
     def timer(self, timeout, timeout_error):
         '''
-        Starts the thread and measures the time for the timeout.
+        Executes func in the pool and waits for the time of the timeout
+        after a thread has taken it.
         
         Returns the first returned value of func and raises the second value
         as an exception.
@@ -143,15 +238,16 @@ class TimeoutHelper(Thread):
                         timeout_error (Exception) : Exception that gets raised when 
                             the timeout is exceeded.
         '''
-        self.start()
-        t = timeout
-        while t > 0:
-            if self.e:
-                raise self.e
-            elif type(self.r) is not NoneType:
-                return self.r
-            else:
-                time.sleep(0.001)
-                t -= 1
-        else:
+        self.started = False
+        started = Event()
+        future = self.pool.submit(self.func, started)
+        if not started.wait(timeout/1000) and future.cancel(): # no thread became free
+            raise timeout_error
+        self.started = True
+        try:
+            self.r, self.e = future.result(timeout=timeout/1000)
+        except FutureTimeoutError:
             raise timeout_error
+        if self.e:
+            raise self.e
+        return self.r
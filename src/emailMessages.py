@@ -1,8 +1,28 @@
 '''
 This module handles sending error messages and if they have been resolved per email (SMTP)
 
+The messages of the RequestTimer are sent by the EmailWorker, a background thread with a queue,
+so a slow mail server doesn't delay the next request. The worker keeps one SMTP connection open
+and tries again with a growing delay if sending fails.
+The templates and res/error_msg_config.json are only read again if they have been changed.
+
+Classes
+-------
+EmailWorker:
+        Sends the queued messages in a background thread with one persistent SMTP connection.
+
 Functions
 ---------
+start_worker(retries=5, backoff_s=2, idle_s=60, timeout_s=30, stop_s=60):
+        Starts the EmailWorker.
+queue_message(func, *args):
+        Lets the EmailWorker send a message with func(*args).
+stop_worker():
+        Sends the queued messages and stops the EmailWorker, the unsent ones are logged.
+read_file(file_name: str):
+        Returns the content of a file, which is only read again if it has been changed.
+write_config(config_data: dict):
+        Writes res/error_msg_config.json with the changed state of the errors.
 send_warning(error: BaseException, debug=False):
         Sends a warn-email with the content adjusted to the specific error provided.
 send_error(e: BaseException):
@@ -14,11 +34,15 @@ debug_email():
         A function for testing if everything works. Contains nothing.
 send_email(message, subject, receiver_list):
         Send a mail with MIME content to the list of receivers provided by receiver_list.
+connect(data: dict, timeout_s=30):
+        Opens an SMTP connection and logs in.
 
 '''
 
-import json
+import json, os, time
 import smtplib, ssl
+from queue import Queue, Empty
+from threading import Thread, Lock, current_thread
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formatdate
@@ -27,6 +51,224 @@ from logging import getLogger
 from typing import List
 import traceback
 
+worker = None # the EmailWorker, None if it wasn't started
+files = {} # {file_name: (mtime: int, content: str)} cache of read_file()
+files_lock = Lock()
+
+class EmailWorker(Thread):
+    '''
+    A thread that executes the functions in its queue (e.g. send_warning) one after the other.
+    send_email() uses the SMTP connection of the worker when it is called in this thread,
+    the connection is kept open for the next message and closed after idle_s seconds without one.
+
+    Attributes
+    ----------
+    queue: queue.Queue
+            (func, args) that get executed, None stops the worker
+    retries: int
+            how often sending a message is tried again
+    backoff_s: float
+            seconds before the first retry, the delay doubles with every retry
+    idle_s: float
+            seconds without a message after which the connection is closed
+    timeout_s: float
+            timeout of the SMTP connection
+    stop_s: float
+            longest time stop() waits for the queued messages
+    server: smtplib.SMTP_SSL
+            open connection, None if there is none
+
+    Methods
+    -------
+    put(func, *args):
+            Adds a function to the queue.
+    run():
+            Executes the functions in the queue until None is queued.
+    send(data, receiver_list, message):
+            Sends a message with the open connection and tries again if it fails.
+    disconnect():
+            Closes the connection.
+    stop(timeout_s=None):
+            Waits until the queued messages are sent and stops the worker.
+    '''
+
+    def __init__(self, retries=5, backoff_s=2, idle_s=60, timeout_s=30, stop_s=60):
+        super().__init__(name='email', daemon=True)
+        self.queue = Queue()
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.idle_s = idle_s
+        self.timeout_s = timeout_s
+        self.stop_s = stop_s
+        self.server = None
+
+    def put(self, func, *args):
+        '''Add func(*args) to the queue, it gets executed in the thread of the worker.'''
+        self.queue.put((func, args))
+
+    def run(self):
+        '''Execute the functions in the queue until None is queued, errors are only logged.'''
+        log = getLogger('EMAIL MESSAGES')
+        while True:
+            try:
+                item = self.queue.get(timeout=self.idle_s)
+            except Empty:
+                self.disconnect() # the server would close it anyway
+                continue
+            try:
+                if item == None:
+                    self.disconnect()
+                    return
+                func, args = item
+                func(*args)
+            except Exception as e:
+                log.error(f'{getattr(func, "__name__", func)} failed: ' + e.__class__.__name__)
+            finally:
+                self.queue.task_done()
+
+    def send(self, data: dict, receiver_list: list, message: str):
+        '''
+        Send a message with the open connection or a new one. A connection that was closed
+        by the server is replaced at once, after other errors the worker waits backoff_s seconds
+        (doubled every time) and tries again up to retries times.
+
+                Parameters:
+                        data (dict): config of res/error_msg_config.json
+                        receiver_list (list): emails of the receivers
+                        message (str): the complete message
+
+                Exceptions:
+                        smtplib.SMTPException
+                        OSError
+        '''
+        log = getLogger('EMAIL MESSAGES')
+        attempt = 0
+        while True:
+            reused = self.server != None
+            try:
+                if self.server == None:
+                    self.server = connect(data, self.timeout_s)
+                self.server.sendmail(data['user_email'], receiver_list, message)
+                return
+            except smtplib.SMTPRecipientsRefused:
+                raise # trying again wouldn't change anything
+            except (smtplib.SMTPException, OSError) as e:
+                self.disconnect()
+                if reused and isinstance(e, smtplib.SMTPServerDisconnected):
+                    log.info('SMTP connection was closed by the server, reconnecting')
+                    continue
+                if attempt == self.retries:
+                    raise e
+                delay = self.backoff_s * 2**attempt
+                log.warning(f'sending failed ({e.__class__.__name__}), trying again in {delay}s')
+                time.sleep(delay)
+                attempt += 1
+
+    def disconnect(self):
+        '''Close the connection if there is one.'''
+        if self.server == None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def stop(self, timeout_s=None) -> int:
+        '''
+        Stop the worker after the messages that are already queued are sent.
+        The wait is short, so quit and restart don't hang while the mail server is down.
+        The messages that are still queued after it are removed and logged,
+        so they are not lost without a trace (e.g. before a restart).
+
+                Parameters:
+                        timeout_s (float): longest time to wait, stop_s of the worker if None
+
+                Returns:
+                        number of messages that were not sent
+        '''
+        log = getLogger('EMAIL MESSAGES')
+        self.queue.put(None)
+        self.join(self.stop_s if timeout_s == None else timeout_s)
+        if not self.is_alive():
+            return 0
+        unsent = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            self.queue.task_done()
+            if item != None:
+                unsent.append(item)
+        self.queue.put(None) # the worker still stops after the current message
+        log.warning(f'email worker did not stop within the timeout, {len(unsent)} queued messages are not sent')
+        for func, args in unsent:
+            log.error(f'message not sent before the stop: {getattr(func, "__qualname__", func)}{args!r}')
+        return len(unsent)
+
+def start_worker(retries=5, backoff_s=2, idle_s=60, timeout_s=30, stop_s=60):
+    '''
+    Start the EmailWorker, so queue_message() doesn't wait for the mail server anymore.
+
+            Parameters:
+                    retries (int): how often sending a message is tried again
+                    backoff_s (float): seconds before the first retry, doubled with every retry
+                    idle_s (float): seconds without a message after which the connection is closed
+                    timeout_s (float): timeout of the SMTP connection
+                    stop_s (float): longest time stop_worker() waits for the queued messages
+    '''
+    global worker
+    if worker != None and worker.is_alive():
+        return
+    worker = EmailWorker(retries, backoff_s, idle_s, timeout_s, stop_s)
+    worker.start()
+
+def queue_message(func, *args):
+    '''
+    Let the EmailWorker send a message with func(*args), e.g. queue_message(send_warning, error).
+    Without a running worker func gets called directly.
+    '''
+    if worker != None and worker.is_alive():
+        worker.put(func, *args)
+    else:
+        func(*args)
+
+def stop_worker() -> int:
+    '''
+    Send the queued messages and stop the EmailWorker. It waits up to stop_s of the worker,
+    the messages that are still queued then are logged.
+
+            Returns:
+                    number of messages that were not sent
+    '''
+    global worker
+    unsent = 0
+    if worker != None:
+        unsent = worker.stop()
+        worker = None
+    return unsent
+
+def read_file(file_name: str) -> str:
+    '''
+    Return the content of a file. It is only read again if it has been changed.
+
+            Parameters:
+                    file_name (str): path of the file
+    '''
+    mtime = os.stat(file_name).st_mtime_ns
+    with files_lock:
+        if file_name not in files or files[file_name][0] != mtime:
+            with open(file_name) as f:
+                files[file_name] = (mtime, f.read())
+        return files[file_name][1]
+
+def write_config(config_data: dict):
+    '''Write res/error_msg_config.json with the changed state of the errors.'''
+    with files_lock:
+        with open('res/error_msg_config.json', 'w') as f:
+            f.write(json.dumps(config_data, indent='    '))
+
 def send_warning(error: BaseException, debug=False):
     '''
     Build and send a warn-email depending on the type of error given
@@ -37,10 +279,8 @@ def send_warning(error: BaseException, debug=False):
     '''
     # read files and initiate logger
     log = getLogger('EMAIL MESSAGES')
-    with open('res/warning-template.html') as f:
-        html_template = f.read()
-    with open('res/error_msg_config.json') as f:
-        config_data = json.loads(f.read())
+    html_template = read_file('res/warning-template.html')
+    config_data = json.loads(read_file('res/error_msg_config.json'))
 
     # get the type of error
     error_name = error.__class__.__name__
@@ -108,14 +348,15 @@ Lösungsvorschlag: {error_solution}
         print('Mail could not be sent:\n', e)
     else:
         log.info('error message sent')
-        with open('res/error_msg_config.json', 'w') as f:
-            f.write(json.dumps(config_data, indent='    '))
+        write_config(config_data)
 
 def send_error(e: BaseException):
     '''
     Execute, when a critical error occurred.
     Send a plain text mail that contains a stacktrace and the arguments of the error given.
     Recipient is defined in the error_msg_config.json file
+    The message is built at once (the stacktrace is only available in the except block)
+    and sent by the EmailWorker if it is running.
 
             Parameters:
                     e (BaseException): error that will be sent per mail
@@ -124,8 +365,7 @@ def send_error(e: BaseException):
     log.info('sending critical error mail')
 
     # get config data
-    with open('res/error_msg_config.json') as f:
-        config_data = json.loads(f.read())
+    config_data = json.loads(read_file('res/error_msg_config.json'))
 
     # variables for the mail
     msg_str = f'''
@@ -143,16 +383,18 @@ params:
     msg_text = MIMEText(msg_str)
     message.attach(msg_text)
 
-    # send mail
-    try:
-        send_email(message, subject, receiver_list)
-    except BaseException as err:
-        log.error('error message could not be sent: ' + str(err))
-        print('Mail could not be sent:\n', err)
-        log.error('critical error message: ' + message)
-        raise err
-    else:
-        log.info('error message sent')
+    # send mail, msg_str is passed so it gets logged if the message is still queued at the stop
+    def send(msg_str):
+        try:
+            send_email(message, subject, receiver_list)
+        except BaseException as err:
+            log.error('error message could not be sent: ' + str(err))
+            print('Mail could not be sent:\n', err)
+            log.error('critical error message: ' + msg_str)
+            raise err
+        else:
+            log.info('error message sent')
+    queue_message(send, msg_str)
 
 def resolved(error_names: List[str]):
     '''
@@ -164,10 +406,8 @@ def resolved(error_names: List[str]):
     '''
     # read files and initiate logger
     log = getLogger('EMAIL MESSAGES')
-    with open('res/warning-cancelation-template.html') as f:
-        html_template = f.read()
-    with open('res/error_msg_config.json') as f:
-        config_data = json.loads(f.read())
+    html_template = read_file('res/warning-cancelation-template.html')
+    config_data = json.loads(read_file('res/error_msg_config.json'))
 
     # get list of errors that have been resolved
     resolved_errors_message: List[str]= []
@@ -218,8 +458,7 @@ def resolved(error_names: List[str]):
         print('resolved Mail could not be sent:\n', e)
     else:
         log.info('resolved message sent')
-        with open('res/error_msg_config.json', 'w') as f:
-            f.write(json.dumps(config_data, indent='    '))
+        write_config(config_data)
 
 def debug_email():
     '''This function does nothing unless a developer writes something in it.'''
@@ -232,6 +471,7 @@ def debug_email():
 def send_email(message: MIMEMultipart, subject: str, receiver_list: list):
     '''
     Send an email with the given MIMEMultipart message with the given subject to all receivers in the given list
+    In the thread of the EmailWorker its connection is used, otherwise a new one is opened for the message.
 
             Parameters:
                     message (MIMEMultipart): Message containing the html message as well as the plain text message which will be sent
@@ -239,12 +479,8 @@ def send_email(message: MIMEMultipart, subject: str, receiver_list: list):
                     receiver_list (list): List of all receiver emails to which the email should be sent.
     '''
     # get all necessary config data
-    with open('res/error_msg_config.json') as f:
-        data = json.loads(f.read())['config']
-        host = data['host']
-        port = data['port']
-        sender_email = data['user_email']
-        password = data['password']
+    data = json.loads(read_file('res/error_msg_config.json'))['config']
+    sender_email = data['user_email']
 
     # assemble string of all receivers
     receiver_email_str = ', '.join(receiver_list)
@@ -256,7 +492,28 @@ def send_email(message: MIMEMultipart, subject: str, receiver_list: list):
     message['From'] = sender_email
 
     # actual connection with SMTP server and sending of email
+    if worker != None and current_thread() is worker:
+        worker.send(data, receiver_list, message.as_string())
+        return
+    with connect(data) as server:
+        server.sendmail(sender_email, receiver_list, message.as_string())
+
+def connect(data: dict, timeout_s=30) -> smtplib.SMTP_SSL:
+    '''
+    Open an SMTP connection with TLS and log in.
+
+            Parameters:
+                    data (dict): config of res/error_msg_config.json (host, port, user_email, password)
+                    timeout_s (float): timeout of the connection
+
+            Returns:
+                    smtplib.SMTP_SSL
+    '''
     context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(host, port, context=context) as server:
-        server.login(sender_email, password)
-        server.sendmail(sender_email, receiver_email_str, message.as_string())
\ No newline at end of file
+    server = smtplib.SMTP_SSL(data['host'], data['port'], context=context, timeout=timeout_s)
+    try:
+        server.login(data['user_email'], data['password'])
+    except BaseException:
+        server.close()
+        raise
+    return server
\ No newline at end of file
@@ -1,13 +1,22 @@
 from customExceptions import * # custom exceptions and TimeoutHelper
 import download_file # module for extracting the range of a download file
-import sys, os, time # System
+from timeSlots import * # SlotBitmap for the entries of the db
+from connectionPool import ConnectionPool # connections for the threads that use the db
+from writeBuffer import WriteBuffer # rows that couldn't be written into the db
+import migrations # changes of the db schema
+import compactColumns # compact storage format of the table
+import columnArchive # archived years in columnar files
+import sys, os, time, tempfile, heapq # System
 from datetime import datetime, timedelta # for names of request files and RequestTimer
 import email.utils # for conversion of rfc822 to datetime
-from threading import Thread # For RequestTimer
-import hmac # Hash function for WeatherLink-API
+from threading import Thread, Event, Lock, get_ident # For RequestTimer
+import asyncio # For AsyncRequestTimer
+from concurrent.futures import ProcessPoolExecutor # read multiple download files at once
+from concurrent.futures import ThreadPoolExecutor, as_completed # poll multiple stations at once
+import hmac, calendar # Hash function and timestamps for WeatherLink-API
 import pymysql, requests, json # APIs and database
 import cmd # Command line (readline gets only imported if the config variable for it is true)
-import csv # Read download-files
+import csvImport # Read download-files
 import emailMessages # remote error messages
 import logging # used in Configuration.init_logging()
 from logging import getLogger # get log instance with certain name
@@ -19,44 +28,44 @@ class TimeUtils:
 
     Methods
     -------
-    get_now(string=False):
+    get_now(string=False, precise=False):
             returns datetime object of CET timezone
-    get_next_req_time(now=None):
+    get_next_req_time(now=None, interval=30):
             Calculates next_req.
     '''
 
-    def get_now(self, string=False):
+    def get_now(self, string=False, precise=False):
         '''
         Return a naive datetime object of the CET zone
 
                 parameters:
                         string (bool): lets this method return a string of
                             the datetime object in iso format.
+                        precise (bool): keep the microseconds
         '''
         now = datetime.utcnow() + timedelta(hours=1)  # uses CET, ignores DST
-        now = now.replace(microsecond=0)
+        if not precise:
+            now = now.replace(microsecond=0)
         if string:
             return now.isoformat(sep=' ')
         return now
 
-    def get_next(self, now=None) -> datetime:
+    def get_next(self, now=None, interval=30) -> datetime:
         '''
         Calculate time of next request.
 
-        is always at xx:00 or at xx:30
+        is always at the start of a slot, e.g. at xx:00 or at xx:30
 
                 parameters:
                         now (datetime): starting point for calculation.
                             If None the current time in CET gets used.
+                        interval (int): minutes between two requests, has to be a divisor of 60
         '''
         if not now:
             now = self.get_now()
-        next_req = now + timedelta(minutes=30)
-        minutes = next_req.minute
-        if minutes < 30:
-            next_req = next_req.replace(minute=0, second=0, microsecond=0)
-        else:
-            next_req = next_req.replace(minute=30, second=0, microsecond=0)
+        next_req = now + timedelta(minutes=interval)
+        minutes = next_req.minute - next_req.minute%interval
+        next_req = next_req.replace(minute=minutes, second=0, microsecond=0)
         return next_req
 
 class Configuration:
@@ -161,11 +170,31 @@ class Database:
     ----------
     config: dict
             configuration data for the database connection
-    con: pymysql.connection
-            connection object of pymysql
+    interval: int
+            minutes between two entries
+    write_table: str
+            table the entries are written into, <table>_compact if compactStorage is set
+            and its migration is applied (<table> is a view of it then)
+    compact: bool
+            if the migration of compactStorage is applied, checked by connect() and migrate()
+    pool: ConnectionPool
+            connections of pymysql that are lent to the threads
             This is None, if the connection is not established.
-    cursor: pymysql.cursors.DictCursor
-            cursor object for database
+    coverage: CoverageCache
+            cache of the existing entries in add_data/.coverage
+            This is None, if the cache is not loaded.
+    saved_gaps: RangeSet
+            gaps that can not be fixed, saved in add_data/.remaining_gaps
+    station_gaps: dict
+            {station_id: RangeSet} like saved_gaps for the stations in stationTable
+    buffer: WriteBuffer
+            rows that couldn't be added by add_row(), saved in add_data/.buffer.sqlite
+    archive: ColumnArchive
+            years that were moved out of the db into add_data/archive
+    detached: RangeSet
+            years that were moved into their own table by detach_partition(), saved in add_data/.detached
+    running: dict
+            {thread ident: connection id} of the queries that timer() is waiting for
 
     Methods
     -------
@@ -173,27 +202,156 @@ class Database:
             calls connect() and checks if writing to the db is possible
     connect():
             tries to establish the connection with the db
+    new_connection(timeout=None, **kwargs):
+            opens a new connection with the settings from the config
+    timer(func, timeout=None):
+            executes func with a connection from the pool and a timeout,
+            kills the running query if the timeout is exceeded
+    kill_query(thread_id):
+            stops the query running on another connection with KILL QUERY
+    kill_running(ident):
+            stops the query that timer() executes for the thread with the ident
     ping():
-            checks the connection with a ping and reconnects if necessary
+            checks the connection with a ping and reconnects if necessary,
+            adds the buffered rows if there are any
+    is_compact(table):
+            returns if a table uses the compact storage format
+    insert_query(table=None, ignore=False):
+            returns the INSERT query for the rows of a table
     add_row(values):
-            adds a line at the end of the db with the data from "values"
+            adds a line at the end of the db with the data from "values",
+            saves it in the buffer if that fails
+    replay_buffer():
+            adds the rows in the buffer to the db in one transaction
+    try_replay():
+            calls replay_buffer() if there are buffered rows and logs errors
     rm_last():
             removes the last entry in the database
     check_writing_to_db():
             Writes and deletes one line to the database
             to check if writing to the db is possible.
     get_entries():
-            Reads all entry dates of the database data and returns a list
-            of tuples with the data if any possible entry exists in the db.
+            Reads all entry dates of the database data and returns a SlotBitmap
+            with the information if any possible entry exists in the db.
+    read_slots(start, end):
+            Reads the slot numbers of all entries from start to end.
+    iter_range(start, end, columns=None, batch_size=1000):
+            Yields the entries from start to end of the db and the archive.
+    iter_table(start, end, columns, batch_size=1000):
+            Yields the entries from start to end in the db with a server-side cursor.
+    load_coverage():
+            Loads the coverage cache and updates the months that don't match the db.
     get_gaps(entries):
-            Reads the list of "entries" returned from get_entries() and finds all
-            the gaps in the list.
-    load_file(file_name):
+            Reads the SlotBitmap "entries" returned from get_entries() and finds all
+            the gaps in it.
+    get_gaps_sql(station_id=None):
+            Lets the db find all the gaps with a window function query
+            and returns them in the same format as get_gaps().
+    closed_ranges():
+            Returns the ranges of the archived and detached years.
+    get_saved_gaps(station_id=None):
+            Reads the ranges in add_data/.remaining_gaps that can not be fixed.
+    get_start():
+            Returns mendStartTime as datetime.
+    load_file(file_name, station_id=None):
             Reads the .csv file "file_name" and adds its  data to the db.
+    load_files(file_names, station_id=None):
+            Reads multiple .csv files in parallel and adds their data to the db at once.
+    add_new_rows(rows, station_id=None):
+            Adds the rows that belong to a gap to the db.
+    insert_rows(rows, table=None, station_id=None):
+            Writes rows into the db in chunks.
+    create_station_table():
+            Creates stationTable for the multi-station mode if it doesn't exist.
+    add_station_rows(rows):
+            Adds the rows of multiple stations to stationTable at once.
+    create_rollup_tables():
+            Creates the hourly, daily and monthly rollup tables if they don't exist.
+    rollup_query(level):
+            Returns the query that computes the buckets of a rollup table.
+    update_rollups(ranges):
+            Recomputes the buckets of the rollup tables that contain the given ranges.
+    try_update_rollups(ranges):
+            Calls update_rollups() if the rollups are enabled and logs errors.
+    rebuild_rollups(progress=None):
+            Recomputes all rollup tables month by month.
+    entry_ranges(entry_dates):
+            Merges the hours of entry dates into ranges for update_rollups().
+    load_tsv(file_name, count, table=None):
+            Loads a tab separated file with LOAD DATA LOCAL INFILE into the db.
+    benchmark_mend(file_name):
+            Compares the time insert_rows() and load_tsv() need for a download file.
+    schema_version():
+            Returns the version of the last migration that was applied to the db.
+    applied_migrations():
+            Returns the versions of all migrations that were applied to the db.
+    migrate(progress=None):
+            Applies the migrations that are newer than the schema version.
+    partitions():
+            Returns the year partitions of the table.
+    partition_table():
+            Converts the table to one partition per year.
+    add_partitions():
+            Adds the partitions of the next years ahead of time.
+    try_add_partitions():
+            Calls add_partitions() if the table is partitioned and logs errors.
+    detach_partition(year):
+            Moves the entries of a year out of the table into their own table.
+    benchmark_compact(file_name):
+            Compares the size and the time of a full scan of the plain and the compact format.
+    archive_year(year, progress=None):
+            Moves the entries of a closed year into the archive.
+    restore_year(year, progress=None):
+            Moves the entries of an archived year back into the db.
+    benchmark_archive(year):
+            Measures the time of scans of an archived year.
     '''
 
+    # rollup tables are called <table>_<level>, every level is computed from the one before
+    rollup_levels = ('hourly', 'daily', 'monthly')
+    rollup_columns = ('bucket', 'entries', 'temp_min', 'temp_max', 'temp_avg', 'pressure_min', 'pressure_max',
+        'pressure_avg', 'hum_min', 'hum_max', 'hum_avg', 'windspeed_max', 'windspeed_avg', 'rain_sum', 'uvindex_max')
+
     def __init__(self):
         self.config = config.data['db']
+        self.interval = self.config['interval']
+        if self.interval not in INTERVALS:
+            raise ValueError(f'interval has to be one of {INTERVALS}, not {self.interval}')
+        self.pool = None
+        self.coverage = None
+        self.saved_gaps = RangeSet('add_data/.remaining_gaps')
+        self.station_gaps = {}
+        self.buffer = WriteBuffer('add_data/.buffer.sqlite')
+        self.archive = columnArchive.ColumnArchive('add_data/archive', self.config['table'], self.interval)
+        self.detached = RangeSet('add_data/.detached')
+        self.running = {}
+        self.compact = False
+
+    @property
+    def write_table(self):
+        if self.config['compactStorage'] and self.compact:
+            return self.config['table'] + '_compact'
+        return self.config['table']
+
+    @staticmethod
+    def is_compact(table: str) -> bool:
+        '''Return if the table uses the compact storage format, the names of these tables end with _compact.'''
+        return table.endswith('_compact')
+
+    def insert_query(self, table=None, ignore=False) -> str:
+        '''
+        Return the INSERT query for rows like [entryDate, temp, pressure, hum, windspeed, winddir, rainrate, uvindex].
+        The rows for a compact table have to be encoded with compactColumns.encode_row().
+
+                Parameters:
+                        table (str): table to write into, write_table if None
+                        ignore (bool): use INSERT IGNORE
+        '''
+        if table == None:
+            table = self.write_table
+        columns = ', '.join(f'`{c}`' for c in compactColumns.COLUMNS)
+        values = ', '.join(['%s'] * len(compactColumns.COLUMNS))
+        return f"INSERT {'IGNORE ' if ignore else ''}INTO `{table}` ({columns}) VALUES ({values});"
 
     def check(self):
         '''
@@ -210,305 +368,1862 @@ class Database:
     def connect(self):
         '''
         Try to connect with the mysql database.
+        A new connection pool is created and one connection is opened to test it.
+        If compactStorage is set, the compact table is only used after its migration was applied.
 
                 Exceptions:
                     DBConnectionError
                     DBTimeoutError
         '''
-        self.con = None
-        self.cursor = None
+        if self.pool != None:
+            self.pool.close()
+        self.pool = ConnectionPool(
+            lambda: self.new_connection(local_infile=self.config['bulkLoad']),
+            size=self.config['poolSize'],
+            max_idle=self.config['poolMaxIdleS'],
+            max_lifetime=self.config['poolMaxLifetimeS'])
+        self.pool.release(self.pool.acquire(self.config['timeoutMs']/1000))
+        if self.config['compactStorage']:
+            self.compact = migrations.is_applied(self.applied_migrations(), 'compactStorage')
+
+    def new_connection(self, timeout=None, **kwargs):
+        '''
+        Open a new connection with the settings from the config.
+        The socket timeouts outlast the timer, so a query is aborted by KILL QUERY first.
 
+                Parameters:
+                        timeout (int): timeout in ms of the timers that use the connection, timeoutMs from the config if None
+                        kwargs: additional arguments for pymysql.connect()
+
+                Returns:
+                        pymysql.connections.Connection
+
+                Exceptions:
+                    DBConnectionError
+        '''
+        if timeout == None:
+            timeout = self.config['timeoutMs']
         try:
-            self.con = pymysql.connect(
+            return pymysql.connect(
                 port=self.config['port'],
                 host=self.config['host'],
                 user=self.config['user'],
                 password=self.config['password'],
                 database=self.config['database'],
                 cursorclass=pymysql.cursors.DictCursor,
-                read_timeout=int(self.config['timeoutMs']/1000))
+                read_timeout=timeout/1000 + 1,
+                write_timeout=timeout/1000 + 1,
+                **kwargs)
         except pymysql.err.OperationalError as e:
             raise DBConnectionError(e)
-        self.cursor = self.con.cursor()
 
-    def ping(self):
+    def timer(self, func, timeout=None):
+        '''
+        Execute func with a connection from the pool and a timeout like TimeoutHelper.timer().
+        A timeout longer than timeoutMs gets its own connection with longer socket timeouts,
+        which is closed afterwards.
+        If the timeout is exceeded, the running query gets killed on the server
+        and the connection is closed, because the worker thread may still be using it.
+        If func never started, the connection is given back.
+
+                Parameters:
+                        func (function): function that gets a cursor and returns (value, error)
+                        timeout (int): timeout in ms, timeoutMs from the config if None
+
+                Returns:
+                        the value returned by func
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+                        the error returned by func
+        '''
+        if timeout == None:
+            timeout = self.config['timeoutMs']
+        if self.pool == None:
+            self.connect()
+        own = timeout > self.config['timeoutMs'] # the sockets of the pool would time out first
+        if own:
+            con = self.new_connection(timeout, local_infile=self.config['bulkLoad'])
+        else:
+            con = self.pool.acquire(timeout/1000)
+        def give_back():
+            if own:
+                self.pool.close_connection(con)
+            else:
+                self.pool.release(con)
+        def close():
+            if not own:
+                self.pool.discard(con)
+            self.pool.close_connection(con)
+        thread_id = con.thread_id()
+        helper = TimeoutHelper(lambda: func(con.cursor()))
+        self.running[get_ident()] = thread_id
+        try:
+            result = helper.timer(timeout, DBTimeoutError)
+        except DBTimeoutError:
+            if helper.started:
+                self.kill_query(thread_id)
+                close()
+            else: # no worker thread was free, the connection was not used
+                give_back()
+            raise
+        except BaseException:
+            # don't give back a connection with an open transaction or a broken socket
+            try:
+                con.rollback()
+            except pymysql.Error:
+                close()
+            else:
+                give_back()
+            raise
+        finally:
+            self.running.pop(get_ident(), None)
+        give_back()
+        return result
+
+    def kill_query(self, thread_id: int):
+        '''
+        Stop the query that is running on the connection with the id thread_id
+        by sending KILL QUERY over a second connection.
+
+                Parameters:
+                        thread_id (int): id of the connection on the server
+        '''
+        log = getLogger('DATABASE')
+        def exec_():
+            try:
+                con = self.new_connection()
+                try:
+                    with con.cursor() as cursor:
+                        cursor.execute('KILL QUERY %s', (thread_id,))
+                finally:
+                    con.close()
+                return True, None
+            except (pymysql.Error, DBConnectionError) as e:
+                return None, e
+        try:
+            # not in the shared pool, its threads may all be blocked by the queries that should be killed
+            TimeoutHelper(exec_, TimeoutHelper.control_pool).timer(self.config['timeoutMs'], DBTimeoutError)
+            log.info(f'killed the query of connection {thread_id}')
+        except (pymysql.Error, DBConnectionError, DBTimeoutError) as e:
+            log.warning(f'could not kill the query of connection {thread_id}: {e!r}')
+
+    def kill_running(self, ident: int):
+        '''
+        Stop the query that timer() currently executes for the thread with the ident.
+        This is used by AsyncRequestTimer when a stage exceeds its deadline.
+
+                Parameters:
+                        ident (int): threading.get_ident() of the thread that called timer()
+        '''
+        thread_id = self.running.get(ident)
+        if thread_id != None:
+            self.kill_query(thread_id)
+
+    def ping(self):
+        '''
+        Check a connection of the pool and (re-)connect if necessary.
+        If the db is reachable, the buffered rows are added.
+
+                Returns:
+                    number of rows that were added from the buffer
+
+                Exceptions:
+                    DBConnectionError
+                    DBTimeoutError
+        '''
+        # add timeout
+        def ping(cursor):
+            try:
+                cursor.connection.ping(reconnect=True)
+                return True, None
+            except pymysql.err.OperationalError as e:
+                return None, DBConnectionError(e)
+        self.timer(ping)
+        return self.try_replay()
+
+    def add_row(self, values):
+        '''
+        Add a row to the end of db with the values from "values".
+        The rows in the buffer are added first. If adding the row fails,
+        it is saved in the buffer and the error gets the attribute "buffered".
+
+                Parameters:
+                        values (list): Values that get written into the db
+
+                Exceptions:
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        self.try_replay()
+        table = self.write_table
+        query_string = self.insert_query(table)
+        params = compactColumns.encode_row(values) if self.is_compact(table) else values
+        # this function gets executed in another thread
+        def exec_(cursor):
+            try:
+                cursor.execute(query_string, params)
+                cursor.connection.commit()
+                return True, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        # this starts a separate thread with exec_() and a timer
+        # finishes the timer before the function has finished, a timeout error is raised
+        try:
+            self.timer(exec_)
+        except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+            # keep the row until the db is reachable again
+            self.buffer.add(values)
+            e.buffered = True
+            raise e
+        entry_date = datetime.fromisoformat(str(values[0]))
+        if self.coverage != None:
+            self.coverage.add(entry_date)
+        self.try_update_rollups([(entry_date, entry_date)])
+
+    def replay_buffer(self):
+        '''
+        Add all rows in the buffer to the db in one transaction and remove them from the buffer.
+        Rows that already exist in the db are ignored (unique key of entryDate),
+        so a row is never added twice.
+
+                Returns:
+                        number of rows that were in the buffer
+
+                Exceptions:
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        log = getLogger('DATABASE')
+        rows = self.buffer.rows()
+        if not rows:
+            return 0
+        table = self.write_table
+        query_string = self.insert_query(table, ignore=True)
+        params = [compactColumns.encode_row(r) for r in rows] if self.is_compact(table) else rows
+        def exec_(cursor):
+            try:
+                added = cursor.executemany(query_string, params)
+                cursor.connection.commit()
+                return added, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        added = self.timer(exec_)
+        self.buffer.remove([r[0] for r in rows])
+        log.info(f'{len(rows)} buffered rows replayed ({added} added)')
+        if self.coverage != None:
+            with self.coverage.lock:
+                for r in rows:
+                    t = datetime.fromisoformat(r[0])
+                    self.coverage.bitmap.resize(t + self.coverage.bitmap.interval)
+                    self.coverage.bitmap.set(t)
+            self.coverage.save()
+        self.try_update_rollups(self.entry_ranges(datetime.fromisoformat(r[0]) for r in rows))
+        return len(rows)
+
+    def try_replay(self):
+        '''
+        Call replay_buffer() if there are rows in the buffer.
+        Errors are only logged, the rows stay in the buffer.
+
+                Returns:
+                        number of rows that were added from the buffer
+        '''
+        if not self.buffer.count():
+            return 0
+        try:
+            return self.replay_buffer()
+        except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+            getLogger('DATABASE').error('replaying the buffer failed: ' + e.__class__.__name__)
+            return 0
+
+    def rm_last(self):
+        '''
+        Remove last row in the table.
+
+                Exceptions:
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        def exec_(cursor):
+            table = self.write_table
+            try:
+                cursor.execute(f"SELECT MAX(entryDate) AS last FROM `{table}`;")
+                row = cursor.fetchone()
+                cursor.execute(
+                    f"DELETE FROM `{table}` WHERE -1 ORDER BY entryDate DESC LIMIT 1;")
+                cursor.connection.commit()
+                return row, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        # this starts a separate thread with exec_() and a timer
+        # finishes the timer before the function has finished, a timeout error is raised
+        row = self.timer(exec_)
+        if row['last'] != None:
+            if self.coverage != None:
+                self.coverage.remove(row['last'])
+            self.try_update_rollups([(row['last'], row['last'])])
+
+    def check_writing_to_db(self):
+        '''
+        Check if writing to the db is possible by adding and removing one line to the db.
+
+            Exceptions:
+                    DBWritingError
+                    DBTimeoutError
+        '''
+        def exec_(cursor):
+            table = self.write_table
+            row = ['0000-01-01 00:00:00', '26.9', '1014.7', '39', '1.60934', 'SO', '0.0', '2.2']
+            try:
+                # example line that gets removed instantly
+                cursor.execute(self.insert_query(table), compactColumns.encode_row(row) if self.is_compact(table) else row)
+                cursor.execute(f"DELETE FROM `{table}` WHERE entryDate = '0000-01-01 00:00:00';")
+                cursor.connection.commit()
+                return True, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        # this starts a separate thread with exec_() and a timer
+        # finishes the timer before the function has finished, a timeout error is raised
+        self.timer(exec_)
+
+    def get_entries(self):
+        '''
+        Return a SlotBitmap with all the possible entries and the information if an entry exists in the db.
+        The bitmap starts at mendStartTime and ends with the last entry that could exist.
+        If the coverage cache is loaded, the db is not read.
+
+                Returns:
+                        SlotBitmap
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+                        DBNoDataReceivedError
+        '''
+        first = self.get_start()
+        last = time_utils.get_next(interval=self.interval)
+        if self.coverage != None:
+            with self.coverage.lock:
+                self.coverage.bitmap.resize(last)
+                entries = self.coverage.bitmap.copy()
+        else:
+            entries = SlotBitmap(first, last, self.interval)
+            for i in self.read_slots(first, last):
+                entries.data[i] = EXISTS
+        if entries.count(EXISTS) == 0:
+            raise DBNoDataReceivedError()
+        return entries
+
+    def read_slots(self, start, end):
+        '''
+        Return the numbers of the slots (counted from mendStartTime) of all entries from start until end (excluded).
+        The entries of archived years are read from the archive.
+
+                Parameters:
+                        start (datetime): time of the first entry
+                        end (datetime): time after the last entry
+
+                Returns:
+                        [slot: int, ...]
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+        '''
+        first = self.get_start()
+        def get_data(cursor):
+            table = self.config['table']
+            try:
+                # only the numbers of the slots are needed, not the datetime objects,
+                # a cursor with tuples instead of dicts keeps this fast with millions of entries
+                cursor = cursor.connection.cursor(pymysql.cursors.Cursor)
+                cursor.execute(f'''SELECT TIMESTAMPDIFF(MINUTE, %s, entryDate) DIV {self.interval} AS slot
+ FROM `{table}` WHERE entryDate >= %s AND entryDate < %s''', (first, max(start, first), end))
+                data = cursor.fetchall()
+                return data, None
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        data = self.timer(get_data)
+        return [e[0] for e in data] + self.archive.slots(first, max(start, first), end)
+
+    def iter_range(self, start, end, columns=None, batch_size=1000):
+        '''
+        Yield the entries from start until end (excluded) in the order of entryDate.
+        The entries of archived years are read from the archive and merged with the ones
+        in the db, so it makes no difference where an entry is saved.
+        The entries in the db are read with iter_table().
+
+                Parameters:
+                        start (datetime): time of the first entry
+                        end (datetime): time after the last entry
+                        columns (list): names of the columns, all columns of the table if None
+                        batch_size (int): number of rows that are fetched from the db at once
+
+                Returns:
+                        generator of tuples with the values of the columns
+
+                Exceptions:
+                        ValueError
+                        DBConnectionError
+                        DBTimeoutError
+        '''
+        if columns == None:
+            columns = compactColumns.COLUMNS
+        unknown = [c for c in columns if c not in compactColumns.COLUMNS]
+        if unknown:
+            raise ValueError('unknown columns: ' + ', '.join(unknown))
+        if not self.archive.years(start, end):
+            return self.iter_table(start, end, columns, batch_size)
+        # the rows are merged by entryDate, so it is read in any case and removed again if it isn't needed
+        keyed = list(columns) if 'entryDate' in columns else ['entryDate'] + list(columns)
+        key = keyed.index('entryDate')
+        def merge():
+            live = self.iter_table(start, end, keyed, batch_size)
+            try:
+                for row in heapq.merge(self.archive.iter_range(start, end, keyed), live, key=lambda r: r[key]):
+                    yield row if len(keyed) == len(columns) else row[1:]
+            finally:
+                live.close() # kills the query if the generator is closed early
+        return merge()
+
+    def iter_table(self, start, end, columns, batch_size=1000):
+        '''
+        Yield the entries in the db from start until end (excluded) in the order of entryDate.
+        The rows are streamed with a server-side cursor (SSCursor) and fetched in batches,
+        so the memory doesn't grow with the number of entries. Every batch has its own timeout.
+        The connection is borrowed from the pool until the generator is finished,
+        if it is closed before, the rest of the query is killed.
+
+                Parameters:
+                        start (datetime): time of the first entry
+                        end (datetime): time after the last entry
+                        columns (list): names of the columns
+                        batch_size (int): number of rows that are fetched at once
+
+                Returns:
+                        generator of tuples with the values of the columns
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+        '''
+        table = self.config['table']
+        query = f'''SELECT {', '.join(f'`{c}`' for c in columns)} FROM `{table}`
+ WHERE entryDate >= %s AND entryDate < %s ORDER BY entryDate'''
+        timeout = self.config['timeoutMs']
+        if self.pool == None:
+            self.connect()
+        con = self.pool.acquire(timeout/1000)
+        thread_id = con.thread_id()
+        cursor = con.cursor(pymysql.cursors.SSCursor)
+        def execute():
+            try:
+                cursor.execute(query, (start, end))
+                return True, None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+        def fetch():
+            try:
+                return cursor.fetchmany(batch_size), None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+        finished = False
+        try:
+            TimeoutHelper(execute).timer(timeout, DBTimeoutError)
+            while True:
+                rows = TimeoutHelper(fetch).timer(timeout, DBTimeoutError)
+                if not rows:
+                    break
+                yield from rows
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+                self.pool.release(con)
+            else:
+                # the rest of the result would have to be read before the connection can be used again
+                self.pool.discard(con)
+                self.kill_query(thread_id)
+                self.pool.close_connection(con)
+
+    def load_coverage(self):
+        '''
+        Load the coverage cache from add_data/.coverage and check it with the number of entries
+        and the last entry of every month in the db and the archive. Only the months that differ get read again.
+        The entries of the db are counted per slot and the last one is rounded down to its slot like in the cache,
+        so entries that are not at the start of a slot (e.g. from "debug add") don't make a month differ.
+
+                Returns:
+                        number of months that were read from the db
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+        '''
+        log = getLogger('DATABASE')
+        first = self.get_start()
+        last = time_utils.get_next(interval=self.interval)
+        cache = CoverageCache('add_data/.coverage')
+        if not cache.load(first, self.interval):
+            log.info('coverage cache not found, reading all entries')
+            cache.replace(first, last, self.read_slots(first, last))
+            cache.save()
+            self.coverage = cache
+            return -1
+        cache.bitmap.resize(last)
+
+        def get_data(cursor):
+            table = self.config['table']
+            try:
+                cursor.execute(f'''SELECT YEAR(entryDate) AS year, MONTH(entryDate) AS month,
+ COUNT(DISTINCT TIMESTAMPDIFF(MINUTE, %s, entryDate) DIV {self.interval}) AS count, MAX(entryDate) AS last
+ FROM `{table}` WHERE entryDate >= %s AND entryDate < %s GROUP BY year, month''', (first, first, last))
+                data = cursor.fetchall()
+                return data, None
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        data = self.timer(get_data)
+        interval = timedelta(minutes=self.interval)
+        db_stats = {(e['year'], e['month']): (e['count'], first + (e['last'] - first) // interval * interval) for e in data}
+        for month, (count, last_entry) in self.archive.month_stats(first, last).items():
+            if month in db_stats: # entries of an archived year that are still in the db
+                count, last_entry = count + db_stats[month][0], max(last_entry, db_stats[month][1])
+            db_stats[month] = (count, last_entry)
+        cache_stats = cache.month_stats()
+
+        # read the months again that don't match
+        changed = [m for m in set(db_stats) | set(cache_stats) if db_stats.get(m) != cache_stats.get(m)]
+        for year, month in sorted(changed):
+            start = datetime(year, month, 1)
+            end = datetime(year+1, 1, 1) if month == 12 else datetime(year, month+1, 1)
+            cache.replace(start, end, self.read_slots(start, end))
+        if changed:
+            log.info(f'coverage cache updated: {len(changed)} months changed')
+            cache.save()
+        self.coverage = cache
+        return len(changed)
+
+    def get_start(self):
+        '''Return mendStartTime as datetime.'''
+        first_str = self.config["mendStartTime"] # looks like "2012,7,9,0,0,0"
+        first_l = first_str.split(sep=",") # separates str into year, month, day, hour, minute, second
+        return datetime(*[int(s) for s in first_l]) # gives all values in first_l as separate arguments
+
+    def get_gaps(self, entries):
+        '''
+        Read a SlotBitmap of entries and find all gaps in it.
+        Gaps that are saved in add_data/.remaining_gaps are ignored because they can not be fixed (missing data),
+        the missing entries of archived and detached years as well because these years are closed.
+
+                Parameters:
+                        entries (SlotBitmap): bitmap returned by get_entries()
+
+                Returns:
+                        [(start: datetime, end: datetime, count: int), ...]
+        '''
+        entries.mark_ranges(self.get_saved_gaps())
+        entries.mark_ranges(self.closed_ranges())
+        return list(entries.iter_gaps())
+
+    def get_gaps_sql(self, station_id=None):
+        '''
+        Find all gaps in the db by letting the db compare every entry with the previous one (LAG).
+        Only the gaps get transferred, so the time and memory needed don't grow with the history.
+        Gaps that are saved in add_data/.remaining_gaps and closed years are ignored like in get_gaps().
+
+                Parameters:
+                        station_id (int): find the gaps of this station in stationTable
+                            instead of the gaps in the configured table
+
+                Returns:
+                        [(start: datetime, end: datetime, count: int), ...]
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+                        DBNoDataReceivedError
+        '''
+        if station_id == None:
+            table = self.config['table']
+            where, params = '', ()
+        else:
+            table = self.config['stationTable']
+            where, params = 'station_id = %s AND ', (station_id,)
+        first = self.get_start()
+        interval = self.interval
+        last = time_utils.get_next(interval=interval) - timedelta(minutes=interval) # last entry that could exist
+        def get_data(cursor):
+            try:
+                cursor.execute(
+                    f'SELECT MIN(entryDate) AS first, MAX(entryDate) AS last FROM `{table}` WHERE {where}entryDate >= %s',
+                    params + (first,))
+                limits = cursor.fetchone()
+                # every entry is compared with the previous one, only the rows after a gap are returned
+                cursor.execute(f'''SELECT prev + INTERVAL {interval} MINUTE AS start,
+ entryDate - INTERVAL {interval} MINUTE AS end,
+ TIMESTAMPDIFF(MINUTE, prev, entryDate) DIV {interval} - 1 AS count
+ FROM (SELECT entryDate, LAG(entryDate) OVER (ORDER BY entryDate) AS prev
+  FROM `{table}` WHERE {where}entryDate >= %s) AS t
+ WHERE TIMESTAMPDIFF(MINUTE, prev, entryDate) > {interval}
+ ORDER BY entryDate ASC''', params + (first,))
+                rows = cursor.fetchall()
+                return (limits, rows), None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        limits, rows = self.timer(get_data)
+        archived = self.closed_ranges() if station_id == None else []
+        if limits['first'] == None:
+            if not archived:
+                raise DBNoDataReceivedError()
+            limits = {'first': last + timedelta(minutes=interval), 'last': last} # all slots are a gap
+
+        gaps = []
+        if limits['first'] > first: # gap before the first entry
+            gaps.append((first, limits['first'] - timedelta(minutes=interval)))
+        gaps.extend([(r['start'], r['end']) for r in rows])
+        if limits['last'] < last: # gap after the last entry
+            gaps.append((limits['last'] + timedelta(minutes=interval), last))
+
+        # remove the saved gaps and the archived years, this can split a gap into multiple smaller ones
+        saved = self.get_saved_gaps(station_id)
+        result = []
+        for start, end in gaps:
+            ignored = sorted(saved.overlapping(start, end) + [r for r in archived if r[0] <= end and r[1] >= start])
+            for saved_start, saved_end in ignored:
+                if saved_start > start:
+                    # the part of the gap before the saved gap stays
+                    result.append((start, self.previous_slot(saved_start)))
+                start = max(start, self.next_slot(saved_end))
+            if start <= end:
+                result.append((start, end))
+        return [(s, e, int((e-s)/timedelta(minutes=interval)) + 1) for s, e in result]
+
+    def closed_ranges(self) -> list:
+        '''
+        Return the ranges of the years that were moved out of the db, into the archive by archive_year()
+        or into their own table by detach_partition(). The missing entries of these years are not gaps.
+
+                Returns:
+                        [(start: datetime, end: datetime), ...] both included
+        '''
+        return sorted(self.archive.ranges() + list(self.detached.load()))
+
+    def get_saved_gaps(self, station_id=None):
+        '''
+        Return the ranges in add_data/.remaining_gaps.
+        These are gaps that can not be fixed because the data is missing.
+        The file is only read again if it has been changed.
+
+                Parameters:
+                        station_id (int): return the ranges of this station in stationTable,
+                            saved in add_data/.remaining_gaps_<station_id>
+
+                Returns:
+                        RangeSet
+        '''
+        if station_id == None:
+            return self.saved_gaps.load()
+        if station_id not in self.station_gaps:
+            self.station_gaps[station_id] = RangeSet(f'add_data/.remaining_gaps_{station_id}')
+        return self.station_gaps[station_id].load()
+
+    def previous_slot(self, t):
+        '''Return the last slot before t.'''
+        t -= timedelta(microseconds=1)
+        return t.replace(minute=t.minute - t.minute%self.interval, second=0, microsecond=0)
+
+    def next_slot(self, t):
+        '''Return the first slot after t.'''
+        t = t.replace(minute=t.minute - t.minute%self.interval, second=0, microsecond=0)
+        return t + timedelta(minutes=self.interval)
+
+    def load_file(self, file_name, progress=None, station_id=None):
+        '''
+        Read the .csv file with the name file_name and add its contents to the database.
+        If numpy is installed, the file is read into arrays with csvImport.read_columns(),
+        otherwise the rows are read one by one. They are written with add_new_rows().
+        
+                Parameters:
+                    file_name (str): Name of file to be read
+                    progress (function): gets called after every chunk with
+                        the number of added entries and the seconds since the start
+                    station_id (int): add the rows to this station in stationTable
+
+                Returns:
+                    new_data_length: int
+                
+                Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+                    (these have the attribute "added" with the number of entries
+                    that were added before the error occurred)
+        '''
+        if csvImport.np != None:
+            rows = csvImport.read_columns(file_name, self.interval)
+        else:
+            rows = csvImport.round_rows(csvImport.read_rows(file_name), self.interval)
+        return self.add_new_rows(rows, progress=progress, station_id=station_id)
+
+    def load_files(self, file_names, progress=None, station_id=None):
+        '''
+        Read multiple .csv files in parallel processes, merge their rows and add them
+        to the database with one call of add_new_rows().
+        If multiple files contain the same entry, the row of the first file is used.
+
+                Parameters:
+                    file_names (list): Names of the files to be read
+                    progress (function): gets called after every chunk with
+                        the number of added entries and the seconds since the start
+                    station_id (int): add the rows to this station in stationTable
+
+                Returns:
+                    new_data_length: int
+
+                Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+                    (these have the attribute "added" with the number of entries
+                    that were added before the error occurred)
+        '''
+        if csvImport.np != None:
+            with ProcessPoolExecutor() as executor:
+                columns = list(executor.map(csvImport.read_columns, file_names, [self.interval] * len(file_names)))
+            # the arrays are only joined, add_new_rows() keeps the first entry of every slot
+            rows = tuple(csvImport.np.concatenate(c) for c in zip(*columns))
+            return self.add_new_rows(rows, progress=progress, station_id=station_id)
+        merged = {}
+        with ProcessPoolExecutor() as executor:
+            for rows in executor.map(csvImport.parse_file, file_names, [self.interval] * len(file_names)):
+                for row in rows:
+                    merged.setdefault(row[0], row) # remove duplicates
+        rows = [merged[k] for k in sorted(merged)]
+        return self.add_new_rows(rows, progress=progress, station_id=station_id)
+
+    def add_new_rows(self, rows, progress=None, station_id=None):
+        '''
+        Add all rows to the database that belong to a gap, the other rows are sorted out.
+        If bulkLoad is set, they are loaded with load_tsv(), otherwise
+        (or if the db doesn't allow it) with insert_rows().
+        The rows of a station are always written with insert_rows().
+
+                Parameters:
+                    rows (iterable or tuple): rows from csvImport.round_rows() or
+                        the arrays (minutes, values) from csvImport.read_columns()
+                    progress (function): gets called after every chunk with
+                        the number of added entries and the seconds since the start
+                    station_id (int): add the rows to this station in stationTable
+
+                Returns:
+                    new_data_length: int
+
+                Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+                    (these have the attribute "added" with the number of entries
+                    that were added before the error occurred)
+        '''
+        try:
+            # find the entries that are missing
+            if station_id != None:
+                try:
+                    gaps = self.get_gaps_sql(station_id)
+                except DBNoDataReceivedError: # the station has no entries yet
+                    entries = SlotBitmap(self.get_start(), time_utils.get_next(interval=self.interval), self.interval)
+                    entries.mark_ranges(self.get_saved_gaps(station_id))
+                else:
+                    entries = SlotBitmap.from_gaps(gaps, self.get_start(), time_utils.get_next(interval=self.interval), self.interval)
+            elif self.coverage == None and self.config['sqlGaps']:
+                entries = SlotBitmap.from_gaps(self.get_gaps_sql(), self.get_start(),
+                    time_utils.get_next(interval=self.interval), self.interval)
+            else:
+                entries = self.get_entries()
+                entries.mark_ranges(self.get_saved_gaps())
+                entries.mark_ranges(self.closed_ranges()) # archived and detached years are closed
+        except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+            e.added = 0
+            raise e
+
+        def in_gap(rows):
+            '''sort out entries that are not in a gap'''
+            for row in rows:
+                if entries.get(row[0]) == MISSING:
+                    entries.set(row[0]) # only the first row of a slot gets added
+                    yield row
+        if isinstance(rows, tuple): # arrays from csvImport.read_columns()
+            rows = csvImport.columns_to_rows(*csvImport.select_missing(*rows, entries))
+        else:
+            rows = in_gap(rows)
+
+        if station_id != None:
+            return self.insert_rows(rows, progress=progress, station_id=station_id)
+        if not self.config['bulkLoad']:
+            return self.insert_rows(rows, progress=progress)
+        log = getLogger('DATABASE')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tsv_name = os.path.join(tmp_dir, 'mend.tsv')
+            count = csvImport.write_tsv(rows, tsv_name)
+            try:
+                start_time = time.perf_counter()
+                added = self.load_tsv(tsv_name, count)
+            except DBLocalInfileError as e:
+                log.info('LOAD DATA LOCAL INFILE is disabled, using INSERT: ' + str(e.args))
+                return self.insert_rows(csvImport.read_tsv(tsv_name), progress=progress)
+            except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                e.added = 0
+                raise e
+            if progress:
+                progress(added, time.perf_counter() - start_time)
+            if self.coverage != None:
+                with self.coverage.lock:
+                    for row in csvImport.read_tsv(tsv_name):
+                        self.coverage.bitmap.set(row[0])
+                self.coverage.save()
+            if added > 0:
+                self.try_update_rollups(self.entry_ranges(row[0] for row in csvImport.read_tsv(tsv_name)))
+        return added
+
+    def insert_rows(self, rows, table=None, progress=None, station_id=None):
+        '''
+        Write the rows into the db in chunks of mendChunkSize rows.
+        Every chunk gets committed and has its own timeout.
+
+                Parameters:
+                    rows (iterable): [entryDate: datetime, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+                    table (str): table to write into, write_table if None
+                    progress (function): gets called after every chunk with
+                        the number of added entries and the seconds since the start
+                    station_id (int): write the rows for this station into stationTable
+
+                Returns:
+                    number of added rows
+
+                Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+                    (these have the attribute "added" with the number of entries
+                    that were added before the error occurred)
+        '''
+        if station_id != None:
+            table = self.config['stationTable']
+            rows = ([station_id] + row for row in rows)
+        elif table == None:
+            table = self.write_table
+        update_coverage = self.coverage != None and table == self.write_table
+        hours = set() if table == self.write_table and self.config['rollups'] else None # hours for the rollups
+        compact = station_id == None and self.is_compact(table)
+        if station_id != None:
+            query_string = "INSERT INTO `{table}` (`station_id`, `entryDate`, `temp`, `pressure`, `hum`, `windspeed`, `winddir`, `rainrate`, `uvindex`)\
+ VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s);".format(table=table)
+        else:
+            query_string = self.insert_query(table)
+        added = 0
+        start_time = time.perf_counter()
+        try:
+            for chunk in csvImport.chunks(rows, self.config['mendChunkSize']):
+                def write_data(cursor):
+                    try:
+                        cursor.executemany(query_string, [compactColumns.encode_row(r) for r in chunk] if compact else chunk)
+                        cursor.connection.commit()
+                        return True, None
+                    except pymysql.Error as e:
+                        return None, DBWritingError(e)
+                    except AttributeError as e:
+                        return None, DBConnectionError(e)
+                self.timer(write_data)
+
+                added += len(chunk)
+                if update_coverage:
+                    with self.coverage.lock:
+                        for row in chunk:
+                            self.coverage.bitmap.set(row[0])
+                if hours != None:
+                    hours.update(row[0].replace(minute=0) for row in chunk)
+                if progress:
+                    progress(added, time.perf_counter() - start_time)
+        except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+            e.added = added
+            raise e
+        finally:
+            if update_coverage and added > 0:
+                self.coverage.save()
+            if hours:
+                self.try_update_rollups(self.entry_ranges(hours))
+        return added
+
+    def create_station_table(self):
+        '''
+        Create stationTable for the multi-station mode if it doesn't exist.
+        It has the columns of the configured table and a station_id,
+        the primary key (station_id, entryDate) is used for the gaps of a station.
+
+                Exceptions:
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        table = self.config['stationTable']
+        def exec_(cursor):
+            try:
+                cursor.execute(f'''CREATE TABLE IF NOT EXISTS `{table}` (
+  `station_id` int NOT NULL,
+  `entryDate` datetime NOT NULL,
+  `temp` float DEFAULT NULL,
+  `pressure` float DEFAULT NULL,
+  `hum` tinyint DEFAULT NULL,
+  `windspeed` float DEFAULT NULL,
+  `winddir` varchar(3) CHARACTER SET utf8mb4 DEFAULT '---',
+  `rainrate` float DEFAULT NULL,
+  `uvindex` tinyint DEFAULT NULL,
+  PRIMARY KEY (`station_id`, `entryDate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;''')
+                return True, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        self.timer(exec_)
+
+    def add_station_rows(self, rows):
+        '''
+        Add the rows of multiple stations to stationTable with one query.
+        Rows that already exist are ignored.
+
+                Parameters:
+                        rows (list): [[station_id, time, temp, pressure, hum, windspeed, winddir, rainrate, uvindex], ...]
+
+                Returns:
+                        number of added rows
+
+                Exceptions:
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        query_string = "INSERT IGNORE INTO `{table}` (`station_id`, `entryDate`, `temp`, `pressure`, `hum`, `windspeed`, `winddir`, `rainrate`, `uvindex`)\
+ VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s);".format(table=self.config['stationTable'])
+        def exec_(cursor):
+            try:
+                added = cursor.executemany(query_string, rows)
+                cursor.connection.commit()
+                return added, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        if not rows:
+            return 0
+        return self.timer(exec_)
+
+    def create_rollup_tables(self):
+        '''
+        Create the rollup tables <table>_hourly, <table>_daily and <table>_monthly if they don't exist.
+        Every row is the summary of the entries in one bucket (hour, day or month).
+
+                Exceptions:
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        table = self.config['table']
+        def exec_(cursor):
+            try:
+                for level in self.rollup_levels:
+                    cursor.execute(f'''CREATE TABLE IF NOT EXISTS `{table}_{level}` (
+ `bucket` datetime NOT NULL,
+ `entries` int NOT NULL,
+ `temp_min` float DEFAULT NULL,
+ `temp_max` float DEFAULT NULL,
+ `temp_avg` float DEFAULT NULL,
+ `pressure_min` float DEFAULT NULL,
+ `pressure_max` float DEFAULT NULL,
+ `pressure_avg` float DEFAULT NULL,
+ `hum_min` tinyint DEFAULT NULL,
+ `hum_max` tinyint DEFAULT NULL,
+ `hum_avg` float DEFAULT NULL,
+ `windspeed_max` float DEFAULT NULL,
+ `windspeed_avg` float DEFAULT NULL,
+ `rain_sum` float DEFAULT NULL,
+ `uvindex_max` tinyint DEFAULT NULL,
+ PRIMARY KEY (`bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;''')
+                cursor.connection.commit()
+                return True, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        self.timer(exec_)
+
+    def rollup_query(self, level: str) -> str:
+        '''
+        Return the query that inserts the buckets of a rollup table between two parameters (start, end).
+        The hours are computed from the entries, the days from the hours and the months from the days,
+        the averages of a level are weighted with the number of entries of the buckets below.
+        The rain sum is the rain rate (mm/h) multiplied with the length of a slot.
+
+                Parameters:
+                        level (str): one of rollup_levels
+
+                Returns:
+                        query: str
+        '''
+        table = self.config['table']
+        columns = ', '.join(f'`{c}`' for c in self.rollup_columns)
+        if level == 'hourly':
+            select = f'''DATE_FORMAT(entryDate, '%%Y-%%m-%%d %%H:00:00'), COUNT(*),
+ MIN(temp), MAX(temp), AVG(temp), MIN(pressure), MAX(pressure), AVG(pressure), MIN(hum), MAX(hum), AVG(hum),
+ MAX(windspeed), AVG(windspeed), SUM(rainrate) * {self.interval} / 60, MAX(uvindex)
+ FROM `{table}` WHERE entryDate >= %s AND entryDate < %s'''
+        else:
+            source, bucket = {'daily': ('hourly', 'DATE(bucket)'), 'monthly': ('daily', "DATE_FORMAT(bucket, '%%Y-%%m-01')")}[level]
+            def avg(column):
+                return f'SUM({column}_avg * entries) / SUM(entries)'
+            select = f'''{bucket}, SUM(entries),
+ MIN(temp_min), MAX(temp_max), {avg('temp')}, MIN(pressure_min), MAX(pressure_max), {avg('pressure')},
+ MIN(hum_min), MAX(hum_max), {avg('hum')}, MAX(windspeed_max), {avg('windspeed')}, SUM(rain_sum), MAX(uvindex_max)
+ FROM `{table}_{source}` WHERE bucket >= %s AND bucket < %s'''
+        return f'INSERT INTO `{table}_{level}` ({columns}) SELECT {select} GROUP BY 1;'
+
+    def update_rollups(self, ranges):
+        '''
+        Recompute the buckets of all rollup tables that contain entries of the given ranges
+        in one transaction. Buckets without entries are removed.
+
+                Parameters:
+                        ranges (list): [(first: datetime, last: datetime), ...] entries that changed
+
+                Exceptions:
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        table = self.config['table']
+        def next_month(t):
+            return t.replace(year=t.year + t.month // 12, month=t.month % 12 + 1)
+        # (start of the bucket of t, start of the next bucket) for every level
+        buckets = {
+            'hourly': (lambda t: t.replace(minute=0, second=0, microsecond=0), lambda t: t + timedelta(hours=1)),
+            'daily': (lambda t: t.replace(hour=0, minute=0, second=0, microsecond=0), lambda t: t + timedelta(days=1)),
+            'monthly': (lambda t: t.replace(day=1, hour=0, minute=0, second=0, microsecond=0), next_month)}
+        statements = []
+        for level in self.rollup_levels:
+            floor, next_bucket = buckets[level]
+            merged = []
+            for start, end in sorted((floor(first), next_bucket(floor(last))) for first, last in ranges):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            query = self.rollup_query(level)
+            for start, end in merged:
+                statements.append((f'DELETE FROM `{table}_{level}` WHERE bucket >= %s AND bucket < %s;', (start, end)))
+                statements.append((query, (start, end)))
+        def exec_(cursor):
+            try:
+                for query, params in statements:
+                    cursor.execute(query, params)
+                cursor.connection.commit()
+                return True, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        if statements:
+            self.timer(exec_, self.config['timeoutMs'] * (len(statements) // 2))
+
+    def try_update_rollups(self, ranges):
+        '''
+        Call update_rollups() if rollups is set in the config.
+        Errors are only logged, the rollups can be fixed with rebuild_rollups().
+
+                Parameters:
+                        ranges (list): [(first: datetime, last: datetime), ...] entries that changed
+        '''
+        if not self.config['rollups'] or not ranges:
+            return
+        try:
+            self.update_rollups(ranges)
+        except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+            getLogger('DATABASE').error('updating the rollups failed: ' + e.__class__.__name__)
+
+    def rebuild_rollups(self, progress=None):
+        '''
+        Recompute all rollup tables from the entries, one month per transaction.
+        The buckets stay readable during the rebuild, buckets outside of the entries are removed first.
+        The buckets of archived and detached years are kept, their entries are not in the table anymore.
+
+                Parameters:
+                        progress (function): gets called after every month with
+                            the number of finished months and the number of all months
+
+                Returns:
+                        number of months
+
+                Exceptions:
+                        DBConnectionError
+                        DBNoDataReceivedError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        table = self.config['table']
+        def get_limits(cursor):
+            try:
+                cursor.execute(f'SELECT MIN(entryDate) AS first, MAX(entryDate) AS last FROM `{table}`;')
+                return cursor.fetchone(), None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        limits = self.timer(get_limits)
+        if limits['first'] == None:
+            raise DBNoDataReceivedError()
+        def next_month(t):
+            return t.replace(year=t.year + t.month // 12, month=t.month % 12 + 1)
+        first = limits['first'].replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = next_month(limits['last'].replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+        archived = sorted(set(self.archive.years()) | {start.year for start, end in self.detached.load()})
+        if archived:
+            first = min(first, datetime(archived[0], 1, 1))
+        def remove_outside(cursor):
+            try:
+                for level in self.rollup_levels:
+                    cursor.execute(f'DELETE FROM `{table}_{level}` WHERE bucket < %s OR bucket >= %s;', (first, end))
+                cursor.connection.commit()
+                return True, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+        self.timer(remove_outside)
+        months = (end.year - first.year) * 12 + end.month - first.month
+        current = first
+        for i in range(months):
+            if current.year not in archived:
+                self.update_rollups([(current, next_month(current) - timedelta(hours=1))])
+            current = next_month(current)
+            if progress:
+                progress(i + 1, months)
+        return months
+
+    @staticmethod
+    def entry_ranges(entry_dates) -> list:
+        '''
+        Merge the hours of entry dates into ranges of consecutive hours.
+
+                Parameters:
+                        entry_dates (iterable): datetime objects
+
+                Returns:
+                        [[first hour: datetime, last hour: datetime], ...]
+        '''
+        ranges = []
+        for hour in sorted({t.replace(minute=0, second=0, microsecond=0) for t in entry_dates}):
+            if ranges and hour - ranges[-1][1] <= timedelta(hours=1):
+                ranges[-1][1] = hour
+            else:
+                ranges.append([hour, hour])
+        return ranges
+
+    def load_tsv(self, file_name, count, table=None):
+        '''
+        Load a file written by csvImport.write_tsv() with LOAD DATA LOCAL INFILE into a
+        temporary staging table and copy its rows with INSERT IGNORE into the table.
+        The timeout is as long as the timeouts of all chunks in insert_rows() together.
+
+                Parameters:
+                    file_name (str): Name of the file to be loaded
+                    count (int): number of rows in the file
+                    table (str): table to write into, write_table if None
+
+                Returns:
+                    number of added rows
+
+                Exceptions:
+                    DBLocalInfileError
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+        '''
+        if table == None:
+            table = self.write_table
+        columns = ', '.join(f'`{c}`' for c in compactColumns.COLUMNS)
+        fields = f'({columns})'
+        if self.is_compact(table):
+            # the values of the file are encoded while they are loaded
+            fields = '(' + ', '.join(f'@{c}' for c in compactColumns.COLUMNS) + ') SET '
+            fields += ', '.join(f'`{c}` = {e.format("@" + c)}' for c, e in zip(compactColumns.COLUMNS, compactColumns.ENCODE))
+        def exec_(cursor):
+            try:
+                cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS `{table}_staging`;')
+                cursor.execute(f'CREATE TEMPORARY TABLE `{table}_staging` LIKE `{table}`;')
+                cursor.execute(f"""LOAD DATA LOCAL INFILE %s INTO TABLE `{table}_staging`
+ CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' {fields};""", (file_name,))
+                added = cursor.execute(f'INSERT IGNORE INTO `{table}` ({columns}) SELECT {columns} FROM `{table}_staging`;')
+                cursor.execute(f'DROP TEMPORARY TABLE `{table}_staging`;')
+                cursor.connection.commit()
+                return added, None
+            except pymysql.Error as e:
+                cursor.connection.rollback()
+                # 1148: not allowed, 2068: rejected by the client, 3948: disabled (MySQL), 4166: disabled (MariaDB)
+                if e.args[0] in (1148, 2068, 3948, 4166):
+                    return None, DBLocalInfileError(e)
+                return None, DBWritingError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        chunks = max(-(-count // self.config['mendChunkSize']), 1)
+        return self.timer(exec_, self.config['timeoutMs'] * chunks)
+
+    def benchmark_mend(self, file_name):
+        '''
+        Compare insert_rows() and load_tsv() by loading the download file file_name
+        into the empty table <table>_bench (in the format of write_table) with both of them. The table gets dropped afterwards.
+
+                Parameters:
+                    file_name (str): download file used for the benchmark
+
+                Returns:
+                    {'INSERT': (rows: int, seconds: float), 'LOAD DATA': (rows: int, seconds: float) or None}
+
+                Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+        '''
+        table = self.config['table'] + ('_bench_compact' if self.is_compact(self.write_table) else '_bench')
+        def run(query):
+            '''execute a query on the benchmark table'''
+            def exec_(cursor):
+                try:
+                    cursor.execute(query.format(table=table, source=self.write_table))
+                    cursor.connection.commit()
+                    return True, None
+                except pymysql.Error as e:
+                    return None, DBWritingError(e)
+                except AttributeError as e:
+                    return None, DBConnectionError(e)
+            self.timer(exec_)
+
+        results = {}
+        run('DROP TABLE IF EXISTS `{table}`;')
+        run('CREATE TABLE `{table}` LIKE `{source}`;')
+        try:
+            start_time = time.perf_counter()
+            rows = self.insert_rows(csvImport.iter_file(file_name, self.interval), table=table)
+            results['INSERT'] = (rows, time.perf_counter() - start_time)
+            run('TRUNCATE TABLE `{table}`;')
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tsv_name = os.path.join(tmp_dir, 'bench.tsv')
+                start_time = time.perf_counter()
+                count = csvImport.write_tsv(csvImport.iter_file(file_name, self.interval), tsv_name)
+                try:
+                    rows = self.load_tsv(tsv_name, count, table=table)
+                    results['LOAD DATA'] = (rows, time.perf_counter() - start_time)
+                except DBLocalInfileError:
+                    results['LOAD DATA'] = None
+        finally:
+            run('DROP TABLE IF EXISTS `{table}`;')
+        return results
+
+    def schema_version(self) -> int:
+        '''
+        Return the version of the last migration that was applied to the db.
+        The table schema_version gets created if it doesn't exist.
+
+                Returns:
+                        version: int (0 if no migration was applied)
+
+                Exceptions:
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        def exec_(cursor):
+            try:
+                cursor.execute('''CREATE TABLE IF NOT EXISTS `schema_version` (
+ `version` int NOT NULL,
+ `name` varchar(100) NOT NULL,
+ `applied` datetime NOT NULL,
+ PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;''')
+                cursor.execute('SELECT MAX(version) AS version FROM `schema_version`;')
+                return cursor.fetchone()['version'] or 0, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        return self.timer(exec_)
+
+    def applied_migrations(self) -> set:
+        '''
+        Return the versions of all migrations that were applied, optional migrations
+        can be missing between them.
+
+                Exceptions:
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        self.schema_version() # creates the table
+        def exec_(cursor):
+            try:
+                cursor.execute('SELECT version FROM `schema_version`;')
+                return {r['version'] for r in cursor.fetchall()}, None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        return self.timer(exec_)
+
+    def migrate(self, progress=None) -> list:
         '''
-        Check the connection and (re-)connect if necessary.
+        Apply the migrations in migrations.MIGRATIONS that were not applied yet in the order
+        of their versions. Optional migrations are only applied if their option is set in the config.
+        The version is saved after every migration, so a failed migration is tried again the next time.
+
+                Parameters:
+                        progress (function): gets called by the migrations with
+                            the number of finished and the number of all rows
+
+                Returns:
+                        [(version: int, name: str), ...] applied migrations
 
                 Exceptions:
-                    DBConnectionError
-                    DBTimeoutError
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
         '''
-        if not self.con:
-            self.connect()
-        # add timeout
-        def ping():
+        log = getLogger('DATABASE')
+        applied = []
+        for number, name, migration in migrations.pending(self.applied_migrations(), self.config):
+            log.info(f'applying migration {number}: {name}')
+            migration(self, progress)
+            def save(cursor):
+                try:
+                    cursor.execute('INSERT INTO `schema_version` (`version`, `name`, `applied`) VALUES (%s, %s, %s);',
+                        (number, name, time_utils.get_now()))
+                    cursor.connection.commit()
+                    return True, None
+                except pymysql.Error as e:
+                    return None, DBWritingError(e)
+            self.timer(save)
+            applied.append((number, name))
+            if migrations.is_applied({number}, 'compactStorage'):
+                self.compact = True # the rows are written into the compact table from now on
+        return applied
+
+    def partitions(self) -> list:
+        '''
+        Return the partitions of the table, the last one (pfuture) has no year
+        and takes all entries after the last year.
+
+                Returns:
+                        [(name: str, year: int or None, rows: int), ...], empty if the table is not partitioned
+
+                Exceptions:
+                        DBConnectionError
+                        DBTimeoutError
+        '''
+        def get_data(cursor):
             try:
-                self.con.ping(reconnect=True)
-                return True, None
-            except pymysql.err.OperationalError as e:
+                cursor.execute('''SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound, TABLE_ROWS AS `rows`
+ FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+ AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION;''', (self.write_table,))
+                return cursor.fetchall(), None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+            except AttributeError as e:
                 return None, DBConnectionError(e)
-        timeout = TimeoutHelper(ping)
-        timeout.timer(self.config['timeoutMs'], DBTimeoutError)
+        rows = self.timer(get_data)
+        # the bound of a year is "year + 1", the one of pfuture is "MAXVALUE"
+        return [(r['name'], int(r['bound']) - 1 if str(r['bound']).isdecimal() else None, r['rows']) for r in rows]
 
-    def add_row(self, values):
+    def partition_table(self) -> int:
         '''
-        Add a row to the end of db with the values from "values".
+        Convert the table to PARTITION BY RANGE (YEAR(entryDate)) with one partition per year
+        from the first entry to partitionYearsAhead years after the current one and pfuture
+        for all later entries. Queries with a range of entryDate only read the partitions of its years.
+        The table is copied by the db, writing is blocked meanwhile (the rows of the timer are buffered).
 
-                Parameters:
-                        values (list): Values that get written into the db
+                Returns:
+                        number of year partitions
 
                 Exceptions:
+                        DBConnectionError
                         DBWritingError
                         DBTimeoutError
         '''
-        query_string = "INSERT INTO `{table}` (`entryDate`, `temp`, `pressure`, `hum`, `windspeed`, `winddir`, `rainrate`, `uvindex`)\
- VALUES ( %s, %s, %s, %s, %s, %s, %s, %s);".format(table=self.config['table'])
-        # this function gets executed in another thread
-        def exec_():
+        table = self.write_table
+        def get_limits(cursor):
+            try:
+                cursor.execute(f'SELECT YEAR(MIN(entryDate)) AS first, COUNT(*) AS count FROM `{table}`;')
+                return cursor.fetchone(), None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        limits = self.timer(get_limits)
+        last = time_utils.get_now().year + self.config['partitionYearsAhead']
+        first = min(limits['first'] or last, self.get_start().year)
+        partitions = ''.join(f'PARTITION p{y} VALUES LESS THAN ({y + 1}), ' for y in range(first, last + 1))
+        def exec_(cursor):
             try:
-                self.cursor.execute(query_string, values)
-                self.con.commit()
+                cursor.execute(f'''ALTER TABLE `{table}` PARTITION BY RANGE (YEAR(entryDate))
+ ({partitions}PARTITION pfuture VALUES LESS THAN MAXVALUE);''')
                 return True, None
             except pymysql.Error as e:
                 return None, DBWritingError(e)
             except AttributeError as e:
                 return None, DBConnectionError(e)
-        timeout = TimeoutHelper(exec_)
-        # this starts a separate thread with exec_() and a timer
-        # finishes the timer before the function has finished, a timeout error is raised
-        timeout.timer(self.config['timeoutMs'], DBTimeoutError)
+        # the table is copied, so it gets as much time as writing all rows in chunks
+        chunks = max(-(-limits['count'] // self.config['mendChunkSize']), 1)
+        self.timer(exec_, self.config['timeoutMs'] * chunks)
+        return last + 1 - first
 
-    def rm_last(self):
+    def add_partitions(self) -> list:
         '''
-        Remove last row in the table.
+        Add the partitions up to partitionYearsAhead years after the current one by splitting pfuture.
+        This is fast as long as pfuture is empty, so it should happen before the year begins.
+
+                Returns:
+                        [year: int, ...] years that were added
 
                 Exceptions:
+                        DBConnectionError
                         DBWritingError
                         DBTimeoutError
         '''
-        def exec_():
-            table=self.config['table']
+        table = self.write_table
+        years = [p[1] for p in self.partitions() if p[1] != None]
+        if not years:
+            return []
+        last = time_utils.get_now().year + self.config['partitionYearsAhead']
+        added = list(range(max(years) + 1, last + 1))
+        if not added:
+            return []
+        partitions = ''.join(f'PARTITION p{y} VALUES LESS THAN ({y + 1}), ' for y in added)
+        def exec_(cursor):
             try:
-                self.cursor.execute(
-                    f"DELETE FROM `{table}` WHERE -1 ORDER BY entryDate DESC LIMIT 1;")
-                self.con.commit()
+                cursor.execute(f'''ALTER TABLE `{table}` REORGANIZE PARTITION pfuture
+ INTO ({partitions}PARTITION pfuture VALUES LESS THAN MAXVALUE);''')
                 return True, None
             except pymysql.Error as e:
                 return None, DBWritingError(e)
-        timeout = TimeoutHelper(exec_)
-        # this starts a separate thread with exec_() and a timer
-        # finishes the timer before the function has finished, a timeout error is raised
-        timeout.timer(self.config['timeoutMs'], DBTimeoutError)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        self.timer(exec_)
+        return added
 
-    def check_writing_to_db(self):
+    def try_add_partitions(self):
         '''
-        Check if writing to the db is possible by adding and removing one line to the db.
+        Call add_partitions(), errors are only logged.
 
-            Exceptions:
-                    DBWritingError
-                    DBTimeoutError
+                Returns:
+                        [year: int, ...] years that were added
         '''
-        def exec_():
-            table = self.config['table']
+        log = getLogger('DATABASE')
+        try:
+            added = self.add_partitions()
+        except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+            log.error('adding partitions failed: ' + e.__class__.__name__)
+            return []
+        if added:
+            log.info('partitions added: ' + ', '.join(str(y) for y in added))
+        return added
+
+    def detach_partition(self, year: int) -> str:
+        '''
+        Move the entries of a year into the new table <table>_<year> by exchanging the partition
+        with the empty table, which doesn't copy any rows. The partition stays empty in the table,
+        the new table can be exported or dropped. The year is saved in add_data/.detached,
+        so it is closed like an archived year and its entries are not reported as gaps.
+        The rollups of the year are kept like those of an archived year.
+
+                Parameters:
+                        year (int): year of the partition
+
+                Returns:
+                        name of the new table
+
+                Exceptions:
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        table = self.write_table
+        target = f"{self.config['table']}_{year}"
+        def exec_(cursor):
             try:
-                # example line that gets removed instantly
-                self.cursor.execute(f"INSERT INTO `{table}` (`entryDate`, `temp`, `pressure`, `hum`, `windspeed`, `winddir`, `rainrate`, `uvindex`)\
- VALUES ('0000-01-01 00:00:00', '26.9', '1014.7', '39', '1.60934', 'SO', '0.0', '2.2');")
-                self.cursor.execute(f"DELETE FROM `{table}` WHERE entryDate = '0000-01-01 00:00:00';")
-                self.con.commit()
+                cursor.execute(f'CREATE TABLE `{target}` LIKE `{table}`;')
+                cursor.execute(f'ALTER TABLE `{target}` REMOVE PARTITIONING;')
+                cursor.execute(f'ALTER TABLE `{table}` EXCHANGE PARTITION p{year} WITH TABLE `{target}`;')
                 return True, None
             except pymysql.Error as e:
                 return None, DBWritingError(e)
-        timeout = TimeoutHelper(exec_)
-        # this starts a separate thread with exec_() and a timer
-        # finishes the timer before the function has finished, a timeout error is raised
-        timeout.timer(self.config['timeoutMs'], DBTimeoutError)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        self.timer(exec_)
+        self.detached.load()
+        self.detached.add(datetime(year, 1, 1), datetime(year + 1, 1, 1) - timedelta(minutes=self.interval))
+        self.detached.save()
+        if self.coverage != None:
+            self.load_coverage()
+        return target
+
+    def benchmark_compact(self, file_name):
+        '''
+        Load the download file file_name into the tables <table>_bench and <table>_bench_compact
+        and compare their size and the time of a full scan (the compact one through a view
+        like the website reads it). The tables get dropped afterwards.
 
-    def get_entries(self):
+                Parameters:
+                    file_name (str): download file used for the benchmark
+
+                Returns:
+                    {'plain': (bytes: int, seconds: float), 'compact': (bytes: int, seconds: float)}
+
+                Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+        '''
+        plain = self.config['table'] + '_bench'
+        compact = self.config['table'] + '_bench_compact'
+        view = self.config['table'] + '_bench_view'
+        def run(*queries, fetch=False):
+            '''execute queries, returns the rows of the last one'''
+            def exec_(cursor):
+                try:
+                    for query in queries:
+                        cursor.execute(query)
+                    cursor.connection.commit()
+                    return cursor.fetchall() if fetch else True, None
+                except pymysql.Error as e:
+                    return None, DBWritingError(e)
+                except AttributeError as e:
+                    return None, DBConnectionError(e)
+            return self.timer(exec_, self.config['timeoutMs'] * 10)
+        def scan(table):
+            '''best time of three full scans that read every column'''
+            times = []
+            for i in range(3):
+                start_time = time.perf_counter()
+                run(f'''SELECT COUNT(*), AVG(temp), AVG(pressure), AVG(hum), AVG(windspeed),
+ COUNT(DISTINCT winddir), AVG(rainrate), AVG(uvindex) FROM `{table}`;''', fetch=True)
+                times.append(time.perf_counter() - start_time)
+            return min(times)
+        def size(table):
+            rows = run(f'ANALYZE TABLE `{table}`;', f'''SELECT DATA_LENGTH + INDEX_LENGTH AS size FROM information_schema.TABLES
+ WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}';''', fetch=True)
+            return rows[0]['size']
+
+        results = {}
+        run(f'DROP VIEW IF EXISTS `{view}`;', f'DROP TABLE IF EXISTS `{plain}`, `{compact}`;')
+        try:
+            run(compactColumns.create_table(plain), compactColumns.create_table(compact, compact=True),
+                compactColumns.create_view(view, compact))
+            for table in (plain, compact):
+                self.insert_rows(csvImport.iter_file(file_name, self.interval), table=table)
+            results['plain'] = (size(plain), scan(plain))
+            results['compact'] = (size(compact), scan(view))
+        finally:
+            run(f'DROP VIEW IF EXISTS `{view}`;', f'DROP TABLE IF EXISTS `{plain}`, `{compact}`;')
+        return results
+
+    def archive_year(self, year: int, progress=None) -> int:
         '''
-        Return a list of tuples with all the possible entries and the information if an entry exists in the db
-        format: [(entryDate, bool), (entryDate, bool), ...]
+        Move the entries of a closed year (before the current one) out of the db into the archive.
+        The file is written and checked first, the entries are only deleted from the db afterwards,
+        with TRUNCATE PARTITION if the table is partitioned, otherwise in chunks of mendChunkSize rows.
+        If the year is archived already, the entries that are still in the db are added to its file.
+        The rollups of the year are kept.
+
+                Parameters:
+                        year (int): year of the entries
+                        progress (function): gets called after every deleted chunk with
+                            the number of deleted entries and the number of entries of the year in the db
 
                 Returns:
-                        [(entryDate: datetime, exists: bool), ...]
+                        number of entries in the archive file
 
                 Exceptions:
+                        ValueError
                         DBConnectionError
+                        DBWritingError
                         DBTimeoutError
-                        DBNoDataReceivedError
         '''
-        def get_data():
-            table = self.config['table']
+        if year >= time_utils.get_now().year:
+            raise ValueError(f'{year} is not closed yet')
+        start, end = datetime(year, 1, 1), datetime(year+1, 1, 1)
+        table = self.write_table
+        def count_rows(cursor):
             try:
-                db.cursor.execute(f'SELECT entryDate FROM {table} ORDER BY entryDate ASC')
-                data = db.cursor.fetchall()
-                return data, None
+                cursor.execute(f'SELECT COUNT(*) AS count FROM `{table}` WHERE entryDate >= %s AND entryDate < %s;', (start, end))
+                return cursor.fetchone()['count'], None
+            except pymysql.Error as e:
+                return None, DBConnectionError(e)
             except AttributeError as e:
                 return None, DBConnectionError(e)
-        timeout = TimeoutHelper(get_data)
-        data = timeout.timer(self.config['timeoutMs'], DBTimeoutError)
-        data = [e['entryDate'] for e in data] # only get a list of the entryDates
-        if data == []:
-            raise DBNoDataReceivedError()
+        in_db = self.timer(count_rows)
+        archived = self.archive.get(year)
+        before = archived.count() if archived != None else 0
+        if in_db == 0:
+            return before
+
+        count = self.archive.write(year, self.iter_range(start, end))
+        # every entry of the db and of the old file has to be in the new file
+        if self.archive.get(year).count() != count or not max(in_db, before) <= count <= in_db + before:
+            raise ValueError(f'the archive of {year} has {count} entries instead of {in_db} + {before}')
+        if self.timer(count_rows) != in_db:
+            raise ValueError(f'the entries of {year} changed while they were archived')
+
+        if year in [p[1] for p in self.partitions()]:
+            def truncate(cursor):
+                try:
+                    cursor.execute(f'ALTER TABLE `{table}` TRUNCATE PARTITION p{year};')
+                    return True, None
+                except pymysql.Error as e:
+                    return None, DBWritingError(e)
+                except AttributeError as e:
+                    return None, DBConnectionError(e)
+            self.timer(truncate)
+            if progress:
+                progress(in_db, in_db)
+            return count
+        size = self.config['mendChunkSize']
+        deleted = 0
+        while True:
+            def delete_chunk(cursor):
+                try:
+                    rows = cursor.execute(f'DELETE FROM `{table}` WHERE entryDate >= %s AND entryDate < %s ORDER BY entryDate LIMIT {size};', (start, end))
+                    cursor.connection.commit()
+                    return rows, None
+                except pymysql.Error as e:
+                    return None, DBWritingError(e)
+                except AttributeError as e:
+                    return None, DBConnectionError(e)
+            rows = self.timer(delete_chunk)
+            if rows == 0:
+                break
+            deleted += rows
+            if progress:
+                progress(deleted, in_db)
+        return count
 
-        entries = []
-        first_str = self.config["mendStartTime"] # looks like "2012,7,9,0,0,0"
-        first_l = first_str.split(sep=",") # separates str into year, month, day, hour, minute, second
-        first = datetime(*[int(s) for s in first_l]) # gives all values in first_l as separate arguments
-        last = time_utils.get_next()
+    def restore_year(self, year: int, progress=None) -> int:
+        '''
+        Move the entries of an archived year back into the db with insert_rows(), e.g. to mend its gaps.
+        Entries that are in the db already are skipped, so an interrupted restore can be repeated.
+        The archive file is deleted when all entries are added.
 
-        current = first
-        index = 0
-        while current != last:
-            if current == data[index]:
-                entries.append((current, True))
-                if index != len(data)-1: # if not the last index
-                    index += 1
-            else:
-                entries.append((current, False))
-            current += timedelta(minutes=30)
-        return entries
+                Parameters:
+                        year (int): year of the entries
+                        progress (function): gets called after every chunk with
+                            the number of added entries and the seconds since the start
 
-    def get_gaps(self, entries):
+                Returns:
+                        number of added entries
+
+                Exceptions:
+                        ValueError
+                        DBConnectionError
+                        DBWritingError
+                        DBTimeoutError
+        '''
+        archived = self.archive.get(year)
+        if archived == None:
+            raise ValueError(f'{year} is not archived')
+        start, end = datetime(year, 1, 1), datetime(year+1, 1, 1)
+        in_db = {r[0] for r in self.iter_table(start, end, ['entryDate'])}
+        added = self.insert_rows((list(r) for r in archived.rows(start, end) if r[0] not in in_db), progress=progress)
+        self.archive.remove(year)
+        return added
+
+    def benchmark_archive(self, year: int) -> dict:
         '''
-        Read a list of entries and find all gaps in this list.
-        Gaps that are saved in add_data/.remaining_gaps are ignored because they can not be fixed (missing data).
+        Measure the best time of three scans of an archived year: decoding all entries like iter_range(),
+        copying all columns out of the mapped file (the speed of the memory) and, if numpy is installed,
+        computing the minimum, maximum and mean of every column directly in the mapped file.
 
                 Parameters:
-                        entries (list): list of tuples returned by get_entries()
+                        year (int): archived year
 
                 Returns:
-                        [(start: datetime, end: datetime, count: int), ...]
+                        {'rows': (entries: int, seconds: float), 'copy': (bytes: int, seconds: float),
+                        'numpy': (bytes: int, seconds: float) or None}
+
+                Exceptions:
+                        ValueError
         '''
-        try:
-            f = open('add_data/.remaining_gaps')
-            gap_str_l = f.readlines()
-            # parse into datetime objects
-            gap_l = []
-            for l in gap_str_l:
-                if l == '':
-                    raise FileNotFoundError
-                l.strip('\n') # looks like "2012-01-01T00:00:00 2013-01-01T00:00:00"
-                l2 = l.split()
-                gap_l.append((datetime.fromisoformat(l2[0]), datetime.fromisoformat(l2[1])))
-            f.close()
-        except FileNotFoundError:
-            gap_l = []
-        if len(gap_l) > 0:
-            saved_gap_index = 0
-        else: 
-            saved_gap_index = None
-
-        previous_status = True
-        gaps = []
-        entries.append((entries[-1][0]+timedelta(minutes=30), True))
-        for i, e in enumerate(entries):
-            # e[0] is entryDate:datetime
-            # e[1] is exists:bool
-            current_status = e[1]
-
-            if len(gap_l) > 0 and not e[1]: # if there are saved gaps and the current entry is missing
-                # jump all the saved gaps that don't affect the missing entry
-                while e[0] > gap_l[saved_gap_index][1]: # if the missing entry is after the end of the first saved gap
-                    saved_gap_index += 1
-                    if saved_gap_index == len(gap_l):
-                        saved_gap_index -= 1 # jump back to previous to avoid indexOutOfBounds error
-                        break
-                # if the missing entry is inside of current saved gap
-                if e[0] >= gap_l[saved_gap_index][0] and e[0] <= gap_l[saved_gap_index][1]:
-                    current_status = True # ignore that the entry is missing
-
-            if not current_status and previous_status:
-                # start of a new gap
-                start = e[0]
-                count = 1
-            elif not current_status and not previous_status:
-                # middle of a gap
-                count += 1
-            elif current_status and not previous_status:
-                # end of a gap
-                end = entries[i-1][0]
-                gaps.append((start, end, count))
-            previous_status = current_status
-        return gaps
-
-    def load_file(self, file_name):
+        archived = self.archive.get(year)
+        if archived == None:
+            raise ValueError(f'{year} is not archived')
+        start, end = datetime(year, 1, 1), datetime(year+1, 1, 1)
+        def best(func):
+            times = []
+            for i in range(3):
+                start_time = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start_time)
+            return min(times)
+        columns = [archived.column(f[0]) for f in columnArchive.FIELDS]
+        size = sum(c.nbytes for c in columns)
+        results = {
+            'rows': (archived.count(), best(lambda: sum(1 for r in archived.rows(start, end)))),
+            'copy': (size, best(lambda: [c.tobytes() for c in columns])),
+            'numpy': None}
+        if columnArchive.np != None:
+            def stats():
+                for name, code, factor, none in columnArchive.FIELDS:
+                    a = archived.array(name)
+                    values = a[a == a] if code == 'f' else a[a != none] # NaN is not equal to itself
+                    if values.size:
+                        values.min(), values.max(), values.mean()
+            results['numpy'] = (size, best(stats))
+        return results
+
+def compass(w_dir: int) -> str:
+    '''
+    Convert a wind direction in degrees into a compass direction like in the db.
+
+            Parameters:
+                    w_dir (int): wind direction in degrees
+
+            Returns:
+                    compass direction: str (e.g. 'NNO')
+    '''
+    if w_dir >= 349 or w_dir <= 11:
+        return 'N'
+    elif w_dir >= 12 and w_dir <= 33:
+        return 'NNO'
+    elif w_dir >= 34 and w_dir <= 56:
+        return 'NO'
+    elif w_dir >= 57 and w_dir <= 78:
+        return 'ONO'
+    elif w_dir >= 79 and w_dir <= 101:
+        return 'O'
+    elif w_dir >= 102 and w_dir <= 123:
+        return 'OSO'
+    elif w_dir >= 124 and w_dir <= 146:
+        return 'SO'
+    elif w_dir >= 147 and w_dir <= 168:
+        return 'SSO'
+    elif w_dir >= 169 and w_dir <= 191:
+        return 'S'
+    elif w_dir >= 192 and w_dir <= 213:
+        return 'SSW'
+    elif w_dir >= 214 and w_dir <= 236:
+        return 'SW'
+    elif w_dir >= 237 and w_dir <= 258:
+        return 'WSW'
+    elif w_dir >= 259 and w_dir <= 281:
+        return 'W'
+    elif w_dir >= 282 and w_dir <= 303:
+        return 'WNW'
+    elif w_dir >= 304 and w_dir <= 326:
+        return 'NW'
+    elif w_dir >= 327 and w_dir <= 348:
+        return 'NNW'
+
+class ApiSession:
+    '''
+    A class for the HTTPS requests of an Api
+
+    All requests of an Api share one requests.Session, so the connection to the server
+    is kept alive and reused instead of a new TCP and TLS handshake for every request.
+
+    Attributes
+    ----------
+    name: str
+            name of the Api, used for the log
+    session: requests.Session
+            session with the pooled connections
+    timeout: tuple
+            (connect timeout, read timeout) in seconds
+    min_interval: float
+            seconds between the starts of two requests, 0 if the requests are not limited
+    next_request: float
+            time.monotonic() at which the next request may start
+    lock: threading.Lock
+            lock for next_request
+    retries: int
+            number of retries after an answer with the status 429 or 5xx
+    backoff_s: float
+            seconds before the first retry, doubled for every further one (if the server sends no Retry-After)
+
+    Methods
+    -------
+    get(url, params):
+            Makes a GET request and returns the answer in json format as a dict.
+    wait():
+            Waits until the rate limit allows the next request.
+    '''
+
+    def __init__(self, name: str, timeout_ms: int, pool_size=4, rate=None, retries=0, backoff_s=1):
+        self.name = name
+        self.timeout = (timeout_ms/1000, timeout_ms/1000)
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip'
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.min_interval = 1/rate if rate else 0
+        self.next_request = 0
+        self.lock = Lock()
+        self.retries = retries
+        self.backoff_s = backoff_s
+
+    def wait(self):
+        '''Wait until the start of the last request is at least min_interval ago, can be called by every thread.'''
+        if not self.min_interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_request)
+            self.next_request = start + self.min_interval # reserve the time for this thread
+        if start > now:
+            time.sleep(start - now)
+
+    def get(self, url: str, params: dict) -> dict:
         '''
-        Read the .csv file with the name file_name and add its contents to the database.
-        
+        Make a GET request with the connection of the session and return the response as a dict.
+        If the server is overloaded (status 429 or 5xx), the request is repeated up to retries times.
+
                 Parameters:
-                    file_name (str): Name of file to be read
+                        url (str): the URL that is used for the request
+                        params (dict): parameters of the request
 
                 Returns:
-                    new_data_length: int
-                
+                        response: dict
+
                 Exceptions:
-                    DBConnectionError
-                    DBTimeoutError
+                        ApiConnectionError
+                        ApiTimeoutError
         '''
-        # read file with name and save data as list
-        csv_file = open(file_name, encoding='mac_roman') # encoding specific for the .csv files of Davis instruments
-        reader = csv.reader(csv_file)
-        data = []
-        for row in reader:
-            if reader.line_num > 6: # everything before line 7 is only for humans
-                # sort out the lines when nothing is entered ('--')
-                if '--' in [row[0], row[7], row[1], row[10], row[13], row[14], row[23], row[28]]:
-                    continue
-                else:
-                    # transform datetime
-                    date_time = row[0].split(' ')
-                    e_date = date_time[0].split('/')
-                    e_time = date_time[1].split(':')
-                    entry_date = datetime(
-                    int('20' + e_date[2]), # year
-                    int(e_date[1]), # month
-                    int(e_date[0]), # day
-                    int(e_time[0]), # hour
-                    int(e_time[1])) # minute
-                    # correct entry_dates to be always at the half hour
-                    if entry_date.minute%30 != 0:
-                        difference = entry_date.minute%30
-                        if difference >= 15:
-                            entry_date += timedelta(minutes=30-difference)
-                        else:
-                            entry_date -= timedelta(minutes=difference)
-                    # replace commas with dots so Python can understand it
-                    pressure = row[1].replace( ',', '.')
-                    rainrate = row[23].replace( ',', '.')
-                    data.append([entry_date, row[7], pressure, row[10], row[13], row[14], rainrate, row[28]])
-
-        # sort out entries that are not in a gap
-        gaps = self.get_gaps(self.get_entries())
-        gap_index = 0
-        data_index = 0
-        new_data = []
-        while True:
-            if data[data_index][0] < gaps[gap_index][0]: # if data earlier than next gap
-                data_index += 1
-            elif data[data_index][0] > gaps[gap_index][1]: # if data later than next gap
-                gap_index += 1
-            else: # if data in gap
-                # add row to new_data
-                data[data_index][0] = data[data_index][0].isoformat(sep=' ') # transform datetime into string
-                new_data.append(data[data_index])
-                data_index += 1
-            if data_index == len(data) or gap_index == len(gaps):
-                break
-
-        def write_data():
+        log = getLogger(self.name)
+        for attempt in range(self.retries + 1):
+            self.wait()
+            start = time.perf_counter()
             try:
-                db.cursor.executemany("INSERT INTO `{table}` (`entryDate`, `temp`, `pressure`, `hum`, `windspeed`, `winddir`, `rainrate`, `uvindex`)\
- VALUES ( %s, %s, %s, %s, %s, %s, %s, %s);".format(table=self.config['table']), new_data)
-                db.con.commit()
-                return True, None
-            except AttributeError as e:
-                return None, DBConnectionError(e)
-        timeout = TimeoutHelper(write_data)
-        timeout.timer(self.config['timeoutMs'], DBTimeoutError)
-
-        return len(new_data)
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.Timeout:
+                log.error(f'request timed out after {(time.perf_counter() - start)*1000:.0f} ms')
+                raise ApiTimeoutError()
+            except requests.ConnectionError as e:
+                raise ApiConnectionError(e)
+            if r.status_code != 429 and r.status_code < 500:
+                break
+            if attempt == self.retries:
+                raise ApiConnectionError(requests.HTTPError(f'status {r.status_code} after {attempt + 1} requests', response=r))
+            retry_after = r.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdecimal() else self.backoff_s * 2**attempt
+            log.warning(f'status {r.status_code}, retrying in {delay:.1f} s')
+            time.sleep(delay)
+        try:
+            data = r.json() # parses dict of json response
+        except requests.exceptions.JSONDecodeError as e:
+            raise ApiConnectionError(e)
+        log.info(f'request took {(time.perf_counter() - start)*1000:.0f} ms '
+            + f'(server: {r.elapsed.total_seconds()*1000:.0f} ms, {len(r.content)} bytes)')
+        return data
 
 class Api1:
     '''
@@ -532,6 +2247,8 @@ class Api1:
     token: str
             unique API-Token. Don't share with anyone!
             If compromised generate a new one at https://www.weatherlink.com/account
+    session: ApiSession
+            keeps the connection to the Api alive between the requests
 
     Methods
     -------
@@ -550,6 +2267,7 @@ class Api1:
         self.user = self.config['user']
         self.password = self.config['pass']
         self.token = self.config['apiToken']
+        self.session = ApiSession('API1', self.config['timeoutMs'])
 
     def check(self):
         '''
@@ -574,25 +2292,12 @@ class Api1:
                         ApiConnectionError
                         ApiTimeoutError
         '''
-        ans = None
         payload = {
             'user': self.user,
             'pass': self.password,
             'apiToken': self.token
         }
-        # this function gets executed in another thread
-        def req():
-            try:
-                r = requests.get(self.url, params=payload)
-                return r, None
-            except requests.ConnectionError as e:
-                return None, ApiConnectionError(e)
-        timeout = TimeoutHelper(req)
-        # this starts the thread with req() and a timer
-        # finishes the timer before the function is executed, a timeout error is raised
-        r = timeout.timer(self.config['timeoutMs'], ApiTimeoutError)
-
-        return r.json()  # parses dict of json response
+        return self.session.get(self.url, payload)
 
     def get_values(self, time_=None):
         '''
@@ -660,41 +2365,7 @@ class Api1:
         try:
             # wind direction
             w_dir = int(data['wind_degrees'])
-            w_dir_str = None
-            # convert degrees into compass directions
-            if w_dir >= 349 or w_dir <= 11:
-                w_dir_str = 'N'
-            elif w_dir >= 12 and w_dir <= 33:
-                w_dir_str = 'NNO'
-            elif w_dir >= 34 and w_dir <= 56:
-                w_dir_str = 'NO'
-            elif w_dir >= 57 and w_dir <= 78:
-                w_dir_str = 'ONO'
-            elif w_dir >= 79 and w_dir <= 101:
-                w_dir_str = 'O'
-            elif w_dir >= 102 and w_dir <= 123:
-                w_dir_str = 'OSO'
-            elif w_dir >= 124 and w_dir <= 146:
-                w_dir_str = 'SO'
-            elif w_dir >= 147 and w_dir <= 168:
-                w_dir_str = 'SSO'
-            elif w_dir >= 169 and w_dir <= 191:
-                w_dir_str = 'S'
-            elif w_dir >= 192 and w_dir <= 213:
-                w_dir_str = 'SSW'
-            elif w_dir >= 214 and w_dir <= 236:
-                w_dir_str = 'SW'
-            elif w_dir >= 237 and w_dir <= 258:
-                w_dir_str = 'WSW'
-            elif w_dir >= 259 and w_dir <= 281:
-                w_dir_str = 'W'
-            elif w_dir >= 282 and w_dir <= 303:
-                w_dir_str = 'WNW'
-            elif w_dir >= 304 and w_dir <= 326:
-                w_dir_str = 'NW'
-            elif w_dir >= 327 and w_dir <= 348:
-                w_dir_str = 'NNW'
-            val_list['wind_dir'] = w_dir_str
+            val_list['wind_dir'] = compass(w_dir)
         except KeyError as e:
             error_handler()
         try:
@@ -735,13 +2406,32 @@ class Api2:
             If compromised generate a new one at https://www.weatherlink.com/account
     station_id: str
             ID which identifies the weather station the data is requested from
+    station_ids: list
+            IDs of the stations that are polled every half hour in the multi-station mode
+    session: ApiSession
+            keeps the connection to the Api alive between the requests
+    historic_session: ApiSession
+            session for the historic data, limited to requestsPerS requests per second
+            and retried historicRetries times if the Api is overloaded
 
     Methods
     -------
     check():
             Checks the connection with the Api
-    request():
+    request(station_id=None):
             Makes an HTTPS request with the values and the calculated signature.
+    request_historic(station_id, start, end):
+            Makes an HTTPS request for the archive records of a station between two timestamps.
+    to_values(record, time_):
+            Converts the values of the Api into the list of values for the db.
+    get_values(station_id, time_=None):
+            Extracts the values for the db from the current conditions of a station.
+    poll_stations(time_=None):
+            Gets the values of all stations in station_ids at once.
+    get_historic(station_id, start, end, interval=30):
+            Returns the rows for the db of the archive records between start and end.
+    backfill(gaps, station_id=None, interval=30, progress=None):
+            Gets the archive records of all gaps with concurrent requests.
     get_stations():
             Makes an HTTPS request to get all the possible station IDs and returns the answer in a compact format.
     '''
@@ -752,6 +2442,15 @@ class Api2:
         self.key = self.config['api-key']
         self.secret = self.config['api-secret']
         self.station_id = self.config['stationID']
+        # looks like [12345, 67890], empty if only the station of Api1 is polled
+        ids = self.config['stationIDs']
+        if isinstance(ids, str): # or "12345,67890" like in older config files
+            ids = ids.split(',')
+        self.station_ids = [int(i) for i in ids if str(i).strip()]
+        self.session = ApiSession('API2', self.config['timeoutMs'], pool_size=self.config['maxWorkers'])
+        self.historic_session = ApiSession('API2', self.config['timeoutMs'],
+            pool_size=self.config['historicWorkers'], rate=self.config['requestsPerS'],
+            retries=self.config['historicRetries'], backoff_s=self.config['historicBackoffS'])
 
     def check(self):
         '''
@@ -763,17 +2462,23 @@ class Api2:
         '''
         self.request()
 
-    def request(self):
+    def request(self, station_id=None):
         '''
         Return dict from Api2 https request.
 
+                Parameters:
+                        station_id (int): station of which the current conditions are requested,
+                            the configured stationID if None
+
                 Exceptions:
                         ApiConnectionError
                         ApiTimeoutError
         '''
+        if station_id == None:
+            station_id = self.station_id
         # create api signature for verification of the user
         t = int(time.time())
-        param_str = f'api-key{self.key}station-id{self.station_id}t{t}'
+        param_str = f'api-key{self.key}station-id{station_id}t{t}'
         hmac_obj = hmac.new(str.encode(self.secret), str.encode(param_str), 'sha256')
         api_signature = hmac_obj.hexdigest()
 
@@ -782,19 +2487,225 @@ class Api2:
             't': t,
             'api-signature': api_signature
         }
-        # this function gets executed in another thread
-        def req():
+        return self.session.get(self.url + 'current/' + str(station_id), payload)
+
+    def request_historic(self, station_id, start: int, end: int):
+        '''
+        Return the archive records of a station between two unix timestamps.
+        The Api allows at most 24 hours per request.
+
+                Parameters:
+                        station_id (int): station of which the records are requested
+                        start (int): start-timestamp
+                        end (int): end-timestamp
+
+                Exceptions:
+                        ApiConnectionError
+                        ApiTimeoutError
+        '''
+        # create api signature for verification of the user, the parameters are sorted by name
+        t = int(time.time())
+        param_str = f'api-key{self.key}end-timestamp{end}start-timestamp{start}station-id{station_id}t{t}'
+        hmac_obj = hmac.new(str.encode(self.secret), str.encode(param_str), 'sha256')
+        api_signature = hmac_obj.hexdigest()
+
+        payload = {
+            'api-key': self.key,
+            't': t,
+            'start-timestamp': start,
+            'end-timestamp': end,
+            'api-signature': api_signature
+        }
+        return self.historic_session.get(self.url + 'historic/' + str(station_id), payload)
+
+    def to_values(self, record: dict, time_):
+        '''
+        Convert the values of the Api into a list of values like Api1.get_values().
+        The current conditions and the archive records use different names for some values,
+        the first name that exists in record is used.
+
+                Parameters:
+                        record (dict): values of all sensors of a station at one time
+                        time_: entryDate of the row
+
+                Returns:
+                        [time_, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+
+                Exceptions:
+                        DataIncompleteError
+        '''
+        conversions = [
+            (('temp', 'temp_last', 'temp_out'), lambda v: round((v - 32) / 1.8, 1)), # convert from °F to °C
+            (('bar_sea_level', 'bar'), lambda v: round(v * 33.8639, 1)), # convert from inHg to mbar
+            (('hum', 'hum_last', 'hum_out'), round),
+            (('wind_speed_last', 'wind_speed_avg'), lambda v: v * 1.60934), # convert from mph into km/h
+            (('wind_dir_last', 'wind_dir_of_prevail'), lambda v: compass(round(v) % 360)),
+            (('rain_rate_last_mm', 'rain_rate_hi_mm'), float),
+            (('uv_index', 'uv_index_avg'), float)]
+        values = [time_]
+        error = DataIncompleteError()
+        for keys, convert in conversions:
+            key = next((k for k in keys if k in record), None)
+            if key != None:
+                values.append(str(convert(record[key])))
+            else:
+                error.missing.append(keys[0])
+        if error.missing:
+            raise error
+        return values
+
+    def get_values(self, station_id, time_=None):
+        '''
+        Make an Api2 request for the current conditions of a station and
+        convert them into a list of values like Api1.get_values().
+
+                Parameters:
+                        station_id (int): station of which the values are requested
+                        time_ (str): overwrites the entryDate value in the list
+
+                Returns:
+                        [time, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+
+                Exceptions:
+                        ApiConnectionError
+                        DataIncompleteError
+                        WStOfflineError
+                        ApiTimeoutError
+        '''
+        if not time_:
+            time_ = time_utils.get_now(string=True)
+        data = self.request(station_id)
+
+        # the values are spread over the sensors (ISS, barometer, ...) of the station
+        current = {}
+        for sensor in data.get('sensors', []):
+            for d in sensor.get('data', []):
+                current.update({k: v for k, v in d.items() if v != None})
+
+        # check if data is up to date
+        if 'ts' in current:
+            datet = datetime.utcfromtimestamp(current['ts']) + timedelta(hours=1) # CET like time_utils.get_now()
+            if time_utils.get_now() - datet > timedelta(minutes=self.config['dataMaxAge']):
+                raise WStOfflineError(datet)
+
+        return self.to_values(current, time_)
+
+    def poll_stations(self, time_=None):
+        '''
+        Get the values of all stations in station_ids with concurrent requests,
+        at most maxWorkers at the same time.
+
+                Parameters:
+                        time_ (str): overwrites the entryDate value of the rows
+
+                Returns:
+                        (rows: [[station_id, time, temp, ...], ...], errors: {station_id: Exception, ...})
+        '''
+        log = getLogger('API2')
+        rows = []
+        errors = {}
+        if not self.station_ids:
+            return rows, errors
+        workers = min(len(self.station_ids), self.config['maxWorkers'])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='Api2') as executor:
+            futures = {executor.submit(self.get_values, i, time_): i for i in self.station_ids}
+            for future in as_completed(futures):
+                station_id = futures[future]
+                try:
+                    rows.append([station_id] + future.result())
+                except (ApiConnectionError, DataIncompleteError, WStOfflineError, ApiTimeoutError) as e:
+                    log.error(f'station {station_id} failed: {e.__class__.__name__}')
+                    errors[station_id] = e
+        return rows, errors
+
+    def get_historic(self, station_id, start: datetime, end: datetime, interval=30):
+        '''
+        Get the archive records of a station between start and end and convert them
+        into rows for the db. The entryDates are rounded to the nearest slot like the
+        entries of a download file. Records in which a value is missing are left out.
+
+                Parameters:
+                        station_id (int): station of which the records are requested
+                        start (datetime): first slot (CET)
+                        end (datetime): last slot (CET), at most 24 hours after start
+                        interval (int): minutes between two slots
+
+                Returns:
+                        [[entryDate: datetime, temp, pressure, hum, windspeed, winddir, rainrate, uvindex], ...]
+
+                Exceptions:
+                        ApiConnectionError
+                        ApiTimeoutError
+        '''
+        # records up to half an interval away from a slot are rounded to it
+        margin = timedelta(minutes=interval/2)
+        # CET -> UTC -> unix timestamp
+        start_ts = calendar.timegm((start - margin - timedelta(hours=1)).timetuple())
+        end_ts = calendar.timegm((end + margin - timedelta(hours=1)).timetuple())
+        data = self.request_historic(station_id, start_ts, end_ts)
+
+        # the records of the different sensors (ISS, barometer, ...) are merged by their timestamp
+        records = {}
+        for sensor in data.get('sensors', []) or []:
+            for d in sensor.get('data', []) or []:
+                if 'ts' in d:
+                    records.setdefault(d['ts'], {}).update({k: v for k, v in d.items() if v != None})
+        rows = []
+        for ts in sorted(records):
+            entry_date = datetime.utcfromtimestamp(ts) + timedelta(hours=1) # CET like time_utils.get_now()
             try:
-                r = requests.get(self.url + 'current/' + self.station_id + '?', params=payload)
-                return r, None
-            except requests.ConnectionError as e:
-                return None, ApiConnectionError(e)
-        timeout = TimeoutHelper(req)
-        # this starts the thread with req() and a timer
-        # if the timer finishes before the function is executed, a timeout error is raised
-        r = timeout.timer(self.config['timeoutMs'], ApiTimeoutError)
+                rows.append(self.to_values(records[ts], entry_date))
+            except DataIncompleteError:
+                continue
+        rows = csvImport.round_rows(rows, interval)
+        return [r for r in rows if start <= r[0] <= end]
+
+    def backfill(self, gaps, station_id=None, interval=30, progress=None):
+        '''
+        Get the archive records of all gaps from the historic endpoint.
+        The gaps are split into windows of up to 24 hours which are requested by
+        historicWorkers threads at once and at most requestsPerS times per second.
+
+                Parameters:
+                        gaps (list): [(start: datetime, end: datetime, count: int), ...] from Database.get_gaps()
+                        station_id (int): station of which the records are requested, the configured stationID if None
+                        interval (int): minutes between two slots
+                        progress (function): gets called after every window with
+                            the number of finished windows and the number of all windows
 
-        return r.json()  # parses json response to dict
+                Returns:
+                        (rows: list, done: [(start, end), ...], errors: {(start, end): Exception, ...})
+                        done are the windows that were requested successfully
+        '''
+        log = getLogger('API2')
+        if station_id == None:
+            station_id = self.station_id
+        windows = []
+        step = timedelta(days=1) - timedelta(minutes=interval)
+        for start, end, count in gaps:
+            while start <= end:
+                windows.append((start, min(start + step, end)))
+                start += step + timedelta(minutes=interval)
+        rows = []
+        done = []
+        errors = {}
+        if not windows:
+            return rows, done, errors
+        workers = min(len(windows), self.config['historicWorkers'])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='Api2-historic') as executor:
+            futures = {executor.submit(self.get_historic, station_id, s, e, interval): (s, e) for s, e in windows}
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    rows.extend(future.result())
+                    done.append(window)
+                except (ApiConnectionError, ApiTimeoutError) as e:
+                    log.error(f'historic data from {window[0]} to {window[1]} failed: {e.__class__.__name__}')
+                    errors[window] = e
+                if progress:
+                    progress(len(done) + len(errors), len(windows))
+        rows.sort(key=lambda r: r[0])
+        return rows, sorted(done), errors
 
     def get_stations(self):
         '''
@@ -816,19 +2727,7 @@ class Api2:
             't': t,
             'api-signature': api_signature
         }
-        # this function gets executed in another thread
-        def req():
-            try:
-                r = requests.get(self.url + 'stations?', params=payload)
-                return r, None
-            except requests.ConnectionError as e:
-                return None, ApiConnectionError(e)
-        timeout = TimeoutHelper(req)
-        # this starts the thread with req() and a timer
-        # finishes the timer before the function is executed, a timeout error is raised
-        r = timeout.timer(self.config['timeoutMs'], ApiTimeoutError)
-
-        stations = r.json()
+        stations = self.session.get(self.url + 'stations', payload)
         stations_compact = []
         for e in stations['stations']:
             new_station = {'station_id': e['station_id'], 'station_name': e['station_name']}
@@ -843,6 +2742,8 @@ class RequestTimer:
     ----------
     config: dict
             configuration data for requestTimer
+    interval: int
+            minutes between two requests
     show_msg: bool
             variable to set message visibility in the console as a configuration
     msg: bool
@@ -853,19 +2754,51 @@ class RequestTimer:
             variable to create requests in the timer thread for debugging
     next_req: datetime
             time when the next line will be added to the database
-    seconds_till_next: int
+    seconds_till_next: float
             seconds till the next requests gets triggered
     thread: Thread
             thread for the timer
+    event: threading.Event
+            set when run or trigger_debug_request are changed, wakes up the timer
+    lateness: float
+            seconds the last request was fired after its slot
+    max_lateness: float
+            largest lateness since the start of the program
+    missed_slots: int
+            number of slots that were skipped because the timer was too late (suspend, overload)
+    requests: int
+            number of requests fired by the timer
+    last_maintenance: date
+            day on which maintenance() did its jobs the last time
 
     Methods
     -------
     start():
             Creates thread for the timer and starts it.
     timer():
-            Counts seconds_till_next and calls make_req().
+            Waits until next_req and calls make_req().
+    wake():
+            Wakes up the timer from another thread.
+    due():
+            Returns the slot of a request that is due and records how late it is.
+    following(slot):
+            Returns the slot of the request after the one for slot.
+    maintenance():
+            Does the jobs for the db that are needed once a day.
     make_req(time=None, msg=True, debug=False):
             Makes request and adds row to the database.
+    api_failed(e, time):
+            Shows the message and sends the warning for an error of the Api1 request.
+    db_failed(e, time):
+            Shows the message and sends the warning for an error of the db.
+    resolved(api_errors_resolved, db_errors_resolved):
+            Sends the message that errors are resolved.
+    alert(func, *args):
+            Sends an email message.
+    stations_failed(e, time):
+            Shows the message for an error while adding the rows of the stations.
+    stations_msg(time, added, errors, msg=True):
+            Logs the result of the multi-station polling.
     line_msg(time, values, debug=False):
             Builds message for when a line is added to the database
     '''
@@ -873,53 +2806,143 @@ class RequestTimer:
     def __init__(self):
         # configuration
         self.config = config.data['requestTimer']
+        self.interval = config.data['db']['interval']
         self.show_msg = self.config['show_message']
         self.msg = True
+        self.event = Event()
         self.run = False
         self.trigger_debug_request = False
+        self.lateness = None
+        self.max_lateness = 0
+        self.missed_slots = 0
+        self.requests = 0
+        self.last_maintenance = None
+
+    @property
+    def run(self):
+        return self._run
+
+    @run.setter
+    def run(self, value):
+        self._run = value
+        self.wake()
+
+    @property
+    def trigger_debug_request(self):
+        return self._trigger_debug_request
+
+    @trigger_debug_request.setter
+    def trigger_debug_request(self, value):
+        self._trigger_debug_request = value
+        self.wake()
+
+    def wake(self):
+        '''Wake up timer(), can be called from every thread.'''
+        self.event.set()
 
     def start(self):
         '''Initiate thread with timer().'''
         log = getLogger('REQUEST TIMER')
-        self.next_req = time_utils.get_next()
+        self.next_req = time_utils.get_next(interval=self.interval)
         log.info('next request: ' + (self.next_req + timedelta(hours=time.localtime().tm_isdst)).isoformat(sep=' '))
-        self.seconds_till_next = (self.next_req-time_utils.get_now()).seconds
 
         self.thread = Thread(name='timer', target=self.timer, daemon=True)
         self.thread.start()
 
     def timer(self):
-        '''Time requests.'''
+        '''
+        Time requests.
+        The thread sleeps until the deadline of the next request on the monotonic clock
+        and only wakes up earlier if the CLI changes run or trigger_debug_request.
+        The deadline stays the same across these wakeups and is only calculated again
+        from the wall clock after maxSleepS seconds, so a suspend of the computer
+        or a change of the clock is noticed.
+        '''
         log = getLogger('REQUEST TIMER')
-        i = self.seconds_till_next + 1
         self.run = True
+        deadline = None # monotonic time of next_req
+        recheck = 0 # monotonic time when the deadline is calculated again
         try:
             while self.run:
                 if self.trigger_debug_request:
-                    self.trigger_debug_request = False
+                    self._trigger_debug_request = False
                     log.info('starting debug request')
                     self.make_req(time=time_utils.get_now(string=True), debug=True)
 
-                if i > 0:
-                    time.sleep(1)
-                    i -= 1
+                now = time.monotonic()
+                if deadline == None or now >= recheck:
+                    deadline = now + (self.next_req - time_utils.get_now(precise=True)).total_seconds()
+                    recheck = now + self.config['maxSleepS']
+                self.seconds_till_next = deadline - now
+                if self.seconds_till_next > 0:
+                    self.event.wait(min(deadline, recheck) - now)
+                    self.event.clear()
                 else:
+                    self.next_req = self.due()
                     log.info('starting request')
                     self.make_req(msg=self.msg)
-                    # calculate next request
-                    self.next_req = time_utils.get_next()
+                    self.maintenance()
+                    self.next_req = self.following(self.next_req)
+                    deadline = None
                     log.info('next request: ' + (self.next_req + timedelta(hours=time.localtime().tm_isdst)).isoformat(sep=' '))
-                    self.seconds_till_next = (self.next_req-time_utils.get_now()).seconds
-                    i = self.seconds_till_next + 1
         except BaseException as e:
             log.error('unhandled exception occurred')
             emailMessages.send_error(e)
             raise e
 
+    def due(self) -> datetime:
+        '''
+        Return the slot of the request that is due and record how late it is fired.
+        If the timer is later than one interval (e.g. after a suspend or a request
+        that took longer than the interval), the missed slots are counted and skipped
+        and the request is made for the last slot.
+
+                Returns:
+                        slot: datetime
+        '''
+        log = getLogger('REQUEST TIMER')
+        now = time_utils.get_now(precise=True)
+        slot = self.next_req
+        missed = int((now - slot) / timedelta(minutes=self.interval))
+        if missed > 0:
+            slot += timedelta(minutes=self.interval * missed)
+            self.missed_slots += missed
+            log.warning(f'{missed} slots missed, the timer was too late for {self.next_req.isoformat(sep=" ")}')
+        self.lateness = (now - slot).total_seconds()
+        self.max_lateness = max(self.max_lateness, self.lateness)
+        self.requests += 1
+        log.info(f'request for {slot.isoformat(sep=" ")} fired {self.lateness*1000:.0f} ms late')
+        return slot
+
+    def following(self, slot: datetime) -> datetime:
+        '''
+        Return the slot of the request after the one for slot.
+        This is the next slot, even if it has already started because the request took too long,
+        so due() counts the slots that were missed in the meantime.
+        If the clock was set back, it is the next slot of the wall clock instead.
+
+                Parameters:
+                        slot (datetime): slot of the last request
+        '''
+        return min(slot + timedelta(minutes=self.interval), time_utils.get_next(interval=self.interval))
+
+    def maintenance(self):
+        '''
+        Do the jobs for the db that are needed once a day after the first request of the day:
+        the partitions of the next years are added ahead of time.
+        '''
+        today = time_utils.get_now().date()
+        if self.last_maintenance == today:
+            return
+        self.last_maintenance = today
+        if config.data['db']['partitionYearsAhead'] > 0:
+            db.try_add_partitions()
+
     def make_req(self, time=None, msg=True, debug=False):
         '''
         Get values from Api1.get_values() and add them to the database.
         Trigger message if self.show_msg and self.msg is true.
+        The stations of Api2 are polled in another thread at the same time.
 
                 Parameters:
                         time (str): overwrites the time value for the new line
@@ -931,40 +2954,20 @@ class RequestTimer:
         if time == None:
             time = self.next_req.isoformat(sep=' ')
 
-        try:
-            db.ping() # reconnect to database if not connected
-        except (DBConnectionError, DBTimeoutError):
-            pass
-        
+        polling = None
+        if api2 != None and api2.station_ids:
+            # a slow station doesn't delay the request of Api1
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stations')
+            polling = executor.submit(api2.poll_stations, time)
+            executor.shutdown(wait=False)
+
         db_errors_resolved = False
         api_errors_resolved = False
         try:
             # get Values
             values = api1.get_values(time)
         except BaseException as e:
-            log.error('API1 request failed: ' + e.__class__.__name__)
-            if isinstance(e, ApiConnectionError):
-                s = f'\n--> {time} - Connection with Api1 failed!\n'
-                emailMessages.send_warning(e)
-            elif isinstance(e, DataIncompleteError):
-                log.error('missing data: ' + str(e.missing))
-                s = f'\n--> {time} - Data of request is incomplete!\n'
-                s += ' missing Data:\n'
-                s += cli.print_iterable(e.missing, indent=' - ') + '\n'
-                emailMessages.send_warning(e)
-            elif isinstance(e, WStOfflineError):
-                log.error('last online: ' + e.last_online.isoformat(sep=" "))
-                s = f'\n--> {time} - Data of request is outdated!\n'
-                s += ' last online: '
-                s += e.last_online.isoformat(sep=" ") + '\n'
-                emailMessages.send_warning(e)
-            elif isinstance(e, ApiTimeoutError):
-                s = f'\n--> {time} - The request timed out!\n'
-                emailMessages.send_warning(e)
-            else: raise e
-            log.error('request failed')
-            s += cli.prompt
-            print(s, end='')
+            self.api_failed(e, time)
         else:
             log.info('API1 request OK')
             api_errors_resolved = True
@@ -972,20 +2975,7 @@ class RequestTimer:
                 # add row to db
                 db.add_row(values)
             except BaseException as e:
-                log.error('Database connection failed: ' + e.__class__.__name__)
-                if isinstance(e, DBConnectionError):
-                    s = f'\n--> {time} - Connection with db failed!\n'
-                    emailMessages.send_warning(e)
-                elif isinstance(e, DBWritingError):
-                    s = f'\n--> {time} - Writing to db failed!\n'
-                    emailMessages.send_warning(e)
-                elif isinstance(e, DBTimeoutError):
-                    s = f"\n--> {time} - The db didn't respond!\n"
-                    emailMessages.send_warning(e)
-                else: raise e
-                log.error('request failed')
-                s += cli.prompt
-                print(s, end='')
+                self.db_failed(e, time)
             else:
                 log.info('Database connection OK')
                 db_errors_resolved = True
@@ -993,13 +2983,120 @@ class RequestTimer:
                 if self.show_msg and msg:
                     self.line_msg(time, values, debug=debug)
                 log.info('request successful')
+        self.resolved(api_errors_resolved, db_errors_resolved)
+        if polling != None:
+            try:
+                rows, errors = polling.result()
+                added = db.add_station_rows(rows)
+            except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                self.stations_failed(e, time)
+            else:
+                self.stations_msg(time, added, errors, msg)
+
+    def stations_failed(self, e, time):
+        '''
+        Show the message for an error while adding the rows of the stations to the db.
+
+                Parameters:
+                        e (Exception): error raised by Database.add_station_rows()
+                        time (str): time of the request
+        '''
+        log = getLogger('REQUEST TIMER')
+        log.error('adding the rows of the stations failed: ' + e.__class__.__name__)
+        print(f'\n--> {time} - Adding the rows of the stations failed!\n' + cli.prompt, end='')
+
+    def stations_msg(self, time, added, errors, msg=True):
+        '''
+        Log the result of the multi-station polling and show a message if a station failed.
+
+                Parameters:
+                        time (str): time of the request
+                        added (int): number of rows added to stationTable
+                        errors (dict): {station_id: Exception} stations without values
+                        msg (bool): determines if a message gets shown
+        '''
+        log = getLogger('REQUEST TIMER')
+        log.info(f'{added} of {len(api2.station_ids)} stations added')
+        if errors and self.show_msg and msg:
+            s = f'\n--> {time} - {len(errors)} of {len(api2.station_ids)} stations failed:\n'
+            for station_id, e in errors.items():
+                s += f' - {station_id}: {e.__class__.__name__}\n'
+            print(s + cli.prompt, end='')
+
+    def api_failed(self, e, time):
+        '''
+        Show the message and send the warning for an error of the Api1 request.
+
+                Parameters:
+                        e (Exception): error raised by Api1.get_values()
+                        time (str): time of the request
+        '''
+        log = getLogger('REQUEST TIMER')
+        log.error('API1 request failed: ' + e.__class__.__name__)
+        if isinstance(e, ApiConnectionError):
+            s = f'\n--> {time} - Connection with Api1 failed!\n'
+        elif isinstance(e, DataIncompleteError):
+            log.error('missing data: ' + str(e.missing))
+            s = f'\n--> {time} - Data of request is incomplete!\n'
+            s += ' missing Data:\n'
+            s += cli.print_iterable(e.missing, indent=' - ') + '\n'
+        elif isinstance(e, WStOfflineError):
+            log.error('last online: ' + e.last_online.isoformat(sep=" "))
+            s = f'\n--> {time} - Data of request is outdated!\n'
+            s += ' last online: '
+            s += e.last_online.isoformat(sep=" ") + '\n'
+        elif isinstance(e, ApiTimeoutError):
+            s = f'\n--> {time} - The request timed out!\n'
+        else: raise e
+        self.alert(emailMessages.send_warning, e)
+        log.error('request failed')
+        s += cli.prompt
+        print(s, end='')
+
+    def db_failed(self, e, time):
+        '''
+        Show the message and send the warning for an error while adding the row to the db.
+
+                Parameters:
+                        e (Exception): error raised by Database.add_row()
+                        time (str): time of the request
+        '''
+        log = getLogger('REQUEST TIMER')
+        log.error('Database connection failed: ' + e.__class__.__name__)
+        if isinstance(e, DBConnectionError):
+            s = f'\n--> {time} - Connection with db failed!\n'
+        elif isinstance(e, DBWritingError):
+            s = f'\n--> {time} - Writing to db failed!\n'
+        elif isinstance(e, DBTimeoutError):
+            s = f"\n--> {time} - The db didn't respond!\n"
+        else: raise e
+        if getattr(e, 'buffered', False):
+            log.info('row saved in the buffer')
+            s += ' The values are buffered and get added when the db is reachable again.\n'
+        self.alert(emailMessages.send_warning, e)
+        log.error('request failed')
+        s += cli.prompt
+        print(s, end='')
+
+    def resolved(self, api_errors_resolved, db_errors_resolved):
+        '''
+        Send the message that the errors of the Api1 or the db are resolved.
+
+                Parameters:
+                        api_errors_resolved (bool): the Api1 request was successful
+                        db_errors_resolved (bool): the row was added to the db
+        '''
         if db_errors_resolved or api_errors_resolved:
             resolved_list = []
             if api_errors_resolved:
                 resolved_list.extend(['ApiConnectionError', 'DataIncompleteError', 'WStOfflineError', 'ApiTimeoutError'])
             if db_errors_resolved:
                 resolved_list.extend(['DBConnectionError', 'DBWritingError', 'DBTimeoutError'])
-            emailMessages.resolved(resolved_list)
+            self.alert(emailMessages.resolved, resolved_list)
+
+    def alert(self, func, *args):
+        '''Queue an email message with func(*args) for the email worker, so the timer doesn't wait for the mail server.'''
+        emailMessages.queue_message(func, *args)
 
     def line_msg(self, time, values, debug=False):
         '''Build message for when a new line is added to the database.
@@ -1025,6 +3122,210 @@ class RequestTimer:
             msg += cli.prompt
         print(msg, end='')
 
+class AsyncRequestTimer(RequestTimer):
+    '''
+    A RequestTimer that uses an asyncio event loop instead of a thread that sleeps one second at a time
+
+    The loop runs in its own thread. The Api request and the db write are stages with
+    their own deadline, the email messages are sent by the email worker like in RequestTimer.
+    The CLI (in another thread) controls the timer through run and trigger_debug_request,
+    which wake up the loop with thread-safe calls.
+
+    Attributes
+    ----------
+    loop: asyncio.AbstractEventLoop
+            event loop of the timer, None if the timer was never started
+    wakeup: asyncio.Event
+            set when run or trigger_debug_request are changed
+    executor: ThreadPoolExecutor
+            threads for the blocking stages, at most stageWorkers of the config
+
+    Methods
+    -------
+    start():
+            Creates the event loop in a new thread and starts timer_async() in it.
+    timer_async():
+            Waits for the next request or a wakeup and calls make_req_async().
+    make_req_async(time=None, msg=True, debug=False):
+            Like make_req(), but every stage has a deadline.
+    stage(name, func, *args, deadline_ms, error, cancel=None):
+            Executes a blocking function in a thread of the executor with a deadline.
+    late_result(name, future):
+            Logs the result of a stage that finished after its deadline.
+    wake():
+            Wakes up timer_async() from another thread.
+    '''
+
+    def __init__(self):
+        self.loop = None
+        self.wakeup = None
+        self.executor = None
+        super().__init__()
+
+    def wake(self):
+        '''Wake up timer_async(), can be called from every thread.'''
+        if self.loop != None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def start(self):
+        '''Create the event loop in a new thread and start timer_async() in it.'''
+        self.run = True
+        self.loop = asyncio.new_event_loop()
+        # stages that hang keep their thread, so the number of threads is limited
+        self.executor = ThreadPoolExecutor(max_workers=self.config['stageWorkers'], thread_name_prefix='stage')
+        self.loop.set_default_executor(self.executor)
+        self.thread = Thread(name='timer', target=self.loop.run_until_complete, args=(self.timer_async(),), daemon=True)
+        self.thread.start()
+
+    async def timer_async(self):
+        '''Time requests.'''
+        log = getLogger('REQUEST TIMER')
+        self.wakeup = asyncio.Event()
+        try:
+            self.next_req = time_utils.get_next(interval=self.interval)
+            log.info('next request: ' + (self.next_req + timedelta(hours=time.localtime().tm_isdst)).isoformat(sep=' '))
+            while self.run:
+                if self.trigger_debug_request:
+                    self._trigger_debug_request = False
+                    log.info('starting debug request')
+                    await self.make_req_async(time=time_utils.get_now(string=True), debug=True)
+
+                self.seconds_till_next = (self.next_req - time_utils.get_now(precise=True)).total_seconds()
+                if self.seconds_till_next > 0:
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), min(self.seconds_till_next, self.config['maxSleepS']))
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    self.next_req = self.due()
+                    log.info('starting request')
+                    await self.make_req_async(msg=self.msg)
+                    await asyncio.to_thread(self.maintenance)
+                    self.next_req = self.following(self.next_req)
+                    log.info('next request: ' + (self.next_req + timedelta(hours=time.localtime().tm_isdst)).isoformat(sep=' '))
+        except BaseException as e:
+            log.error('unhandled exception occurred')
+            emailMessages.send_error(e)
+            raise e
+
+    async def make_req_async(self, time=None, msg=True, debug=False):
+        '''
+        Get values from Api1.get_values() and add them to the database like make_req().
+        The Api request and the db write are cancelled when they exceed
+        apiDeadlineMs or dbDeadlineMs of the config.
+        The stations of Api2 are polled at the same time.
+
+                Parameters:
+                        time (str): overwrites the time value for the new line
+                        msg (bool): determines if a message for the added line gets shown
+                        debug (bool): gets passed on to line_msg()
+        '''
+        log = getLogger('REQUEST TIMER')
+
+        if time == None:
+            time = self.next_req.isoformat(sep=' ')
+
+        polling = None
+        if api2 != None and api2.station_ids:
+            # a slow station doesn't delay the request of Api1
+            polling = asyncio.ensure_future(self.stage('Api2 stations', api2.poll_stations, time,
+                deadline_ms=self.config['apiDeadlineMs'], error=ApiTimeoutError))
+
+        db_errors_resolved = False
+        api_errors_resolved = False
+        try:
+            # get Values
+            values = await self.stage('Api1 request', api1.get_values, time,
+                deadline_ms=self.config['apiDeadlineMs'], error=ApiTimeoutError)
+        except Exception as e:
+            self.api_failed(e, time)
+        else:
+            log.info('API1 request OK')
+            api_errors_resolved = True
+            try:
+                # add row to db
+                await self.stage('Database write', db.add_row, values,
+                    deadline_ms=self.config['dbDeadlineMs'], error=DBTimeoutError, cancel=db.kill_running)
+            except Exception as e:
+                self.db_failed(e, time)
+            else:
+                log.info('Database connection OK')
+                db_errors_resolved = True
+                # message
+                if self.show_msg and msg:
+                    self.line_msg(time, values, debug=debug)
+                log.info('request successful')
+        self.resolved(api_errors_resolved, db_errors_resolved)
+        if polling != None:
+            try:
+                rows, errors = await polling
+            except ApiTimeoutError:
+                rows, errors = [], {i: ApiTimeoutError() for i in api2.station_ids}
+            try:
+                added = await self.stage('Database write of the stations', db.add_station_rows, rows,
+                    deadline_ms=self.config['dbDeadlineMs'], error=DBTimeoutError, cancel=db.kill_running)
+            except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                self.stations_failed(e, time)
+            else:
+                self.stations_msg(time, added, errors, msg)
+
+    async def stage(self, name, func, *args, deadline_ms, error, cancel=None):
+        '''
+        Execute the blocking function func(*args) in a thread and wait for it until the deadline.
+        A thread can't be stopped from outside, so after the deadline cancel gets called with the ident
+        of the thread (e.g. to kill its query) and the result is awaited for another deadline_ms.
+        If func has not started yet, it is removed from the executor instead.
+        The result of func is returned or raised if it arrives then (e.g. a row that got buffered
+        because its query was killed), otherwise it is only logged by late_result().
+
+                Parameters:
+                        name (str): name of the stage for the log
+                        func (function): function that gets executed
+                        deadline_ms (int): time in ms the stage may take
+                        error (Exception): class of the error that is raised after the deadline
+                        cancel (function): gets the ident of the thread after the deadline
+
+                Returns:
+                        the value returned by func
+        '''
+        log = getLogger('REQUEST TIMER')
+        idents = []
+        def run():
+            idents.append(get_ident())
+            return func(*args)
+        future = self.loop.run_in_executor(None, run)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), deadline_ms/1000)
+        except asyncio.TimeoutError:
+            log.error(f'{name} exceeded its deadline of {deadline_ms} ms')
+        if not idents: # all threads of the executor are busy, func never started
+            future.cancel()
+        elif cancel != None:
+            cancel(idents[0]) # not in the executor, its threads may all hang
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), deadline_ms/1000)
+            except asyncio.TimeoutError:
+                pass
+        future.add_done_callback(lambda f: self.late_result(name, f))
+        raise error()
+
+    def late_result(self, name, future):
+        '''
+        Log the result of a stage that finished after stage() stopped waiting for it.
+
+                Parameters:
+                        name (str): name of the stage for the log
+                        future (asyncio.Future): future of the stage
+        '''
+        log = getLogger('REQUEST TIMER')
+        if future.cancelled():
+            return
+        if future.exception() != None:
+            log.warning(f'{name} failed after its deadline: {future.exception()!r}')
+        else:
+            log.warning(f'{name} finished after its deadline')
+
 class CLI(cmd.Cmd):
     '''
     A class for the Command Line Interface of the program.
@@ -1163,12 +3464,68 @@ class CLI(cmd.Cmd):
         else:
             log.info('Database OK')
             # msg in chat that all is well
-            s += ' established\n\n'
+            s += ' established\n'
+            # table of the multi-station mode
+            if api2 != None and api2.station_ids:
+                s += ' Station table:'
+                try:
+                    db.create_station_table()
+                except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                    log.error('creating the station table failed: ' + e.__class__.__name__)
+                    s += ' not created!\n'
+                else:
+                    s += f' ready for {len(api2.station_ids)} stations\n'
+            # rollup tables
+            if config.data['db']['rollups']:
+                s += ' Rollup tables:'
+                try:
+                    db.create_rollup_tables()
+                except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                    log.error('creating the rollup tables failed: ' + e.__class__.__name__)
+                    s += ' not created!\n'
+                else:
+                    s += ' ready\n'
+            # schema
+            s += ' Schema version:'
+            try:
+                version = db.schema_version()
+            except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                log.error('reading the schema version failed: ' + e.__class__.__name__)
+                s += ' unknown!\n'
+            else:
+                pending = len(migrations.pending(db.applied_migrations(), config.data['db']))
+                s += f' {version}'
+                if pending:
+                    s += f' ({pending} migrations pending, use "database migrate")'
+                s += '\n'
+            # archive
+            if db.archive.years():
+                s += ' Archived years: ' + ', '.join(str(y) for y in db.archive.years()) + '\n'
+            # coverage cache
+            s += ' Coverage cache:'
+            try:
+                changed = db.load_coverage()
+            except (DBConnectionError, DBTimeoutError) as e:
+                log.error('loading coverage cache failed: ' + e.__class__.__name__)
+                s += ' not loaded!\n\n'
+            else:
+                if changed == -1:
+                    s += ' created\n\n'
+                else:
+                    s += f' loaded ({changed} months updated)\n\n'
         print(s, end='')
 
+        # email worker, sends the messages of the request timer in the background
+        email_config = config.data['email']
+        emailMessages.start_worker(email_config['retries'], email_config['backoffS'],
+            email_config['idleS'], email_config['timeoutS'], email_config['stopS'])
+
         # request timer
         global req_timer
-        req_timer = RequestTimer()
+        if config.data['requestTimer']['engine'] == 'asyncio':
+            req_timer = AsyncRequestTimer()
+        else:
+            req_timer = RequestTimer()
         if start_req_timer:
             log.info('start RequestTimer')
             req_timer.start()
@@ -1260,12 +3617,21 @@ class CLI(cmd.Cmd):
         '''Connect to the database, Inspect and repair the gaps in the database made by downtime'''
         log = getLogger('DATABASE')
         arg = arg.rstrip('\n').split()
+        # "--station ID" selects a station of the multi-station mode for gaps and mend
+        station_id = None
+        if '--station' in arg:
+            i = arg.index('--station')
+            if i + 1 == len(arg) or not arg[i + 1].isdecimal():
+                print('Usage: database gaps|mend|backfill --station ID')
+                return
+            station_id = int(arg[i + 1])
+            del arg[i:i + 2]
         if len(arg) == 0:
             arg.append('')
         if arg[0] == 'ping':
             log.info('pinging Database')
             try:
-                db.ping()
+                replayed = db.ping()
             except DBConnectionError:
                 log.error('connection failed: DBConnectionError')
                 print("Connection to the database failed!")
@@ -1275,11 +3641,62 @@ class CLI(cmd.Cmd):
             else:
                 log.info('connection OK')
                 print('Connection to the database established')
+                if replayed:
+                    print(f'{replayed} buffered entries added')
         elif arg[0] == 'mend':
             # find available files and show enumerated list of names
             path = 'add_data/'
             file_list = os.listdir(path)
             download_files = [f for f in file_list if os.path.isfile(path + f) and f.endswith('.csv')]
+
+            def progress(added, seconds):
+                print(f'\r {added} entries added ({added/max(seconds, 0.001):.0f} entries/s)', end='')
+
+            def load(file_names):
+                '''add the data of the files to the db and show the result, returns if it was successful'''
+                try:
+                    if len(file_names) == 1:
+                        new_entries = db.load_file(path + file_names[0], progress=progress, station_id=station_id)
+                    else:
+                        new_entries = db.load_files([path + f for f in file_names], progress=progress, station_id=station_id)
+                    log.info(f'{new_entries} entries added')
+                    print(f'\n{new_entries} new entries added!')
+                    return True
+                except DBConnectionError as e:
+                    log.error('connection failed: DBConnectionError')
+                    print("\nConnection to the database was not established!")
+                    print(f'{e.added} entries were added before.')
+                except DBWritingError as e:
+                    log.error('writing failed: DBWritingError')
+                    print("\nWriting to the database failed!")
+                    print(f'{e.added} entries were added before.')
+                except DBTimeoutError as e:
+                    log.error('connection failed: DBTimeoutError')
+                    print("\nWriting to the Database took too long!")
+                    print(f'{e.added} entries were added before.')
+                # the remaining gaps of the files are only known if all their entries were added
+                print('The remaining gaps are not saved, use "database mend" again.')
+                return False
+
+            def add_df_range_to_file(file_names):
+                '''save the ranges of the download files in add_data/.remaining_gaps'''
+                saved_gaps = db.get_saved_gaps(station_id)
+                for file_name in file_names:
+                    # extract start and end of data from download file
+                    date_range = download_file.extract_range(file_name, db.interval) # looks like (start: datetime, end: datetime)
+                    saved_gaps.add(*date_range)
+                saved_gaps.save()
+
+            if len(arg) > 1 and arg[1] == '--all':
+                if not download_files:
+                    print('There are no download files in add_data/!')
+                    return
+                log.info('files chosen for mending: ' + ', '.join(download_files))
+                print(f'Mending with {len(download_files)} files...')
+                if load(download_files):
+                    add_df_range_to_file(download_files)
+                return
+
             print('\nSelect the file you want to use for mending:')
             for i, e in enumerate(download_files):
                 print('', i, '->', e)
@@ -1295,109 +3712,257 @@ class CLI(cmd.Cmd):
                 if ans.isdecimal() and int(ans) in range(len(download_files)):
                     file_name = download_files[int(ans)]
                     log.info('file chosen for mending: ' + file_name)
-            
-                    try:
-                        new_entries = db.load_file(path + file_name)
-                        log.info(f'{new_entries} entries added')
-                        print(f'{new_entries} new entries added!')
-                    except DBConnectionError as e:
-                        log.error('connection failed: DBConnectionError')
-                        print("Connection to the database was not established!")
-                    except DBTimeoutError as e:
-                        log.error('connection failed: DBTimeoutError')
-                        print("Writing to the Database took too long!")
-
-                    def add_df_range_to_file():
-                        ''''''
-                        # extract start and end of data from download file
-                        date_range = download_file.extract_range(file_name) # looks like (start: datetime, end: datetime)
-
-                        # read data from file
-                        # this is very similar to the code in Database.get_gaps()
-                        try:
-                            f = open('add_data/.remaining_gaps')
-                            range_str_l = f.readlines()
-                            # parse into datetime objects
-                            gap_l = []
-                            for l in range_str_l:
-                                if l == '':
-                                    raise FileNotFoundError
-                                l.strip('\n') # looks like "2012-01-01T00:00:00 2013-01-01T00:00:00"
-                                l2 = l.split()
-                                gap_l.append((datetime.fromisoformat(l2[0]), datetime.fromisoformat(l2[1])))
-                            f.close()
-                        except FileNotFoundError:
-                            gap_l = []
-
-                        # merge new range into gap file
-                        new_ranges = []
-                        first_date_placed = False
-                        second_placed = False
-                        # 0 -> the start of the file range is before the gap
-                        # 1 -> the start of the file range is in the gap
-                        state = None
-                        first_i = None # index of gap_l
-                        i = 0
-                        while i < len(gap_l): # find position of the start of the file range
-                            if date_range[0] < gap_l[i][0]: # start of file range is before gap
-                                state = 0
-                                first_i = i
-                                first_date_placed = True
-                                break
-                            elif date_range[0] < gap_l[i][1]: # start of file range is in gap
-                                state = 1
-                                first_i = i
-                                first_date_placed = True
-                                break
-                            new_ranges.append(gap_l[i])
-                            i += 1
-                        if not first_date_placed: # start of file range is after all gaps
-                            new_ranges = gap_l + [date_range]
-                        elif state == None: # only possible if gap_l is empty
-                            new_ranges = [date_range] + gap_l
-                        else:
-                            while i < len(gap_l): # find position of second date in range
-                                if date_range[1] < gap_l[i][0]: # before
-                                    if state == 0:
-                                        new_ranges.append(date_range)
-                                    elif state == 1:
-                                        new_ranges.append((gap_l[first_i][0], date_range[1]))
-                                    new_ranges += gap_l[i:]
-                                    second_placed = True
-                                    break
-                                elif date_range[1] < gap_l[i][1]: # in
-                                    if state == 0:
-                                        new_ranges.append((date_range[0], gap_l[i][1]))
-                                    elif state == 1:
-                                        new_ranges.append((gap_l[first_i][0], gap_l[i][1]))
-                                    new_ranges += gap_l[i+1:]
-                                    second_placed = True
-                                    break
-                                i += 1
-                            if not second_placed:
-                                new_ranges.append((date_range[0], date_range[1]))
-
-                        # parse data to string
-                        range_str = ''
-                        for e in new_ranges:
-                            range_str += datetime.isoformat(e[0]) + ' ' + datetime.isoformat(e[1]) + '\n'
-
-                        # save new data in file
-                        f = open('add_data/.remaining_gaps', mode='w')
-                        f.write(range_str)
-                        f.close
-
-                    add_df_range_to_file()
+                    if load([file_name]):
+                        add_df_range_to_file([file_name])
                 elif ans == 'q':
                     break
+        elif arg[0] == 'export':
+            # database export --from DATE --to DATE [--format csv|jsonl] [--columns temp,hum,...]
+            usage = 'Usage: database export --from YYYY-MM-DD --to YYYY-MM-DD [--format csv|jsonl] [--columns temp,hum,...]'
+            options = dict(zip(arg[1::2], arg[2::2]))
+            try:
+                start = datetime.fromisoformat(options['--from'])
+                end = datetime.fromisoformat(options['--to'])
+            except (KeyError, ValueError):
+                print(usage)
+                return
+            format_ = options.get('--format', 'csv')
+            columns = list(compactColumns.COLUMNS)
+            if '--columns' in options:
+                columns = ['entryDate'] + [c for c in options['--columns'].split(',') if c and c != 'entryDate']
+            unknown = [c for c in columns if c not in compactColumns.COLUMNS]
+            if len(arg) % 2 == 0 or format_ not in ('csv', 'jsonl') or unknown:
+                print(usage)
+                return
+            os.makedirs('exports', exist_ok=True)
+            file_name = f"exports/{config.data['db']['table']}_{start:%Y%m%d}_{end:%Y%m%d}.{format_}"
+            log.info(f'exporting {start} to {end} into {file_name}')
+
+            def progress(count, seconds):
+                print(f'\r {count} entries exported ({count/max(seconds, 0.001):.0f} entries/s)', end='')
+
+            try:
+                count = csvImport.write_export(db.iter_range(start, end, columns), columns, file_name, format_, progress)
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("\nConnection to the database failed!")
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("\nDatabase didn't respond!")
+            else:
+                log.info(f'{count} entries exported')
+                print(f'\n{count} entries exported into {file_name}')
+        elif arg[0] == 'partition':
+            try:
+                if len(arg) == 3 and arg[1] == '--detach' and arg[2].isdecimal():
+                    year = int(arg[2])
+                    if year not in [p[1] for p in db.partitions()]:
+                        print(f'There is no partition for {year}!')
+                        return
+                    log.info(f'detaching the partition of {year}')
+                    print(f'The entries of {year} are moved into {db.detach_partition(year)}')
+                elif len(arg) > 1:
+                    print('Usage: database partition [--detach YEAR]')
+                elif not db.partitions():
+                    print('The table gets copied to partition it, writing is blocked until it is done.')
+                    ans = input('continue?[y/n]:')
+                    if config.data['readline']:
+                        readline.remove_history_item(
+                            readline.get_current_history_length()-1
+                        )
+                    if ans != 'y':
+                        return
+                    log.info('partitioning the table')
+                    print(f'Table partitioned ({db.partition_table()} years)')
+                else:
+                    added = db.try_add_partitions()
+                    if added:
+                        print('Partitions added: ' + ', '.join(str(y) for y in added))
+                    print('Partitions:')
+                    for name, year, rows in db.partitions():
+                        print(f' - {name}: ~{rows} entries')
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("Connection to the database failed!")
+            except DBWritingError as e:
+                log.error('writing failed: DBWritingError ' + str(e.args))
+                print("Changing the partitions failed:", e.args)
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("Database didn't respond!")
+        elif arg[0] == 'archive':
+            try:
+                if len(arg) == 1:
+                    years = db.archive.years()
+                    if not years:
+                        print('No year is archived.')
+                    for year in years:
+                        archived = db.archive.get(year)
+                        print(f' - {year}: {archived.count()} entries, {len(archived.map)/1024:.0f} KiB')
+                elif len(arg) == 2 and arg[1].isdecimal():
+                    year = int(arg[1])
+                    def progress(deleted, total):
+                        print(f'\r {deleted}/{total} entries removed from the database', end='')
+                    log.info(f'archiving {year}')
+                    count = db.archive_year(year, progress)
+                    log.info(f'{year} archived: {count} entries')
+                    print(f'\n{count} entries of {year} are archived in {db.archive.file_name(year)}')
+                elif len(arg) == 3 and arg[1] == '--restore' and arg[2].isdecimal():
+                    year = int(arg[2])
+                    def progress(added, seconds):
+                        print(f'\r {added} entries added ({added/max(seconds, 0.001):.0f} entries/s)', end='')
+                    log.info(f'restoring {year}')
+                    added = db.restore_year(year, progress)
+                    log.info(f'{year} restored: {added} entries')
+                    print(f'\n{added} entries of {year} are back in the database')
+                else:
+                    print('Usage: database archive [YEAR | --restore YEAR]')
+            except ValueError as e:
+                print(e)
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("\nConnection to the database failed!")
+            except DBWritingError as e:
+                log.error('writing failed: DBWritingError ' + str(e.args))
+                print("\nWriting to the database failed:", e.args)
+                print('Use the command again to continue.')
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("\nDatabase didn't respond!")
+                print('Use the command again to continue.')
+        elif arg[0] == 'migrate':
+            log.info('migrating the database')
+            def progress(copied, total):
+                print(f'\r {copied}/{total} rows copied', end='')
+            try:
+                applied = db.migrate(progress=progress)
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("\nConnection to the database failed!")
+            except DBWritingError as e:
+                log.error('writing failed: DBWritingError ' + str(e.args))
+                print("\nThe migration failed:", e.args)
+                print('Use "database migrate" again to continue.')
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("\nDatabase didn't respond!")
+                print('Use "database migrate" again to continue.')
+            else:
+                if not applied:
+                    print('The schema is up to date.')
+                for number, name in applied:
+                    print(f'\nmigration {number} applied: {name}')
+        elif arg[0] == 'rollup':
+            if len(arg) == 1 or arg[1] != '--rebuild':
+                print('Usage: database rollup --rebuild')
+                return
+            if not config.data['db']['rollups']:
+                print('The rollups are disabled, use "config db" to enable them.')
+                return
+            log.info('rebuilding the rollup tables')
+            try:
+                db.create_rollup_tables()
+                months = db.rebuild_rollups(progress=lambda done, months: print(f'\r {done}/{months} months', end=''))
+            except DBNoDataReceivedError:
+                print('The database is empty!')
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("\nConnection to the database failed!")
+            except DBWritingError:
+                log.error('writing failed: DBWritingError')
+                print("\nWriting to the database failed!")
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("\nDatabase didn't respond!")
+            else:
+                log.info(f'rollups of {months} months rebuilt')
+                print(f'\nRollup tables rebuilt ({months} months)')
+        elif arg[0] == 'backfill':
+            # get the missing entries from the historic data of Api2
+            if api2 == None: # the check of Api2 failed at the start
+                log.error('backfill failed: Api2 is not available')
+                print('Api2 is not available!')
+                return
+            try:
+                if station_id != None:
+                    gaps = db.get_gaps_sql(station_id)
+                elif db.coverage == None and config.data['db']['sqlGaps']:
+                    gaps = db.get_gaps_sql()
+                else:
+                    gaps = db.get_gaps(db.get_entries())
+            except DBNoDataReceivedError as e:
+                print('The database is empty!')
+                return
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("Connection to the database failed!")
+                return
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("Database didn't respond!")
+                return
+            if not gaps:
+                print('There are no gaps in the database!')
+                return
+            log.info(f'backfilling {len(gaps)} gaps')
+            print(f'Requesting historic data for {len(gaps)} gaps...')
+
+            def progress(finished, windows):
+                print(f'\r {finished}/{windows} days requested', end='')
+
+            rows, done, errors = api2.backfill(gaps, station_id, db.interval, progress=progress)
+            print(f'\n{len(rows)} entries received')
+            if errors:
+                print(f'{len(errors)} requests failed, use "database backfill" again later.')
+            try:
+                new_entries = db.add_new_rows(rows, station_id=station_id)
+                log.info(f'{new_entries} entries added')
+                print(f'{new_entries} new entries added!')
+            except DBConnectionError as e:
+                log.error('connection failed: DBConnectionError')
+                print("Connection to the database was not established!")
+                print(f'{e.added} entries were added before.')
+                return
+            except DBWritingError as e:
+                log.error('writing failed: DBWritingError')
+                print("Writing to the database failed!")
+                print(f'{e.added} entries were added before.')
+                return
+            except DBTimeoutError as e:
+                log.error('connection failed: DBTimeoutError')
+                print("Writing to the Database took too long!")
+                print(f'{e.added} entries were added before.')
+                return
+            # the slots that are still missing in the requested windows can not be fixed
+            saved_gaps = db.get_saved_gaps(station_id)
+            for start, end in done:
+                saved_gaps.add(start, end)
+            saved_gaps.save()
         elif arg[0] == 'gaps':
             try:
-                entries = db.get_entries()
+                if station_id != None:
+                    # the entries of a station are built from its gaps
+                    gaps = db.get_gaps_sql(station_id)
+                    entries = SlotBitmap.from_gaps(gaps, db.get_start(), time_utils.get_next(interval=db.interval), db.interval)
+                elif len(arg) == 1 and db.coverage == None and config.data['db']['sqlGaps']:
+                    # the db finds the gaps itself, the entries are not needed
+                    gaps = db.get_gaps_sql()
+                else:
+                    entries = db.get_entries()
             except DBNoDataReceivedError as e:
                 print('The database is empty!')
                 return
+            except DBConnectionError:
+                log.error('connection failed: DBConnectionError')
+                print("Connection to the database failed!")
+                return
+            except DBTimeoutError:
+                log.error('connection failed: DBTimeoutError')
+                print("Database didn't respond!")
+                return
             if len(arg) == 1:
-                gaps = db.get_gaps(entries)
+                if station_id == None and (db.coverage != None or not config.data['db']['sqlGaps']):
+                    gaps = db.get_gaps(entries)
                 # print amount of Gaps
                 print('\nAmount of Gaps found:', len(gaps))
                 # print list of Gaps
@@ -1412,80 +3977,40 @@ class CLI(cmd.Cmd):
             elif arg[1] == '-d':
                 # calculate date one month later
                 def next_end(current):
-                    next_month = current.month+1 
-                    if next_month > 12:
-                        next_month = 1
-                    while current.month != next_month:
-                        current += timedelta(minutes=30)
-                    return current
-                # read data from file
-                # this is very similar to the code in Database.get_gaps()
-                try:
-                    f = open('add_data/.remaining_gaps')
-                    range_str_l = f.readlines()
-                    # parse into datetime objects
-                    range_l = []
-                    for l in range_str_l:
-                        l.strip('\n') # looks like "2012-01-01T00:00:00 2013-01-01T00:00:00"
-                        l2 = l.split()
-                        range_l.append((datetime.fromisoformat(l2[0]), datetime.fromisoformat(l2[1])))
-                    f.close()
-                except FileNotFoundError:
-                    range_l = []
-                if len(range_l) > 0:
-                    range_index = 0
-                else:
-                    range_index = None
-                # values for start and end points
-                start_index = 0
-                char = (' ', '\033[31m+\033[0m', '\033[32m@\033[0m') # characters used for printing with escape sequences for coloring
-                start_of_table = entries[start_index][0].replace(day=1, hour=0, minute=0) # first day in month of start
-                start_of_entries = entries[start_index][0] # date of first entry
-                end_of_entries = entries[-1][0] # date of last entry
-                end_of_table = next_end(end_of_entries).replace(day=1, hour=0, minute=0) # first day in month after end
-                # preparations
-                current = start_of_table
-                end = next_end(start_of_table)
-                empty = True # table starts with data that is not available
-                index = start_index # index to track entries
+                    if current.month == 12:
+                        return current.replace(year=current.year+1, month=1)
+                    return current.replace(month=current.month+1)
+                entries.mark_ranges(db.get_saved_gaps(station_id)) # gaps that can not be fixed are not shown
+                if station_id == None:
+                    entries.mark_ranges(db.closed_ranges()) # archived and detached years are closed
+                # characters used for printing with escape sequences for coloring
+                char = {MISSING: '\033[31m+\033[0m', EXISTS: '\033[32m@\033[0m', IGNORED: ' ', OUTSIDE: ' '}
+                # with shorter intervals the lines would be too long, so the slots are grouped
+                group = max(30 // db.interval, 1)
+                def summary(states):
+                    '''state of a group of slots, missing if one of them is missing'''
+                    if MISSING in states:
+                        return MISSING
+                    if EXISTS in states:
+                        return EXISTS
+                    return states[0]
+                current = entries.start.replace(day=1, hour=0, minute=0) # first day in month of start
+                end_of_table = next_end(entries.end - entries.interval).replace(day=1, hour=0, minute=0) # first day in month after end
+                end = next_end(current)
                 print_table = True
                 while True:
-                    table = ''
-                    start = current # for information above table
-                    while current != end:
-                        if current == start_of_entries: # printing of available values and index counting starts
-                            empty = False
-                        if current == end_of_entries: # ends
-                            empty = True
-
-                        if empty == True: # printing if no data available
-                            table += char[0]
-                        elif empty == False: # printing if data available
-                            if entries[index][1]: # If entry exists
-                                table += char[2]
-                            else: # if entry does not yet exist
-                                # check if entry could exist (check for saved gaps in the file)
-                                if range_index != None:
-                                    while current > range_l[range_index][1]:
-                                        range_index += 1
-                                        if range_index == len(range_l):
-                                            range_index -= 1
-                                            break
-                                    if current >= range_l[range_index][0] and current <= range_l[range_index][1]:
-                                        table += char[0]
-                                    else:
-                                        table += char[1]
-                                else: table += char[1]
-
-                        if current.hour == 23 and current.minute == 30: # at line end
-                            table += ']\n['
-                        if empty == False:
-                            index += 1
-                        current += timedelta(minutes=30)
                     if print_table:
-                        # assembling, cleaning and printing table
-                        table = table.rstrip('\n[')
-                        table = f'Data from {start} to {end-timedelta(minutes=30)}\n[' + table
+                        # assembling and printing table with one line per day
+                        start = current # for information above table
+                        lines = []
+                        while current != end:
+                            next_day = current + timedelta(days=1)
+                            states = entries.states(current, next_day)
+                            if group > 1: # one character for the slots of half an hour
+                                states = [summary(states[i:i+group]) for i in range(0, len(states), group)]
+                            lines.append(''.join([char[st] for st in states]))
+                            current = next_day
+                        table = f'Data from {start} to {end-entries.interval}\n[' + ']\n['.join(lines) + ']'
                         print(table)
                         print_table = False
 
@@ -1505,84 +4030,37 @@ class CLI(cmd.Cmd):
             elif arg[1] == '-m':
                 # calculate date one year later
                 def next_end(current):
-                    next_year = current.year+1
-                    while current.year != next_year:
-                        current += timedelta(days=1)
-                    return current
-                # read data from file
-                try:
-                    f = open('add_data/.remaining_gaps')
-                    range_str_l = f.readlines()
-                    # parse into datetime objects
-                    range_l = []
-                    for l in range_str_l:
-                        l.strip('\n')
-                        l2 = l.split()
-                        range_l.append((datetime.fromisoformat(l2[0]), datetime.fromisoformat(l2[1])))
-                    f.close()
-                except FileNotFoundError:
-                    range_l = []
-                if len(range_l) > 0:
-                    range_index = 0
-                else:
-                    range_index = None
-                # values for start and end points
-                start_index = 0
+                    return current.replace(year=current.year+1)
+                entries.mark_ranges(db.get_saved_gaps(station_id)) # gaps that can not be fixed are not shown
+                if station_id == None:
+                    entries.mark_ranges(db.closed_ranges()) # archived and detached years are closed
                 char = (' ', '\033[31m+\033[0m', '\033[93mx\033[0m', '\033[32m@\033[0m') # characters used for printing with escape sequences for coloring
-                start_of_table = entries[start_index][0].replace(month=1, day=1, hour=0, minute=0) # first day in month of start
-                start_of_entries = entries[start_index][0] # date of first entry
-                end_of_entries = entries[-1][0] # date of last entry
-                end_of_table = next_end(end_of_entries).replace(month=1, day=1, hour=0, minute=0) # first day in month after end
-                # preparations
-                current = start_of_table
-                end = next_end(start_of_table)
-                empty = True # table starts with data that is not available
-                index = start_index # index to track entries
+                current = entries.start.replace(month=1, day=1, hour=0, minute=0) # first day in year of start
+                end_of_table = next_end(entries.end - entries.interval).replace(month=1, day=1, hour=0, minute=0) # first day in year after end
+                end = next_end(current)
                 print_table = True
                 while True:
-                    table = ''
-                    start = current # for information above table
-                    while current != end:
-                        stat = set()
-                        for e in range(48):
-                            if current == start_of_entries: # printing of available values and index counting starts
-                                empty = False
-                            if current == end_of_entries: # ends
-                                empty = True
-                            if empty == True: # printing if no data available
-                                stat.add(0)
-                            elif empty == False: # printing if data available
-                                if entries[index][1]:
-                                    stat.add(2)
-                                else:
-                                    if range_index != None:
-                                        while entries[index][0] > range_l[range_index][1]:
-                                            range_index += 1
-                                            if range_index == len(range_l):
-                                                range_index -= 1
-                                                break
-                                        if entries[index][0] >= range_l[range_index][0] and entries[index][0] <= range_l[range_index][1]:
-                                            stat.add(0)
-                                        else:
-                                            stat.add(1)
-                                    else: stat.add(1)
-                            if empty == False:
-                                index += 1
-                            current += timedelta(minutes=30)
-                        if stat in [{0}]: # if no data available
-                                table += char[0]
-                        elif stat in [{1}, {0, 1}]: # if 1 in set
-                            table += char[1] # +
-                        elif stat in [{1, 2}, {0, 1, 2}]: # if set is 1, 2 => extra char
-                            table += char[2] # x
-                        elif stat in [{2}, {0, 2}]: # if day contains 2 and 0 => complete
-                            table += char[3] # @
-                        if current.day == 1 and current.hour == 0 and current.minute == 0: # at line end
-                            table += ']\n['
                     if print_table:
-                        # assembling, cleaning and printing table
+                        # assembling and printing table with one line per month and one character per day
+                        start = current # for information above table
+                        table = ''
+                        while current != end:
+                            next_day = current + timedelta(days=1)
+                            missing = entries.count(MISSING, current, next_day)
+                            existing = entries.count(EXISTS, current, next_day)
+                            if missing and existing: # some entries of the day are missing
+                                table += char[2] # x
+                            elif missing: # all entries of the day are missing
+                                table += char[1] # +
+                            elif existing: # the day is complete
+                                table += char[3] # @
+                            else: # no data available
+                                table += char[0]
+                            current = next_day
+                            if current.day == 1: # at line end
+                                table += ']\n['
                         table = table.rstrip('\n[')
-                        table = f'Data from {start} to {end-timedelta(minutes=30)}\n[' + table
+                        table = f'Data from {start} to {end-entries.interval}\n[' + table
                         print(table)
                         print_table = False
 
@@ -1612,7 +4090,18 @@ class CLI(cmd.Cmd):
             s += 'Commands:\n'
             s += ' ping : check connection and try to reconnect if possible and necessary\n'
             s += ' mend : select download file\n'
+            s += ' mend --all : use all download files at once\n'
             s += ' gaps : show gaps in database\n'
+            s += ' backfill : get the missing entries from the historic data of Api2\n'
+            s += ' rollup --rebuild : compute the hourly, daily and monthly rollup tables again\n'
+            s += ' migrate : apply the pending changes of the schema\n'
+            s += ' export --from DATE --to DATE [--format csv|jsonl] [--columns a,b] : write the entries into exports/\n'
+            s += ' partition : partition the table by year or show the partitions\n'
+            s += ' partition --detach YEAR : move the entries of a year into their own table\n'
+            s += ' archive : show the archived years\n'
+            s += ' archive YEAR : move the entries of a closed year into add_data/archive\n'
+            s += ' archive --restore YEAR : move the entries of an archived year back into the database\n'
+            s += ' gaps|mend|backfill --station ID : use the entries of a station in the multi-station mode\n'
             print(s)
 
     def do_reqTimer(self, arg):
@@ -1631,6 +4120,10 @@ class CLI(cmd.Cmd):
                 s += 'running\n'
             else:
                 s += 'stopped!\n'
+            if req_timer.lateness != None:
+                s += f'Last request: {req_timer.lateness*1000:.0f} ms late'
+                s += f' (max: {req_timer.max_lateness*1000:.0f} ms, {req_timer.requests} requests)\n'
+                s += f'Missed slots: {req_timer.missed_slots}\n'
             print(s)
         elif arg == 'silent':
             if not req_timer.msg:
@@ -1876,9 +4369,9 @@ class CLI(cmd.Cmd):
         '''Provides different debug functionalities'''
         log = getLogger('DEBUG ACTIONS')
         if arg == 'add':
-            time = time_utils.get_now(string=True)
+            time_ = time_utils.get_now(string=True)
             log.info('starting debug request')
-            req_timer.make_req(time, debug=True)
+            req_timer.make_req(time_, debug=True)
         elif arg == 'dAdd':
             req_timer.trigger_debug_request = True
             log.debug('debug action triggered')
@@ -1926,6 +4419,78 @@ class CLI(cmd.Cmd):
                 print("Api didn't respond!")
             else:
                 print(f'file {name} created')
+        elif arg == 'benchMend':
+            log.info('starting mend benchmark')
+            print('Generating a download file with 10 years of data...')
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                file_name = os.path.join(tmp_dir, 'sample.csv')
+                csvImport.write_sample(file_name, datetime(2010, 1, 1), datetime(2020, 1, 1))
+                try:
+                    results = db.benchmark_mend(file_name)
+                except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                    log.error('benchmark failed: ' + e.__class__.__name__)
+                    print('--> benchmark failed: ' + e.__class__.__name__)
+                    return
+            for name, result in results.items():
+                if result == None:
+                    s = f' {name}: not possible, LOAD DATA LOCAL INFILE is disabled'
+                else:
+                    s = f' {name}: {result[0]} rows in {result[1]:.2f}s ({result[0]/max(result[1], 0.001):.0f} rows/s)'
+                log.info('benchMend' + s)
+                print(s)
+        elif arg == 'benchCompact':
+            log.info('starting compact storage benchmark')
+            print('Generating a download file with 10 years of data...')
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                file_name = os.path.join(tmp_dir, 'sample.csv')
+                csvImport.write_sample(file_name, datetime(2010, 1, 1), datetime(2020, 1, 1))
+                try:
+                    results = db.benchmark_compact(file_name)
+                except (DBConnectionError, DBWritingError, DBTimeoutError) as e:
+                    log.error('benchmark failed: ' + e.__class__.__name__)
+                    print('--> benchmark failed: ' + e.__class__.__name__)
+                    return
+            for name, (size, seconds) in results.items():
+                s = f' {name}: {size/1024:.0f} KiB, full scan in {seconds*1000:.0f} ms'
+                log.info('benchCompact' + s)
+                print(s)
+        elif arg == 'benchArchive':
+            years = db.archive.years()
+            if not years:
+                print('No year is archived, use "database archive YEAR" first.')
+                return
+            log.info(f'starting archive benchmark with {years[-1]}')
+            results = db.benchmark_archive(years[-1])
+            for name, result in results.items():
+                if result == None:
+                    s = f' {name}: not possible, numpy is not installed'
+                elif name == 'rows':
+                    s = f' {name}: {result[0]} entries in {result[1]*1000:.1f} ms ({result[0]/max(result[1], 1e-6):.0f} entries/s)'
+                else:
+                    s = f' {name}: {result[0]/1024:.0f} KiB in {result[1]*1000:.2f} ms ({result[0]/2**20/max(result[1], 1e-6):.0f} MiB/s)'
+                log.info('benchArchive' + s)
+                print(s)
+        elif arg == 'benchTimeout':
+            log.info('starting TimeoutHelper benchmark')
+            # overhead of a call that returns immediately
+            n = 1000
+            start_time = time.perf_counter()
+            for i in range(n):
+                TimeoutHelper(lambda: (True, None)).timer(1000, DBTimeoutError)
+            overhead = (time.perf_counter() - start_time) / n
+            # accuracy of the timeout with a function that takes too long
+            timeout_ms = 50
+            delays = []
+            for i in range(20):
+                start_time = time.perf_counter()
+                try:
+                    TimeoutHelper(lambda: (time.sleep(timeout_ms/500), (True, None))[1]).timer(timeout_ms, DBTimeoutError)
+                except DBTimeoutError:
+                    delays.append((time.perf_counter() - start_time) * 1000 - timeout_ms)
+            s = f' overhead per call: {overhead*1e6:.1f}us\n'
+            s += f' timeout of {timeout_ms}ms exceeded by: {sum(delays)/len(delays):.2f}ms on average, {max(delays):.2f}ms max'
+            log.info('benchTimeout: ' + s.replace('\n', ','))
+            print(s)
         elif arg == 'sendMail':
             log.debug('calling debug_email()')
             emailMessages.debug_email()
@@ -1938,6 +4503,10 @@ class CLI(cmd.Cmd):
             s += ' reqApi1 : Send a request to API1 and save the answer as .json file in requests/\n'
             s += ' reqApi2 : Send a request to API2 and save the answer as .json file in requests/\n'
             s += ' sendMail : Call the debug_email() function in emailMessages.py\n'
+            s += ' benchMend : Compare INSERT and LOAD DATA LOCAL INFILE with 10 years of generated data\n'
+            s += ' benchTimeout : Measure the overhead and the accuracy of TimeoutHelper\n'
+            s += ' benchCompact : Compare size and full scan time of the plain and the compact format\n'
+            s += ' benchArchive : Measure the scan speed of the last archived year\n'
             print(s)
 
     def do_restart(self, arg):
@@ -1953,6 +4522,8 @@ def restart():
     log = getLogger('RESTART')
     log.info('stopping RequestTimer')
     req_timer.run = False
+    log.info('sending queued email messages')
+    emailMessages.stop_worker()
     log.debug('writing cmd history')
     if config.data['readline']:
         readline.write_history_file('.cmd_history')
@@ -1967,6 +4538,8 @@ def quit():
     log = getLogger('SHUTDOWN')
     log.info('stopping RequestTimer')
     req_timer.run = False
+    log.info('sending queued email messages')
+    emailMessages.stop_worker()
     log.info('saving config data')
     config.save()
     log.info('shutdown')
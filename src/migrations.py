@@ -0,0 +1,240 @@
+'''
+This module contains the migrations of the database schema.
+
+Every migration has a version number and is applied only once by Database.migrate(),
+which saves the versions of the applied migrations in the table schema_version.
+A migration is a function that gets the Database and a progress function,
+new migrations are appended to MIGRATIONS with the next version number.
+Optional migrations have the name of a config key of db and are only applied if it is set.
+
+Functions
+---------
+entry_date_primary_key(db, progress=None):
+        Makes entryDate the NOT NULL primary key of the table with an online copy.
+compact_storage(db, progress=None):
+        Converts the table into the compact format with an online copy.
+is_applied(applied, option):
+        Returns if the optional migration of a config key was applied.
+pending(applied, db_config):
+        Returns the migrations that still have to be applied.
+'''
+
+from datetime import datetime
+from logging import getLogger
+import pymysql
+
+from customExceptions import DBConnectionError, DBWritingError
+import compactColumns
+
+COLUMNS = '`entryDate`, `temp`, `pressure`, `hum`, `windspeed`, `winddir`, `rainrate`, `uvindex`'
+
+def entry_date_primary_key(db, progress=None):
+    '''
+    Make entryDate the NOT NULL primary key of the table, so InnoDB clusters the rows by date.
+    The rows are copied in chunks of mendChunkSize rows into <table>_new, every chunk is
+    its own transaction, so the request timer can still write into the table meanwhile.
+    In the end the tables are swapped with one RENAME TABLE and the rows that were added
+    after the last chunk are copied as well. The old table is kept as <table>_before_pk.
+    Rows without an entryDate can't be part of the new table and are left out.
+    An interrupted migration continues with the rows that are not in <table>_new yet.
+
+            Parameters:
+                    db (Database): connected database
+                    progress (function): gets called after every chunk with
+                        the number of copied rows and the number of all rows
+
+            Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+    '''
+    log = getLogger('MIGRATION')
+    table = db.config['table']
+    new = f'{table}_new'
+    old = f'{table}_before_pk'
+    size = db.config['mendChunkSize']
+
+    def prepare(cursor):
+        try:
+            cursor.execute(f"SHOW KEYS FROM `{table}` WHERE Key_name = 'PRIMARY';")
+            if cursor.fetchall():
+                return None, None # nothing to do, e.g. tables created by the new setup.sql
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS `{new}` LIKE `{table}`;')
+            cursor.execute(f"SHOW KEYS FROM `{new}` WHERE Key_name = 'PRIMARY';")
+            if not cursor.fetchall():
+                # the unique key is replaced by the primary key
+                cursor.execute(f"SHOW KEYS FROM `{new}` WHERE Column_name = 'entryDate';")
+                drop = ''.join(f"DROP INDEX `{k['Key_name']}`, " for k in cursor.fetchall())
+                cursor.execute(f'ALTER TABLE `{new}` {drop}MODIFY `entryDate` datetime NOT NULL, ADD PRIMARY KEY (`entryDate`);')
+            cursor.execute(f'SELECT MAX(entryDate) AS last, COUNT(*) AS copied FROM `{new}`;')
+            state = cursor.fetchone()
+            cursor.execute(f'SELECT COUNT(*) AS total, COUNT(entryDate) AS dated FROM `{table}`;')
+            state.update(cursor.fetchone())
+            return state, None
+        except pymysql.Error as e:
+            return None, DBWritingError(e)
+        except AttributeError as e:
+            return None, DBConnectionError(e)
+    state = db.timer(prepare)
+    if state == None:
+        log.info(f'{table} already has a primary key')
+        return
+    if state['total'] > state['dated']:
+        log.warning(f'{state["total"] - state["dated"]} rows without entryDate are left out')
+    last = state['last'] or datetime(1000, 1, 1) # first possible DATETIME
+    copied = state['copied']
+
+    # copy the rows in the order of the primary key, every chunk starts after the last copied row
+    while True:
+        def copy_chunk(cursor):
+            try:
+                added = cursor.execute(f'''INSERT INTO `{new}` ({COLUMNS})
+ SELECT {COLUMNS} FROM `{table}` WHERE entryDate > %s ORDER BY entryDate LIMIT {size};''', (last,))
+                cursor.execute(f'SELECT MAX(entryDate) AS last FROM `{new}`;')
+                row = cursor.fetchone()
+                cursor.connection.commit()
+                return (added, row['last']), None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        added, new_last = db.timer(copy_chunk)
+        if added == 0:
+            break
+        last = new_last
+        copied += added
+        if progress:
+            progress(copied, max(copied, state['dated'])) # the timer can add rows meanwhile
+
+    def switch(cursor):
+        try:
+            cursor.execute(f'RENAME TABLE `{table}` TO `{old}`, `{new}` TO `{table}`;')
+            # rows that were added after the last chunk
+            added = cursor.execute(f'INSERT IGNORE INTO `{table}` ({COLUMNS}) SELECT {COLUMNS} FROM `{old}` WHERE entryDate > %s;', (last,))
+            cursor.connection.commit()
+            return added, None
+        except pymysql.Error as e:
+            return None, DBWritingError(e)
+        except AttributeError as e:
+            return None, DBConnectionError(e)
+    added = db.timer(switch)
+    log.info(f'{copied + added} rows copied, the old table is kept as {old}')
+
+def compact_storage(db, progress=None):
+    '''
+    Convert the table into the compact format of compactColumns. The rows are encoded and copied
+    in chunks of mendChunkSize rows into <table>_compact. The request timer keeps writing into
+    the table meanwhile, <table>_compact only becomes write_table after the migration is saved.
+    In the end one RENAME TABLE replaces the table with a view of <table>_compact that has
+    the same columns and the rows that were added after the last chunk are copied as well,
+    the old table is kept as <table>_before_compact.
+    An interrupted migration starts again at the first row, the copied rows are skipped.
+
+            Parameters:
+                    db (Database): connected database
+                    progress (function): gets called after every chunk with
+                        the number of copied rows and the number of all rows
+
+            Exceptions:
+                    DBConnectionError
+                    DBWritingError
+                    DBTimeoutError
+    '''
+    log = getLogger('MIGRATION')
+    table = db.config['table']
+    compact = f'{table}_compact'
+    view = f'{table}_view'
+    old = f'{table}_before_compact'
+    size = db.config['mendChunkSize']
+    columns = ', '.join(f'`{c}`' for c in compactColumns.COLUMNS)
+    encoded = compactColumns.encode_sql(f'`{c}`' for c in compactColumns.COLUMNS)
+
+    def prepare(cursor):
+        try:
+            cursor.execute('SELECT TABLE_TYPE AS type FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s;', (table,))
+            row = cursor.fetchone()
+            if row != None and row['type'] == 'VIEW':
+                return None, None # already converted
+            cursor.execute(compactColumns.create_table(compact, compact=True))
+            cursor.execute(f'SELECT COUNT(*) AS total FROM `{table}`;')
+            return cursor.fetchone(), None
+        except pymysql.Error as e:
+            return None, DBWritingError(e)
+        except AttributeError as e:
+            return None, DBConnectionError(e)
+    state = db.timer(prepare)
+    if state == None:
+        log.info(f'{table} is already a view of {compact}')
+        return
+
+    # the end of a chunk is taken from the old table, the copied rows are skipped after an interruption
+    last = datetime(1000, 1, 1) # first possible DATETIME
+    copied = 0
+    while True:
+        def copy_chunk(cursor):
+            try:
+                cursor.execute(f'''SELECT MAX(entryDate) AS end, COUNT(*) AS count FROM
+ (SELECT entryDate FROM `{table}` WHERE entryDate > %s ORDER BY entryDate LIMIT {size}) AS chunk;''', (last,))
+                chunk = cursor.fetchone()
+                if chunk['end'] != None:
+                    cursor.execute(f'''INSERT IGNORE INTO `{compact}` ({columns})
+ SELECT {encoded} FROM `{table}` WHERE entryDate > %s AND entryDate <= %s;''', (last, chunk['end']))
+                cursor.connection.commit()
+                return chunk, None
+            except pymysql.Error as e:
+                return None, DBWritingError(e)
+            except AttributeError as e:
+                return None, DBConnectionError(e)
+        chunk = db.timer(copy_chunk)
+        if chunk['end'] == None:
+            break
+        last = chunk['end']
+        copied += chunk['count']
+        if progress:
+            progress(copied, max(copied, state['total']))
+
+    def switch(cursor):
+        try:
+            cursor.execute(compactColumns.create_view(view, compact))
+            cursor.execute(f'RENAME TABLE `{table}` TO `{old}`, `{view}` TO `{table}`;')
+            # rows that were added to the old table after the last chunk
+            added = cursor.execute(f'''INSERT IGNORE INTO `{compact}` ({columns})
+ SELECT {encoded} FROM `{old}` WHERE entryDate > %s;''', (last,))
+            cursor.connection.commit()
+            return added, None
+        except pymysql.Error as e:
+            return None, DBWritingError(e)
+        except AttributeError as e:
+            return None, DBConnectionError(e)
+    added = db.timer(switch)
+    log.info(f'{copied + added} rows converted, the old table is kept as {old}')
+
+def is_applied(applied, option: str) -> bool:
+    '''
+    Return if the optional migration of a config key was applied, e.g. before the table it creates is used.
+
+            Parameters:
+                    applied (set): versions of the applied migrations
+                    option (str): config key of db
+    '''
+    return any(version in applied for version, name, function, o in MIGRATIONS if o == option)
+
+def pending(applied, db_config) -> list:
+    '''
+    Return the migrations that were not applied yet, optional migrations only if their option is set.
+
+            Parameters:
+                    applied (set): versions of the applied migrations
+                    db_config (dict): configuration data of the db
+
+            Returns:
+                    [(version: int, name: str, function), ...]
+    '''
+    return [(version, name, function) for version, name, function, option in MIGRATIONS
+        if version not in applied and (option == None or db_config[option])]
+
+# (version, name, function, option), the versions have to be ascending
+MIGRATIONS = [
+    (1, 'entryDate as primary key', entry_date_primary_key, None),
+    (2, 'compact storage format', compact_storage, 'compactStorage'),
+]
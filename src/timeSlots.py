@@ -0,0 +1,406 @@
+'''
+This module handles the slots (e.g. every half hour) in which the entries of the database are stored.
+
+Every slot since the start time gets a number, so the state of a slot can be
+saved in one byte instead of a tuple with a datetime object.
+
+Constants
+---------
+MISSING, EXISTS, IGNORED, OUTSIDE:
+        states of a slot in a SlotBitmap
+INTERVALS:
+        the possible minutes between two slots
+
+Classes
+-------
+SlotBitmap:
+        Stores the state of every slot between a start and an end time.
+CoverageCache:
+        Saves a SlotBitmap of the existing entries in a file.
+RangeSet:
+        Stores sorted ranges of time like the gaps in add_data/.remaining_gaps.
+'''
+
+from datetime import datetime, timedelta
+from threading import Lock
+from bisect import bisect_left, bisect_right
+import os, re, zlib
+
+MISSING = 0 # the entry doesn't exist in the db
+EXISTS = 1 # the entry exists in the db
+IGNORED = 2 # the entry is missing, but saved in add_data/.remaining_gaps
+OUTSIDE = 3 # the slot is not part of the bitmap (only returned by SlotBitmap.states())
+
+INTERVALS = (1, 5, 10, 15, 30) # divisors of 60, so every hour starts with a slot
+
+class SlotBitmap:
+    '''
+    A class that stores the state of every slot between a start and an end time
+    with one byte per slot.
+
+    Attributes
+    ----------
+    start: datetime
+            time of the first slot (slot number 0)
+    interval: timedelta
+            time between two slots
+    data: bytearray
+            state of every slot (MISSING, EXISTS or IGNORED)
+
+    Methods
+    -------
+    from_gaps(gaps, start, end):
+            Creates a bitmap where every slot exists except for the given gaps.
+    copy():
+            Returns a copy of the bitmap.
+    resize(end):
+            Adds missing slots until end.
+    slot(t):
+            Returns the number of the slot at the time t.
+    time(slot):
+            Returns the time of the slot with the number slot.
+    get(t):
+            Returns the state of the slot at the time t.
+    set(t, state=EXISTS):
+            Sets the state of the slot at the time t.
+    mark_ranges(ranges, state=IGNORED):
+            Sets the state of all missing slots inside of the given ranges.
+    states(start, end):
+            Returns the states of all slots from start to end.
+    count(state, start=None, end=None):
+            Counts the slots with a certain state from start to end.
+    iter_gaps():
+            Yields all gaps as (start, end, count).
+    '''
+
+    _gap_pattern = re.compile(b'\\x00+') # a run of missing slots
+
+    def __init__(self, start: datetime, end: datetime, interval=30):
+        '''
+        Create a bitmap with all slots from start until end (excluded) set to MISSING.
+        '''
+        self.start = start
+        self.interval = timedelta(minutes=interval)
+        self.data = bytearray(max(self.slot(end), 0))
+
+    @classmethod
+    def from_gaps(cls, gaps, start: datetime, end: datetime, interval=30):
+        '''
+        Create a bitmap where every slot exists except for the slots in gaps.
+
+                Parameters:
+                        gaps (list): [(start: datetime, end: datetime, count: int), ...]
+                        start (datetime): time of the first slot
+                        end (datetime): time after the last slot
+                        interval (int): minutes between two slots
+        '''
+        bitmap = cls(start, end, interval)
+        bitmap.data[:] = bytes([EXISTS]) * len(bitmap.data)
+        for g in gaps:
+            a = max(bitmap.slot(g[0]), 0)
+            b = min(bitmap.slot(g[1]) + 1, len(bitmap.data))
+            if a < b:
+                bitmap.data[a:b] = bytes(b - a)
+        return bitmap
+
+    def __len__(self):
+        return len(self.data)
+
+    def copy(self):
+        '''Return a copy of the bitmap.'''
+        bitmap = SlotBitmap(self.start, self.start, int(self.interval / timedelta(minutes=1)))
+        bitmap.data = self.data.copy()
+        return bitmap
+
+    def resize(self, end: datetime):
+        '''Add missing slots until end (excluded) if the bitmap ends before it.'''
+        length = self.slot(end)
+        if length > len(self.data):
+            self.data.extend(bytes(length - len(self.data)))
+
+    @property
+    def end(self) -> datetime:
+        '''time after the last slot'''
+        return self.time(len(self.data))
+
+    def slot(self, t: datetime) -> int:
+        '''Return the number of the slot at the time t (rounded down).'''
+        return (t - self.start) // self.interval
+
+    def time(self, slot: int) -> datetime:
+        '''Return the time of the slot with the number slot.'''
+        return self.start + slot * self.interval
+
+    def get(self, t: datetime) -> int:
+        '''Return the state of the slot at the time t or OUTSIDE.'''
+        i = self.slot(t)
+        if i < 0 or i >= len(self.data):
+            return OUTSIDE
+        return self.data[i]
+
+    def set(self, t: datetime, state=EXISTS):
+        '''Set the state of the slot at the time t if it is part of the bitmap.'''
+        i = self.slot(t)
+        if 0 <= i < len(self.data):
+            self.data[i] = state
+
+    def mark_ranges(self, ranges, state=IGNORED):
+        '''
+        Set the state of all missing slots inside of the given ranges.
+
+                Parameters:
+                        ranges (list): [(start: datetime, end: datetime), ...] both included
+                        state (int): new state of the missing slots
+        '''
+        for r in ranges:
+            a = max(-(-(r[0] - self.start) // self.interval), 0) # first slot in range
+            b = min(self.slot(r[1]) + 1, len(self.data)) # slot after range
+            if a < b:
+                self.data[a:b] = self.data[a:b].replace(bytes([MISSING]), bytes([state]))
+
+    def states(self, start: datetime, end: datetime) -> bytes:
+        '''
+        Return the states of all slots from start until end (excluded).
+        Slots that are not part of the bitmap are OUTSIDE.
+        '''
+        a, b = self.slot(start), self.slot(end)
+        before = min(max(-a, 0), b - a)
+        after = min(max(b - len(self.data), 0), b - a)
+        inside = self.data[max(a, 0):max(min(b, len(self.data)), 0)]
+        return bytes([OUTSIDE]) * before + bytes(inside) + bytes([OUTSIDE]) * after
+
+    def count(self, state, start: datetime = None, end: datetime = None) -> int:
+        '''Count the slots with the state "state" from start until end (excluded).'''
+        a = 0 if start == None else min(max(self.slot(start), 0), len(self.data))
+        b = len(self.data) if end == None else min(max(self.slot(end), 0), len(self.data))
+        return self.data.count(state, a, b)
+
+    def iter_gaps(self):
+        '''
+        Yield all runs of missing slots. Ignored slots are not part of a gap.
+
+                Returns:
+                        generator of (start: datetime, end: datetime, count: int)
+        '''
+        for m in self._gap_pattern.finditer(self.data):
+            yield (self.time(m.start()), self.time(m.end() - 1), m.end() - m.start())
+
+class CoverageCache:
+    '''
+    A class that saves a SlotBitmap of the existing entries in a file,
+    so the entries don't have to be read from the db after every start.
+
+    The file starts with a line with the start time and the interval of the bitmap
+    followed by the compressed states of the slots.
+
+    Attributes
+    ----------
+    path: str
+            path of the file
+    bitmap: SlotBitmap
+            states of the slots (only MISSING or EXISTS)
+    lock: Lock
+            prevents that two threads change or save the bitmap at the same time
+
+    Methods
+    -------
+    load(start, interval=30):
+            Reads the file and returns if it matches start and interval.
+    save():
+            Writes the bitmap into the file.
+    add(t):
+            Marks the slot at the time t as existing and saves the file.
+    remove(t):
+            Marks the slot at the time t as missing and saves the file.
+    month_stats():
+            Returns the number of entries and the last entry of every month.
+    replace(start, end, slots):
+            Replaces the states of all slots from start to end.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.bitmap = None
+        self.lock = Lock()
+
+    def load(self, start: datetime, interval=30) -> bool:
+        '''
+        Read the file. If it doesn't exist, is damaged or doesn't match start and interval,
+        an empty bitmap is created.
+
+                Parameters:
+                        start (datetime): time of the first slot
+                        interval (int): minutes between two slots
+
+                Returns:
+                        True if the file could be used
+        '''
+        self.bitmap = SlotBitmap(start, start, interval)
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.readline().decode().split() # looks like "2012-07-09T00:00:00 30"
+                data = zlib.decompress(f.read())
+            if datetime.fromisoformat(header[0]) != start or int(header[1]) != interval:
+                return False
+        except (FileNotFoundError, IndexError, ValueError, zlib.error):
+            return False
+        self.bitmap.data = bytearray(data)
+        return True
+
+    def save(self):
+        '''Write the bitmap into a temporary file and replace the old file with it.'''
+        with self.lock:
+            header = f'{self.bitmap.start.isoformat()} {int(self.bitmap.interval / timedelta(minutes=1))}\n'
+            with open(self.path + '.tmp', 'wb') as f:
+                f.write(header.encode())
+                f.write(zlib.compress(self.bitmap.data))
+            os.replace(self.path + '.tmp', self.path)
+
+    def add(self, t: datetime):
+        '''Mark the slot at the time t as existing and save the file.'''
+        with self.lock:
+            self.bitmap.resize(t + self.bitmap.interval)
+            self.bitmap.set(t, EXISTS)
+        self.save()
+
+    def remove(self, t: datetime):
+        '''Mark the slot at the time t as missing and save the file.'''
+        with self.lock:
+            self.bitmap.set(t, MISSING)
+        self.save()
+
+    def month_stats(self) -> dict:
+        '''
+        Return the number of existing entries and the last existing entry of every month.
+
+                Returns:
+                        {(year: int, month: int): (count: int, last: datetime), ...}
+        '''
+        stats = {}
+        current = self.bitmap.start
+        while current < self.bitmap.end:
+            if current.month == 12:
+                next_month = datetime(current.year+1, 1, 1)
+            else:
+                next_month = datetime(current.year, current.month+1, 1)
+            a = max(self.bitmap.slot(current), 0)
+            b = min(self.bitmap.slot(next_month), len(self.bitmap))
+            count = self.bitmap.data.count(EXISTS, a, b)
+            if count > 0:
+                stats[(current.year, current.month)] = (count, self.bitmap.time(self.bitmap.data.rfind(EXISTS, a, b)))
+            current = next_month
+        return stats
+
+    def replace(self, start: datetime, end: datetime, slots):
+        '''
+        Replace the states of all slots from start until end (excluded).
+
+                Parameters:
+                        start (datetime): first slot that gets replaced
+                        end (datetime): slot after the last one that gets replaced
+                        slots (iterable): numbers of all slots in the range that exist
+        '''
+        with self.lock:
+            self.bitmap.resize(end)
+            a = max(self.bitmap.slot(start), 0)
+            b = self.bitmap.slot(end)
+            self.bitmap.data[a:b] = bytes(b - a)
+            for i in slots:
+                if a <= i < b:
+                    self.bitmap.data[i] = EXISTS
+
+class RangeSet:
+    '''
+    A class that stores sorted ranges of time that don't overlap (start and end included)
+    and saves them in a file with one range per line.
+    The file is only read again if it has been changed.
+
+    Attributes
+    ----------
+    path: str
+            path of the file
+    starts: list
+            start of every range (sorted)
+    ends: list
+            end of every range (sorted)
+    mtime: int
+            modification time of the file in ns when it was read
+
+    Methods
+    -------
+    load():
+            Reads the file if it has been changed since it was read the last time.
+    save():
+            Writes the ranges into the file.
+    add(start, end):
+            Adds a range and merges it with the ranges it overlaps.
+    contains(t):
+            Returns if t is inside of a range.
+    overlapping(start, end):
+            Returns all ranges that overlap with start to end.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.starts = []
+        self.ends = []
+        self.mtime = None
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return (self.starts[i], self.ends[i])
+
+    def load(self):
+        '''
+        Read the file if it has been changed since it was read the last time.
+        Returns the RangeSet itself.
+        '''
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.starts, self.ends, self.mtime = [], [], None
+            return self
+        if mtime == self.mtime:
+            return self
+        self.starts, self.ends = [], []
+        with open(self.path) as f:
+            for l in f:
+                l2 = l.split() # looks like "2012-01-01T00:00:00 2013-01-01T00:00:00"
+                if len(l2) == 2:
+                    self.add(datetime.fromisoformat(l2[0]), datetime.fromisoformat(l2[1]))
+        self.mtime = mtime
+        return self
+
+    def save(self):
+        '''Write the ranges into a temporary file and replace the old file with it.'''
+        with open(self.path + '.tmp', 'w') as f:
+            for start, end in self:
+                f.write(start.isoformat() + ' ' + end.isoformat() + '\n')
+        os.replace(self.path + '.tmp', self.path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+
+    def add(self, start: datetime, end: datetime):
+        '''Add the range from start to end and merge it with all ranges it overlaps or touches.'''
+        i = bisect_left(self.ends, start) # first range that ends at or after start
+        j = bisect_right(self.starts, end) # first range that starts after end
+        if i < j: # merge with the ranges i to j-1
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j-1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def contains(self, t: datetime) -> bool:
+        '''Return if t is inside of a range.'''
+        i = bisect_right(self.starts, t) - 1 # last range that starts at or before t
+        return i >= 0 and t <= self.ends[i]
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        '''Return all ranges that overlap with the range from start to end.'''
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        return list(zip(self.starts[i:j], self.ends[i:j]))
@@ -0,0 +1,114 @@
+'''
+This module stores the rows that could not be written into the db in a local SQLite file.
+
+The rows are kept until the db is reachable again and can be added afterwards,
+so an outage of the db doesn't create gaps.
+
+Classes
+-------
+WriteBuffer:
+        Saves rows in an SQLite file and returns them in the order of their entryDate.
+'''
+
+import sqlite3, json
+from threading import Lock
+
+class WriteBuffer:
+    '''
+    A class that saves rows for the db in an SQLite file.
+
+    Every entryDate is only saved once, a row that is added again replaces the old one.
+    A new SQLite connection is opened for every call, so the buffer can be used by all threads.
+
+    Attributes
+    ----------
+    path: str
+            path of the SQLite file
+    lock: threading.Lock
+            lock for the file
+    pending: int
+            number of rows in the buffer, None if it wasn't read yet
+
+    Methods
+    -------
+    connect():
+            Opens the SQLite file.
+    add(values):
+            Saves a row.
+    rows():
+            Returns all rows sorted by entryDate.
+    remove(entry_dates):
+            Removes the rows with the given entryDates.
+    count():
+            Returns the number of rows in the buffer.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = Lock()
+        self.pending = None
+
+    def connect(self):
+        '''Open the SQLite file and create the table if it doesn't exist.'''
+        con = sqlite3.connect(self.path, timeout=10)
+        con.execute('CREATE TABLE IF NOT EXISTS buffer (entryDate TEXT PRIMARY KEY, row_values TEXT NOT NULL)')
+        return con
+
+    def add(self, values):
+        '''
+        Save a row for the db.
+
+                Parameters:
+                        values (list): [entryDate: str, temp, pressure, hum, windspeed, winddir, rainrate, uvindex]
+        '''
+        with self.lock:
+            con = self.connect()
+            try:
+                with con: # commits the transaction
+                    con.execute('INSERT OR REPLACE INTO buffer VALUES (?, ?)', (str(values[0]), json.dumps(values)))
+                self.pending = con.execute('SELECT COUNT(*) FROM buffer').fetchone()[0]
+            finally:
+                con.close()
+
+    def rows(self) -> list:
+        '''
+        Return all rows in the buffer.
+
+                Returns:
+                        [[entryDate: str, temp, pressure, hum, windspeed, winddir, rainrate, uvindex], ...]
+        '''
+        with self.lock:
+            con = self.connect()
+            try:
+                rows = [json.loads(r[0]) for r in con.execute('SELECT row_values FROM buffer ORDER BY entryDate')]
+            finally:
+                con.close()
+            self.pending = len(rows)
+        return rows
+
+    def remove(self, entry_dates):
+        '''
+        Remove the rows with the given entryDates, e.g. after they were added to the db.
+
+                Parameters:
+                        entry_dates (iterable): entryDates of the rows as str
+        '''
+        with self.lock:
+            con = self.connect()
+            try:
+                with con:
+                    con.executemany('DELETE FROM buffer WHERE entryDate = ?', [(str(d),) for d in entry_dates])
+                self.pending = con.execute('SELECT COUNT(*) FROM buffer').fetchone()[0]
+            finally:
+                con.close()
+
+    def count(self) -> int:
+        '''Return the number of rows in the buffer, the file is only read the first time.'''
+        if self.pending == None:
+            with self.lock:
+                con = self.connect()
+                try:
+                    self.pending = con.execute('SELECT COUNT(*) FROM buffer').fetchone()[0]
+                finally:
+                    con.close()
+        return self.pending
@@ -0,0 +1,226 @@
+'''
+Helpers for the tests.
+
+Importing this module makes the modules in src/ importable. It also provides local
+stand-ins of the servers the DB-Manager talks to, so the tests don't need the internet
+or the credentials in res/dat.json.
+
+Classes
+-------
+HistoricServer:
+        A local HTTP server that answers like the historic endpoint of the WeatherLink v2 Api.
+SMTPServer:
+        A local SMTP server that collects the messages and can refuse or drop them.
+'''
+
+import sys, os, json, threading, time, socketserver
+import importlib.util
+from importlib.machinery import SourceFileLoader
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+try:
+    import download_file
+except ImportError: # the file is encrypted with git-secret, the template has the same functions
+    loader = SourceFileLoader('download_file', os.path.join(SRC, 'download_file.py.template'))
+    spec = importlib.util.spec_from_loader('download_file', loader)
+    download_file = importlib.util.module_from_spec(spec)
+    loader.exec_module(download_file)
+    sys.modules['download_file'] = download_file
+
+class HistoricServer:
+    '''
+    A local HTTP server that answers like the historic endpoint of the WeatherLink v2 Api.
+
+    Every request for /historic/<station_id> gets one archive record per interval
+    between start-timestamp and end-timestamp. The first answers can be replaced by
+    error codes to test the retries.
+
+    Attributes
+    ----------
+    url: str
+            base URL of the server, used as "url" of Api2 in the config
+    requests: list
+            (time.monotonic(), station_id, start, end) of every request
+    statuses: list
+            status codes that are sent instead of the records, one per request
+    interval: int
+            minutes between two records
+
+    Methods
+    -------
+    start():
+            Starts the server in a thread.
+    stop():
+            Stops the server.
+    '''
+
+    def __init__(self, interval=30):
+        self.requests = []
+        self.statuses = []
+        self.interval = interval
+        self.lock = threading.Lock()
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+            def log_message(self, *args):
+                pass
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/'
+        self.thread = None
+
+    def start(self):
+        '''Start the server in a thread.'''
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        '''Stop the server.'''
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle(self, request):
+        '''Answer a request with the records or the next status code of statuses.'''
+        url = urlparse(request.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        station_id = url.path.rsplit('/', 1)[-1]
+        start, end = int(params['start-timestamp']), int(params['end-timestamp'])
+        with self.lock:
+            self.requests.append((time.monotonic(), station_id, start, end))
+            status = self.statuses.pop(0) if self.statuses else 200
+        if status != 200:
+            request.send_response(status)
+            request.send_header('Retry-After', '0')
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        step = self.interval * 60
+        data = [self.record(ts) for ts in range(-(-start // step) * step, end + 1, step)]
+        body = json.dumps({'station_id': int(station_id), 'sensors': [{'data': data}]}).encode()
+        request.send_response(200)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    @staticmethod
+    def record(ts: int) -> dict:
+        '''Return an archive record with the names of the historic endpoint.'''
+        return {'ts': ts, 'temp_out': 68.0, 'bar': 29.92, 'hum_out': 55, 'wind_speed_avg': 5.0,
+            'wind_dir_of_prevail': 90, 'rain_rate_hi_mm': 0.0, 'uv_index_avg': 1.0}
+
+class SMTPServer:
+    '''
+    A local SMTP server without TLS that collects the messages.
+
+    It understands the commands smtplib sends (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, QUIT).
+    MAIL can be answered with error codes to test the retries, and the connection can be
+    closed after every message like a server does after its idle timeout.
+
+    Attributes
+    ----------
+    host: str
+            address of the server
+    port: int
+            port of the server
+    messages: list
+            (sender, receivers, data) of every accepted message
+    attempts: list
+            time.monotonic() of every MAIL command
+    connections: int
+            number of accepted connections
+    statuses: list
+            reply codes that are sent instead of 250 to the next MAIL commands
+    delay_s: float
+            seconds to wait before answering MAIL
+    drop: bool
+            close the connection after every message
+
+    Methods
+    -------
+    start():
+            Starts the server in a thread.
+    stop():
+            Stops the server.
+    '''
+
+    def __init__(self):
+        self.messages = []
+        self.attempts = []
+        self.connections = 0
+        self.statuses = []
+        self.delay_s = 0
+        self.drop = False
+        self.lock = threading.Lock()
+        server = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.handle(self)
+        self.tcp = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.tcp.daemon_threads = True
+        self.host, self.port = self.tcp.server_address
+        self.thread = None
+
+    def start(self):
+        '''Start the server in a thread.'''
+        self.thread = threading.Thread(target=self.tcp.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        '''Stop the server.'''
+        self.tcp.shutdown()
+        self.tcp.server_close()
+
+    def handle(self, request):
+        '''Answer the commands of one connection.'''
+        def reply(line):
+            request.wfile.write(line.encode() + b'\r\n')
+        with self.lock:
+            self.connections += 1
+        reply('220 localhost stand-in')
+        sender, receivers = None, []
+        for line in request.rfile:
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                reply('250-localhost')
+                reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                reply('235 authenticated')
+            elif verb == 'MAIL':
+                with self.lock:
+                    self.attempts.append(time.monotonic())
+                    status = self.statuses.pop(0) if self.statuses else 250
+                time.sleep(self.delay_s)
+                if status != 250:
+                    reply(f'{status} try again later')
+                    continue
+                sender, receivers = command.split(':', 1)[1].strip('<> '), []
+                reply('250 OK')
+            elif verb == 'RCPT':
+                receivers.append(command.split(':', 1)[1].strip('<> '))
+                reply('250 OK')
+            elif verb == 'DATA':
+                reply('354 end with <CRLF>.<CRLF>')
+                data = []
+                for data_line in request.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line.decode())
+                with self.lock:
+                    self.messages.append((sender, receivers, ''.join(data)))
+                reply('250 OK')
+                if self.drop:
+                    return
+            elif verb == 'QUIT':
+                reply('221 bye')
+                return
+            else: # RSET, NOOP
+                reply('250 OK')
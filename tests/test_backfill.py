@@ -0,0 +1,133 @@
+'''
+Tests for the backfill from the historic endpoint of Api2 (database backfill),
+run against the local stand-in HistoricServer.
+'''
+
+import os, tempfile, unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import stubs
+import main
+from timeSlots import SlotBitmap, EXISTS
+
+def api2_config(url, **kwargs):
+    '''Return the config of Api2 for the stand-in at url.'''
+    config = {'url': url, 'api-key': 'key', 'api-secret': 'secret', 'stationID': '1', 'stationIDs': [],
+        'maxWorkers': 2, 'dataMaxAge': 5, 'historicWorkers': 4, 'requestsPerS': 100,
+        'historicRetries': 2, 'historicBackoffS': 0.01, 'timeoutMs': 2000}
+    config.update(kwargs)
+    return config
+
+def db_config():
+    '''Return the config of the db for add_new_rows().'''
+    return {'table': 'data', 'stationTable': 'stations', 'interval': 30, 'timeoutMs': 1000,
+        'mendStartTime': '2020,1,1,0,0,0', 'sqlGaps': False, 'bulkLoad': False, 'compactStorage': False,
+        'rollups': False, 'mendChunkSize': 50}
+
+class BackfillTest(unittest.TestCase):
+    '''Api2.backfill() with the stand-in of the historic endpoint.'''
+
+    def setUp(self):
+        self.server = stubs.HistoricServer().start()
+        self.addCleanup(self.server.stop)
+
+    def api2(self, **kwargs):
+        main.config = SimpleNamespace(data={'Api2': api2_config(self.server.url, **kwargs)})
+        return main.Api2()
+
+    def test_gaps_are_split_into_windows_of_a_day(self):
+        start = datetime(2020, 1, 1)
+        end = datetime(2020, 1, 3, 23, 30)
+        rows, done, errors = self.api2().backfill([(start, end, 144)], interval=30)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(len(self.server.requests), 3)
+        for _, station_id, start_ts, end_ts in self.server.requests:
+            self.assertEqual(station_id, '1')
+            self.assertLessEqual(end_ts - start_ts, 24*60*60)
+        self.assertEqual(done, [
+            (datetime(2020, 1, 1), datetime(2020, 1, 1, 23, 30)),
+            (datetime(2020, 1, 2), datetime(2020, 1, 2, 23, 30)),
+            (datetime(2020, 1, 3), datetime(2020, 1, 3, 23, 30))])
+        # every slot of the gap exactly once, in order
+        self.assertEqual([r[0] for r in rows], [start + timedelta(minutes=30*i) for i in range(144)])
+
+    def test_records_are_converted_like_api1(self):
+        start = datetime(2020, 6, 1, 12)
+        rows, done, errors = self.api2().backfill([(start, start, 1)], interval=30)
+        self.assertEqual(rows, [[start, '20.0', '1013.2', '55', '8.0467', 'O', '0.0', '1.0']])
+
+    def test_requests_are_rate_limited(self):
+        rate = 20
+        gaps = [(datetime(2020, 1, 1), datetime(2020, 1, 6, 23, 30), 288)]
+        self.api2(requestsPerS=rate, historicWorkers=4).backfill(gaps, interval=30)
+
+        starts = sorted(r[0] for r in self.server.requests)
+        self.assertEqual(len(starts), 6)
+        # 6 requests need at least 5 intervals of the rate limit, a little less for the jitter of the server
+        self.assertGreaterEqual(starts[-1] - starts[0], 0.9 * 5 / rate)
+
+    def test_overloaded_api_is_retried(self):
+        self.server.statuses = [429, 503]
+        start = datetime(2020, 1, 1)
+        rows, done, errors = self.api2().backfill([(start, start + timedelta(hours=1), 3)], interval=30)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual([r[0] for r in rows], [start + timedelta(minutes=30*i) for i in range(3)])
+
+    def test_window_fails_after_the_last_retry(self):
+        self.server.statuses = [500, 502, 503]
+        start = datetime(2020, 1, 1)
+        window = (start, start + timedelta(hours=1))
+        rows, done, errors = self.api2(historicRetries=2).backfill([(*window, 3)], interval=30)
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(rows, [])
+        self.assertEqual(done, [])
+        self.assertEqual(list(errors), [window])
+        self.assertIsInstance(errors[window], main.ApiConnectionError)
+
+class AddNewRowsTest(unittest.TestCase):
+    '''Database.add_new_rows() with the rows of a backfill, without a db server.'''
+
+    def setUp(self):
+        cwd = os.getcwd()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        os.mkdir('add_data')
+        self.server = stubs.HistoricServer().start()
+        self.addCleanup(self.server.stop)
+        main.config = SimpleNamespace(data={'Api2': api2_config(self.server.url), 'db': db_config()})
+
+    def database(self, entries):
+        '''Return a Database that has the entries of the SlotBitmap and collects the inserted rows.'''
+        inserted = []
+        class Database(main.Database):
+            def get_entries(self):
+                return entries.copy()
+            def insert_rows(self, rows, table=None, progress=None, station_id=None):
+                inserted.extend(rows)
+                return len(inserted)
+        return Database(), inserted
+
+    def test_only_missing_slots_are_added_once(self):
+        start = datetime(2020, 1, 1)
+        entries = SlotBitmap(start, datetime(2020, 1, 3), 30)
+        for i in range(0, 96, 3): # every third slot exists already
+            entries.set(start + timedelta(minutes=30*i), EXISTS)
+        missing = [entries.time(i) for i in range(96) if i % 3]
+        rows, done, errors = main.Api2().backfill([(start, datetime(2020, 1, 2, 23, 30), 96)], interval=30)
+        db, inserted = self.database(entries)
+
+        # the rows of overlapping backfills are passed twice
+        added = db.add_new_rows(rows + rows)
+
+        self.assertEqual(added, len(missing))
+        self.assertEqual([r[0] for r in inserted], missing)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+'''
+Tests for the EmailWorker of emailMessages, run against the local stand-in SMTPServer.
+connect() opens the connection with TLS, the tests replace it with a plain one to the stand-in.
+'''
+
+import os, json, smtplib, tempfile, time, unittest
+from email.mime.text import MIMEText
+from unittest import mock
+
+import stubs
+import emailMessages
+
+RECEIVERS = ['admin@example.org']
+
+def connect_plain(data, timeout_s=30):
+    '''Open an SMTP connection without TLS and log in, like emailMessages.connect().'''
+    server = smtplib.SMTP(data['host'], data['port'], timeout=timeout_s)
+    server.login(data['user_email'], data['password'])
+    return server
+
+class EmailWorkerTest(unittest.TestCase):
+    '''start_worker(), queue_message() and stop_worker() with the stand-in of the SMTP server.'''
+
+    def setUp(self):
+        cwd = os.getcwd()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+        self.server = stubs.SMTPServer().start()
+        self.addCleanup(self.server.stop)
+        os.mkdir('res')
+        with open('res/error_msg_config.json', 'w') as f:
+            json.dump({'config': {'host': self.server.host, 'port': self.server.port,
+                'user_email': 'station@example.org', 'password': 'secret'}}, f)
+        emailMessages.files.clear()
+        patcher = mock.patch.object(emailMessages, 'connect', connect_plain)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(emailMessages.stop_worker)
+
+    def queue(self, *subjects):
+        '''Queue one message per subject.'''
+        for subject in subjects:
+            emailMessages.queue_message(emailMessages.send_email, MIMEText(subject), subject, RECEIVERS)
+
+    def subjects(self) -> list:
+        '''Return the subjects of the messages the server accepted.'''
+        return [next(l for l in data.splitlines() if l.startswith('Subject: '))[9:]
+            for _, _, data in self.server.messages]
+
+    def test_connection_is_kept_for_the_next_message(self):
+        emailMessages.start_worker(retries=2, backoff_s=0.01, idle_s=60, timeout_s=2)
+        self.queue('first', 'second')
+        self.assertEqual(emailMessages.stop_worker(), 0)
+
+        self.assertEqual(self.subjects(), ['first', 'second'])
+        self.assertEqual(self.server.messages[0][:2], ('station@example.org', RECEIVERS))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reconnects_at_once_after_the_server_dropped_the_connection(self):
+        self.server.drop = True
+        # a backoff would make the test take more than 10s
+        emailMessages.start_worker(retries=2, backoff_s=10, idle_s=60, timeout_s=2)
+        start = time.monotonic()
+        self.queue('first', 'second', 'third')
+        self.assertEqual(emailMessages.stop_worker(), 0)
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.subjects(), ['first', 'second', 'third'])
+        self.assertEqual(self.server.connections, 3)
+
+    def test_refused_message_is_tried_again_with_backoff(self):
+        self.server.statuses = [451, 421]
+        backoff_s = 0.1
+        emailMessages.start_worker(retries=3, backoff_s=backoff_s, idle_s=60, timeout_s=2)
+        self.queue('first')
+        self.assertEqual(emailMessages.stop_worker(), 0)
+
+        self.assertEqual(self.subjects(), ['first'])
+        attempts = self.server.attempts
+        self.assertEqual(len(attempts), 3)
+        # the delay doubles after every failed attempt
+        self.assertGreaterEqual(attempts[1] - attempts[0], backoff_s)
+        self.assertGreaterEqual(attempts[2] - attempts[1], 2 * backoff_s)
+
+    def test_message_fails_after_the_last_retry(self):
+        self.server.statuses = [451] * 3
+        emailMessages.start_worker(retries=2, backoff_s=0.01, idle_s=60, timeout_s=2)
+        with self.assertLogs('EMAIL MESSAGES', 'ERROR') as logs:
+            self.queue('lost', 'next')
+            self.assertEqual(emailMessages.stop_worker(), 0)
+
+        self.assertIn('send_email failed: SMTPSenderRefused', logs.output[0])
+        self.assertEqual(len(self.server.attempts), 4)
+        self.assertEqual(self.subjects(), ['next'])
+
+    def test_stop_waits_for_the_retries_of_the_queued_messages(self):
+        self.server.statuses = [451, 451]
+        emailMessages.start_worker(retries=2, backoff_s=0.2, idle_s=60, timeout_s=2, stop_s=5)
+        self.queue('first', 'second', 'third')
+        self.assertEqual(emailMessages.stop_worker(), 0)
+
+        self.assertEqual(self.subjects(), ['first', 'second', 'third'])
+        self.assertEqual(emailMessages.worker, None)
+
+    def test_messages_still_queued_after_the_timeout_are_logged(self):
+        self.server.delay_s = 0.5
+        emailMessages.start_worker(retries=0, backoff_s=0.01, idle_s=60, timeout_s=2, stop_s=0.1)
+        worker = emailMessages.worker
+        self.queue('first', 'second', 'third')
+        time.sleep(0.1) # the worker is sending the first message
+        start = time.monotonic()
+        with self.assertLogs('EMAIL MESSAGES', 'ERROR') as logs:
+            self.assertEqual(emailMessages.stop_worker(), 2)
+
+        # stop_worker() doesn't wait for the slow server
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('send_email', logs.output[0])
+        self.assertIn("'second'", logs.output[0])
+        self.assertIn("'third'", logs.output[1])
+        # the message that was being sent is finished before the worker stops
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(self.subjects(), ['first'])
+
+if __name__ == '__main__':
+    unittest.main()